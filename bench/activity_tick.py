@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Benchmark of the cost of one Activity tick: the timer wakes the activity up, it recomputes
+the remaining time, notifies a per second subscriber and arms the timer again.
+
+Usage: python -m bench.activity_tick [--ticks 200000]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import time
+from pomidorka.core import Activity, SECOND
+from pomidorka.timers import SimulatedClock
+
+
+def run(ticks=200000):
+    """
+    Run the benchmark
+    @param ticks: number of remaining time changes to deliver
+    @type ticks: int
+    @return: benchmark results
+    @rtype: dict
+    """
+    clock = SimulatedClock()
+    activity = Activity(ticks, clock.createTimer())
+    received = []
+    activity.timeChanged.subscribe(received.append, resolution=SECOND)
+    activity.start()
+    started = time.perf_counter()
+    clock.runUntilIdle()
+    elapsed = time.perf_counter() - started
+    assert len(received) == ticks + 1
+    return {
+        'ticks': ticks,
+        'ticksPerSecond': ticks / elapsed,
+        'microsecondsPerTick': elapsed / ticks * 1e6,
+    }
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Activity tick cost benchmark')
+    parser.add_argument('--ticks', type=int, default=200000)
+    arguments = parser.parse_args()
+    result = run(arguments.ticks)
+    print('{ticks} ticks: {ticksPerSecond:.0f} ticks/s, '
+          '{microsecondsPerTick:.2f} us/tick'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
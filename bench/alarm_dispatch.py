@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Benchmark of alarm dispatch: the cost of AlarmPlayer.play on the calling thread and the
+latency until the worker thread starts playback. Sound goes to a memory sink, so no sound
+card or decoder is needed.
+
+Usage: python -m bench.alarm_dispatch [--alarms 2000]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import time
+from pomidorka.alarm import AlarmPlayer, MemoryAudioSink, QUEUE, CHANNELS, SAMPLE_WIDTH
+
+
+def run(alarms=2000):
+    """
+    Run the benchmark. Alarms are requested one by one, each after the playback of the
+    previous one has started.
+    @param alarms: number of alarms to request
+    @type alarms: int
+    @return: benchmark results
+    @rtype: dict
+    """
+    sound = b'\0' * (CHANNELS * SAMPLE_WIDTH * 64)
+    player = AlarmPlayer(lambda: sound, MemoryAudioSink(), QUEUE)
+    dispatch = []
+    for number in range(1, alarms + 1):
+        started = time.perf_counter()
+        player.play()
+        dispatch.append(time.perf_counter() - started)
+        while player.latency.count < number:
+            time.sleep(0)
+    player.close()
+    dispatch.sort()
+    return {
+        'alarms': alarms,
+        'dispatchMedianMicroseconds': dispatch[len(dispatch) // 2] * 1e6,
+        'dispatchMaximumMicroseconds': dispatch[-1] * 1e6,
+        'latencyMeanMicroseconds': player.latency.mean() * 1e6,
+        'latencyMaximumMicroseconds': player.latency.maximum * 1e6,
+    }
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Alarm dispatch benchmark')
+    parser.add_argument('--alarms', type=int, default=2000)
+    arguments = parser.parse_args()
+    result = run(arguments.alarms)
+    print('{alarms} alarms: dispatch median {dispatchMedianMicroseconds:.1f} us, '
+          'max {dispatchMaximumMicroseconds:.1f} us; playback latency mean '
+          '{latencyMeanMicroseconds:.1f} us, max {latencyMaximumMicroseconds:.1f} us'
+          .format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Benchmark of many concurrent activities awaited on one asyncio event loop.
+
+Usage: python -m bench.asyncio_activities [--activities 5000] [--period 2]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import asyncio
+import time
+from pomidorka.aio import AsyncActivityManager
+from pomidorka.core import Settings
+
+
+async def _runActivities(activities, period):
+    """Start all activities and wait for them, return the number of finished ones"""
+    settings = Settings()
+    settings.workPeriod = period
+    managers = [AsyncActivityManager(settings) for _ in range(activities)]
+    records = await asyncio.gather(*(manager.startWorkActivityAsync()
+                                     for manager in managers))
+    return len(records)
+
+
+def run(activities=5000, period=2):
+    """
+    Run the benchmark
+    @param activities: number of concurrent activities
+    @type activities: int
+    @param period: duration of every activity in seconds
+    @type period: int
+    @return: benchmark results
+    @rtype: dict
+    """
+    started = time.perf_counter()
+    cpuStarted = time.process_time()
+    finished = asyncio.run(_runActivities(activities, period))
+    return {
+        'activities': activities,
+        'finished': finished,
+        'wallSeconds': time.perf_counter() - started,
+        'cpuSeconds': time.process_time() - cpuStarted,
+        'lateBySeconds': time.perf_counter() - started - period,
+    }
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Concurrent asyncio activities benchmark')
+    parser.add_argument('--activities', type=int, default=5000)
+    parser.add_argument('--period', type=int, default=2)
+    arguments = parser.parse_args()
+    result = run(arguments.activities, arguments.period)
+    print('{finished}/{activities} activities finished in {wallSeconds:.2f} s '
+          '({lateBySeconds:.3f} s after the deadline), CPU {cpuSeconds:.2f} s'
+          .format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Cold start benchmark: time from spawning a fresh interpreter to the first event loop
+iteration with the tray icon set up. Every sample runs with an empty home directory and
+the offscreen Qt platform, it is skipped when PySide is not installed.
+
+Usage: python -m bench.cold_start [--samples 5]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from bench.gui_paths import available
+
+_PROBE = '''
+import sys, time
+from PySide.QtCore import QTimer
+from PySide.QtGui import QApplication
+from pomidorka import gui
+application = QApplication(sys.argv)
+window = gui.ActivityStatus()
+
+def report():
+    print(time.monotonic())
+    application.quit()
+
+QTimer.singleShot(0, report)
+application.exec_()
+'''
+
+
+def _measureOnce():
+    """
+    Start the application in a new interpreter
+    @return: seconds from the spawn to the first event loop iteration
+    @rtype: float
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as home:
+        environment = dict(os.environ, HOME=home, XDG_RUNTIME_DIR=home,
+                           QT_QPA_PLATFORM='offscreen')
+        started = time.monotonic()
+        output = subprocess.check_output([sys.executable, '-c', _PROBE], cwd=root,
+                                         env=environment, stderr=subprocess.DEVNULL)
+    return float(output.decode().split()[-1]) - started
+
+
+def run(samples=5):
+    """
+    Run the benchmark
+    @param samples: number of application starts
+    @type samples: int
+    @return: benchmark results
+    @rtype: dict
+    """
+    if not available():
+        return {'skipped': 'PySide is not installed'}
+    times = sorted(_measureOnce() for _ in range(samples))
+    return {
+        'samples': samples,
+        'minimumMilliseconds': times[0] * 1000,
+        'medianMilliseconds': times[len(times) // 2] * 1000,
+    }
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Cold start to the first tray icon benchmark')
+    parser.add_argument('--samples', type=int, default=5)
+    arguments = parser.parse_args()
+    result = run(arguments.samples)
+    if 'skipped' in result:
+        print('skipped: {skipped}'.format(**result))
+        return
+    print('start to tray icon: min {minimumMilliseconds:.1f} ms, '
+          'median {medianMilliseconds:.1f} ms'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Load benchmark of the timer daemon. Users run work and short break activities on a
+simulated clock, so the benchmark measures only the scheduling cost of expiring events.
+
+Usage: python -m bench.daemon_load [--users 10000 100000] [--cycles 2]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import random
+import time
+from pomidorka.core import Settings
+from pomidorka.daemon import TimerDaemon
+from pomidorka.timers import SimulatedClock
+
+
+def _addUser(daemon, userId, settings, cycles):
+    """
+    Register a user, who alternates work and short breaks for the given number of cycles
+    """
+    manager = daemon.addUser(userId, settings)
+    remaining = [cycles]
+
+    def workEnded():
+        manager.startShortBreakActivity()
+
+    def breakEnded():
+        remaining[0] -= 1
+        if remaining[0] > 0:
+            manager.startWorkActivity()
+
+    manager.workActivityEnded += workEnded
+    manager.breakActivityEnded += breakEnded
+    return manager
+
+
+def run(users, cycles=2, seed=1):
+    """
+    Run the benchmark
+    @param users: number of concurrent users
+    @type users: int
+    @param cycles: number of work and break pairs each user completes
+    @type cycles: int
+    @param seed: seed for start offsets of users
+    @type seed: int
+    @return: benchmark results
+    @rtype: dict
+    """
+    clock = SimulatedClock()
+    scheduler = clock.scheduler
+    daemon = TimerDaemon(scheduler)
+    settings = Settings()
+    generator = random.Random(seed)
+    started = time.perf_counter()
+    for userId in range(users):
+        manager = _addUser(daemon, str(userId), settings, cycles)
+        scheduler.schedule(generator.uniform(0, settings.workPeriod),
+                           manager.startWorkActivity)
+    setupTime = time.perf_counter() - started
+    started = time.perf_counter()
+    events = clock.runUntilIdle()
+    runTime = time.perf_counter() - started
+    return {
+        'users': users,
+        'activities': users * cycles * 2,
+        'events': events,
+        'simulatedSeconds': clock.time,
+        'setupSeconds': setupTime,
+        'runSeconds': runTime,
+        'eventsPerSecond': events / runTime,
+        'microsecondsPerEvent': runTime / events * 1e6,
+    }
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Timer daemon load benchmark')
+    parser.add_argument('--users', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--cycles', type=int, default=2)
+    arguments = parser.parse_args()
+    for users in arguments.users:
+        result = run(users, arguments.cycles)
+        print('{users:>7} users: {events} events over {simulatedSeconds:.0f} simulated s in '
+              '{runSeconds:.2f} s, {eventsPerSecond:.0f} events/s, '
+              '{microsecondsPerEvent:.1f} us/event'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Contention benchmark of cross-thread event hook dispatch. Producer threads fire a hook
+whose handler belongs to an asyncio loop thread or to a thread pool; delivery throughput
+and batch sizes are measured until every event is handled. The same-thread fast path is
+compared with a handler subscribed without an executor.
+
+Usage: python -m bench.eventhook_dispatch [--producers 1 2 4] [--events 200000]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from pomidorka.core import EventHook
+from pomidorka.dispatch import AsyncioExecutor, PoolExecutor
+
+
+class _Listener:
+    """Subscriber counting received notifications, signalling when all arrived"""
+
+    def __init__(self, expected=None):
+        self.count = 0
+        self.expected = expected
+        self.done = threading.Event()
+
+    def notify(self, value):
+        """Handler of the benchmarked hook"""
+        self.count += 1
+        if self.count == self.expected:
+            self.done.set()
+
+
+def _sameThread(events):
+    """
+    @return: nanoseconds per handler call without an executor and with a current one
+    @rtype: tuple
+    """
+    loop = asyncio.new_event_loop()
+    results = []
+    try:
+        for executor in (None, AsyncioExecutor(loop)):
+            hook = EventHook()
+            listener = _Listener()
+            hook.subscribe(listener.notify, executor=executor)
+            fire = hook.fire
+            started = time.perf_counter()
+            for value in range(events):
+                fire(value)
+            results.append((time.perf_counter() - started) / events * 1e9)
+            assert listener.count == events
+    finally:
+        loop.close()
+    return tuple(results)
+
+
+def _fireFromProducers(hook, producers, events):
+    """Fire the hook from producer threads, events are split among them"""
+    share = events // producers
+
+    def produce():
+        fire = hook.fire
+        for value in range(share):
+            fire(value)
+
+    threads = [threading.Thread(target=produce) for _ in range(producers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return share * producers
+
+
+def _crossThread(kind, producers, events):
+    """
+    Deliver events fired by producers to a loop thread or a pool
+    @return: delivered events per second and mean batch size
+    @rtype: tuple
+    """
+    total = events // producers * producers
+    listener = _Listener(total)
+    hook = EventHook()
+    if kind == 'asyncio':
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        executors = []
+
+        def runLoop():
+            asyncio.set_event_loop(loop)
+            executors.append(AsyncioExecutor(loop))
+            ready.set()
+            loop.run_forever()
+
+        loopThread = threading.Thread(target=runLoop)
+        loopThread.start()
+        ready.wait()
+        executor = executors[0]
+    else:
+        pool = ThreadPoolExecutor(4)
+        executor = PoolExecutor(pool)
+    hook.subscribe(listener.notify, executor=executor)
+    started = time.perf_counter()
+    _fireFromProducers(hook, producers, events)
+    listener.done.wait()
+    elapsed = time.perf_counter() - started
+    if kind == 'asyncio':
+        loop.call_soon_threadsafe(loop.stop)
+        loopThread.join()
+        loop.close()
+    else:
+        pool.shutdown()
+    return total / elapsed, executor.delivered / float(executor.batches)
+
+
+def run(producers=(1, 2, 4), events=200000):
+    """
+    Run the benchmark
+    @param producers: numbers of firing threads to measure
+    @type producers: tuple
+    @param events: number of fires for every measurement
+    @type events: int
+    @return: benchmark results
+    @rtype: dict
+    """
+    direct, current = _sameThread(events)
+    result = {'directNanosecondsPerHandler': direct,
+              'sameThreadNanosecondsPerHandler': current}
+    for kind in ('asyncio', 'pool'):
+        for count in producers:
+            throughput, batch = _crossThread(kind, count, events)
+            result['{0}{1}EventsPerSecond'.format(kind, count)] = throughput
+            result['{0}{1}MeanBatch'.format(kind, count)] = batch
+    return result
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Cross-thread event dispatch benchmark')
+    parser.add_argument('--producers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--events', type=int, default=200000)
+    arguments = parser.parse_args()
+    result = run(arguments.producers, arguments.events)
+    print('same thread: {directNanosecondsPerHandler:.0f} ns/handler without executor, '
+          '{sameThreadNanosecondsPerHandler:.0f} ns/handler with a current one'
+          .format(**result))
+    for kind in ('asyncio', 'pool'):
+        for count in arguments.producers:
+            print('{0:>7} {1} producers: {2:9.0f} events/s, {3:8.1f} events per batch'
+                  .format(kind, count, result['{0}{1}EventsPerSecond'.format(kind, count)],
+                          result['{0}{1}MeanBatch'.format(kind, count)]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Micro-benchmark of EventHook.fire throughput for different numbers of subscribers.
+
+Usage: python -m bench.eventhook_fire [--subscribers 1 10 1000] [--calls 1000000]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import time
+from pomidorka.core import EventHook
+
+
+class _Listener:
+    """Subscriber counting received notifications"""
+
+    def __init__(self):
+        self.count = 0
+
+    def notify(self, value):
+        """Handler of the benchmarked hook"""
+        self.count += 1
+
+
+def run(subscribers, calls=1000000):
+    """
+    Run the benchmark
+    @param subscribers: number of bound method handlers of the hook
+    @type subscribers: int
+    @param calls: total number of handler calls to make, fires are calls / subscribers
+    @type calls: int
+    @return: benchmark results
+    @rtype: dict
+    """
+    hook = EventHook()
+    listeners = [_Listener() for _ in range(subscribers)]
+    for listener in listeners:
+        hook += listener.notify
+    fires = max(1, calls // subscribers)
+    fire = hook.fire
+    started = time.perf_counter()
+    for value in range(fires):
+        fire(value)
+    elapsed = time.perf_counter() - started
+    assert sum(listener.count for listener in listeners) == fires * subscribers
+    return {
+        'subscribers': subscribers,
+        'fires': fires,
+        'firesPerSecond': fires / elapsed,
+        'handlerCallsPerSecond': fires * subscribers / elapsed,
+        'nanosecondsPerHandler': elapsed / (fires * subscribers) * 1e9,
+    }
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='EventHook.fire throughput benchmark')
+    parser.add_argument('--subscribers', type=int, nargs='+', default=[1, 10, 1000])
+    parser.add_argument('--calls', type=int, default=1000000)
+    arguments = parser.parse_args()
+    for subscribers in arguments.subscribers:
+        result = run(subscribers, arguments.calls)
+        print('{subscribers:>5} subscribers: {firesPerSecond:.0f} fires/s, '
+              '{handlerCallsPerSecond:.0f} handler calls/s, '
+              '{nanosecondsPerHandler:.0f} ns/handler'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Benchmarks of the Qt paths run while an activity ticks: painting of remaining time tray
+icons, their cached lookup and calculation of the main window position. Qt runs with the
+offscreen platform, the benchmark is skipped when PySide is not installed.
+
+Usage: python -m bench.gui_paths [--repeats 20]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import importlib.util
+import os
+import sys
+import time
+
+"""Number of window position calculations per measurement"""
+POSITION_CALLS = 10000
+
+
+def available():
+    """
+    @return: whether Qt benchmarks can be run
+    @rtype: bool
+    """
+    return importlib.util.find_spec('PySide') is not None
+
+
+def run(repeats=20):
+    """
+    Run the benchmark
+    @param repeats: number of times every icon value is painted
+    @type repeats: int
+    @return: benchmark results
+    @rtype: dict
+    """
+    if not available():
+        return {'skipped': 'PySide is not installed'}
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PySide.QtCore import QRect
+    from PySide.QtGui import QApplication
+    from pomidorka import gui
+    application = QApplication.instance() or QApplication(sys.argv)
+    icons = gui.RemainingTimeIcons('pomidor.png')
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for value in range(61):
+            icons._paintIcon(value)
+    paintTime = (time.perf_counter() - started) / (repeats * 61)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for value in range(61):
+            icons.getIcon(value)
+    cachedTime = (time.perf_counter() - started) / (repeats * 61)
+    screen = QRect(0, 0, 1920, 1080)
+    trayIcon = QRect(1890, 1050, 24, 24)
+    started = time.perf_counter()
+    for _ in range(POSITION_CALLS):
+        gui._calculateWindowPosition(screen, trayIcon, 300, 200)
+    positionTime = (time.perf_counter() - started) / POSITION_CALLS
+    del application
+    return {
+        'iconPaintMicroseconds': paintTime * 1e6,
+        'cachedIconMicroseconds': cachedTime * 1e6,
+        'windowPositionMicroseconds': positionTime * 1e6,
+    }
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Qt rendering paths benchmark')
+    parser.add_argument('--repeats', type=int, default=20)
+    arguments = parser.parse_args()
+    result = run(arguments.repeats)
+    if 'skipped' in result:
+        print('skipped: {skipped}'.format(**result))
+        return
+    print('icon paint {iconPaintMicroseconds:.1f} us, cached icon '
+          '{cachedIconMicroseconds:.2f} us, window position '
+          '{windowPositionMicroseconds:.2f} us'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
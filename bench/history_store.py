@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Benchmark of the activity history store: appending, reopening with recovery and range
+queries over millions of records.
+
+Usage: python -m bench.history_store [--records 1000000] [--queries 100]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import os
+import random
+import shutil
+import tempfile
+import time
+from pomidorka.core import ActivityRecord, WORK, SHORT_BREAK
+from pomidorka.history import HistoryStore
+
+"""Time between starts of consecutive records in seconds"""
+_RECORD_STEP = 1800.0
+_DAY = 86400.0
+
+
+def run(records=1000000, queries=100, seed=1):
+    """
+    Run the benchmark
+    @param records: number of records to append
+    @type records: int
+    @param queries: number of one-day range queries
+    @type queries: int
+    @param seed: seed for query positions
+    @type seed: int
+    @return: benchmark results
+    @rtype: dict
+    """
+    directory = tempfile.mkdtemp(prefix='pomidorka-bench-')
+    try:
+        path = os.path.join(directory, 'history.log')
+        store = HistoryStore(path, syncBatch=4096)
+        started = time.perf_counter()
+        for number in range(records):
+            start = number * _RECORD_STEP
+            kind = WORK if number % 2 == 0 else SHORT_BREAK
+            store.append(ActivityRecord(start, start + 1500.0, kind, 1500, 1500.0, False))
+        store.close()
+        appendTime = time.perf_counter() - started
+        with open(path, 'ab') as log:
+            log.write(b'torn')
+        started = time.perf_counter()
+        store = HistoryStore(path)
+        openTime = time.perf_counter() - started
+        generator = random.Random(seed)
+        found = 0
+        started = time.perf_counter()
+        for _ in range(queries):
+            begin = generator.uniform(0, records * _RECORD_STEP - _DAY)
+            found += sum(1 for _ in store.query(begin, begin + _DAY))
+        queryTime = time.perf_counter() - started
+        started = time.perf_counter()
+        scanned = sum(1 for _ in store.records())
+        scanTime = time.perf_counter() - started
+        store.close()
+        return {
+            'records': records,
+            'bytesPerRecord': float(os.path.getsize(path)) / records,
+            'appendsPerSecond': records / appendTime,
+            'openMilliseconds': openTime * 1000,
+            'queryMicroseconds': queryTime / queries * 1e6,
+            'recordsPerQuery': float(found) / queries,
+            'scanSeconds': scanTime,
+            'scannedRecords': scanned,
+        }
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='History store benchmark')
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=100)
+    arguments = parser.parse_args()
+    result = run(arguments.records, arguments.queries)
+    print('{records} records, {bytesPerRecord:.1f} bytes each: '
+          '{appendsPerSecond:.0f} appends/s, open with recovery {openMilliseconds:.2f} ms, '
+          'one day query {queryMicroseconds:.1f} us ({recordsPerQuery:.0f} records), '
+          'full scan {scanSeconds:.2f} s'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Import time benchmark of the headless core. Every sample imports the modules in a fresh
+interpreter and checks that no Qt module got loaded.
+
+Usage: python -m bench.import_time [--samples 20]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import json
+import os
+import subprocess
+import sys
+
+"""Modules making up the headless path"""
+HEADLESS_MODULES = ['pomidorka.core', 'pomidorka.scheduler', 'pomidorka.timers',
+                    'pomidorka.daemon']
+
+_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed,
+                  'qtLoaded': any(name.startswith('PySide') for name in sys.modules)}}))
+'''
+
+
+def _measureOnce(modules):
+    """
+    Import modules in a new interpreter
+    @return: import time in seconds and whether Qt was loaded
+    @rtype: dict
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, '-c', _PROBE.format(modules=modules)],
+                                     cwd=root)
+    return json.loads(output.decode())
+
+
+def run(samples=20, modules=None):
+    """
+    Run the benchmark
+    @param samples: number of interpreters to start
+    @type samples: int
+    @param modules: modules to import, the headless path by default
+    @type modules: list
+    @return: benchmark results
+    @rtype: dict
+    """
+    if modules is None:
+        modules = HEADLESS_MODULES
+    measurements = [_measureOnce(modules) for _ in range(samples)]
+    times = sorted(measurement['seconds'] for measurement in measurements)
+    return {
+        'modules': modules,
+        'minimumMilliseconds': times[0] * 1000,
+        'medianMilliseconds': times[len(times) // 2] * 1000,
+        'qtLoaded': any(measurement['qtLoaded'] for measurement in measurements),
+    }
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Headless core import time benchmark')
+    parser.add_argument('--samples', type=int, default=20)
+    arguments = parser.parse_args()
+    result = run(arguments.samples)
+    print('import of {0}: min {minimumMilliseconds:.2f} ms, '
+          'median {medianMilliseconds:.2f} ms, Qt loaded: {qtLoaded}'
+          .format(', '.join(result['modules']), **result))
+    if result['qtLoaded']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Benchmark of ActivityManager state transitions: activity starts, interruptions and
+natural endings with their history records, driven by a simulated clock.
+
+Usage: python -m bench.manager_transitions [--cycles 20000]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import time
+from pomidorka.core import ActivityManager, Settings
+from pomidorka.timers import SimulatedClock
+
+
+def run(cycles=20000):
+    """
+    Run the benchmark. Every cycle starts a work activity, interrupts it, starts a short
+    break and lets it end, which makes four transitions.
+    @param cycles: number of cycles
+    @type cycles: int
+    @return: benchmark results
+    @rtype: dict
+    """
+    settings = Settings()
+    clock = SimulatedClock()
+    manager = ActivityManager(settings, clock.createTimer)
+    records = []
+    manager.activityRecorded += records.append
+    started = time.perf_counter()
+    for _ in range(cycles):
+        manager.startWorkActivity()
+        manager.stopCurrentActivity()
+        manager.startShortBreakActivity()
+        clock.advance(settings.shortRestPeriod)
+    elapsed = time.perf_counter() - started
+    assert len(records) == cycles * 2
+    transitions = cycles * 4
+    return {
+        'cycles': cycles,
+        'transitions': transitions,
+        'transitionsPerSecond': transitions / elapsed,
+        'microsecondsPerTransition': elapsed / transitions * 1e6,
+    }
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Activity manager state transition benchmark')
+    parser.add_argument('--cycles', type=int, default=20000)
+    arguments = parser.parse_args()
+    result = run(arguments.cycles)
+    print('{transitions} transitions: {transitionsPerSecond:.0f} transitions/s, '
+          '{microsecondsPerTransition:.2f} us/transition'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
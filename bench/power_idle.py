@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Timer wakeups per minute of a work activity with the window shown, with only the tray
+icon visible and with the screen locked. The user interface is represented by the handlers
+the display updater subscribes, time runs on a simulated clock.
+
+Usage: python -m bench.power_idle
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+from pomidorka.core import ActivityManager, Settings
+from pomidorka.power import DisplayUpdater, WakeupMeter
+from pomidorka.timers import SimulatedClock
+
+"""Display states of the benchmark"""
+STATES = ('visible', 'hidden', 'locked')
+
+
+def _measure(state, settings):
+    """
+    Run one work activity in the display state
+    @return: wakeups per minute and numbers of tray and window updates
+    @rtype: tuple
+    """
+    clock = SimulatedClock()
+    meter = WakeupMeter(clock.now)
+    manager = ActivityManager(settings, meter.timerFactory(clock.createTimer))
+    trayUpdates = []
+    windowUpdates = []
+    updater = DisplayUpdater(manager, trayUpdates.append, windowUpdates.append)
+    updater.setWindowVisible(state == 'visible')
+    updater.setLocked(state == 'locked')
+    manager.startWorkActivity()
+    clock.runUntilIdle()
+    return meter.total * 60.0 / settings.workPeriod, len(trayUpdates), len(windowUpdates)
+
+
+def run():
+    """
+    Run the benchmark
+    @return: benchmark results
+    @rtype: dict
+    """
+    settings = Settings()
+    result = {'workPeriod': settings.workPeriod}
+    for state in STATES:
+        wakeups, trayUpdates, windowUpdates = _measure(state, settings)
+        result[state + 'WakeupsPerMinute'] = wakeups
+        result[state + 'TrayUpdates'] = trayUpdates
+        result[state + 'WindowUpdates'] = windowUpdates
+    return result
+
+
+def main():
+    """Run the benchmark and print results"""
+    ArgumentParser(description='Timer wakeups in display states benchmark').parse_args()
+    result = run()
+    for state in STATES:
+        print('{0:>8}: {1:6.2f} wakeups/min, {2:5d} tray updates, {3:5d} window updates'
+              .format(state, result[state + 'WakeupsPerMinute'],
+                      result[state + 'TrayUpdates'], result[state + 'WindowUpdates']))
+
+
+if __name__ == '__main__':
+    main()
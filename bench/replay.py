@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Throughput benchmark of the activity state machine replayed on a simulated clock.
+
+Usage: python -m bench.replay [--days 365]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import time
+from pomidorka.core import SECOND, MINUTE
+from pomidorka.simulation import ReplayHarness, pomodoroDays
+
+
+def run(days=365, tickResolution=None):
+    """
+    Run the benchmark
+    @param days: number of simulated pomodoro days
+    @type days: int
+    @param tickResolution: resolution of recorded remaining time changes or None
+    @type tickResolution: int
+    @return: benchmark results
+    @rtype: dict
+    """
+    script = pomodoroDays(days)
+    harness = ReplayHarness(tickResolution=tickResolution)
+    started = time.perf_counter()
+    events = harness.run(script)
+    elapsed = time.perf_counter() - started
+    return {
+        'days': days,
+        'tickResolution': tickResolution,
+        'commands': len(script),
+        'events': len(events),
+        'simulatedSeconds': harness.clock.time,
+        'simulatedSecondsPerSecond': harness.clock.time / elapsed,
+        'eventsPerSecond': len(events) / elapsed,
+        'digest': harness.digest(),
+    }
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Replay throughput benchmark')
+    parser.add_argument('--days', type=int, default=365)
+    arguments = parser.parse_args()
+    for resolution in (None, MINUTE, SECOND):
+        result = run(arguments.days, resolution)
+        print('ticks {0:>6}: {events} events, {simulatedSecondsPerSecond:.3g} simulated s/s, '
+              '{eventsPerSecond:.0f} events/s, digest {digest}'
+              .format(str(resolution), **result))
+
+
+if __name__ == '__main__':
+    main()
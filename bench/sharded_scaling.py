@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Throughput of the sharded daemon by number of worker processes. Users cycle through one
+second activities and every ended activity costs busy CPU time standing for history
+writes, notifications and statistics, so a single shard saturates its core. Throughput is
+measured in real time and grows with the number of shards up to the number of cores.
+
+Usage: python -m bench.sharded_scaling [--workers 1 2 4] [--users 20000] [--duration 3]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+from functools import partial
+import os
+import time
+from pomidorka.core import Settings
+from pomidorka.sharding import ShardedDaemon
+
+
+def _busy(cost, _):
+    """Spend the given number of seconds of processor time"""
+    finish = time.perf_counter() + cost
+    while time.perf_counter() < finish:
+        pass
+
+
+def _setupUser(cost, daemon, userId, manager):
+    """Make ended activities of the user cost processor time and start the cycle"""
+    manager.activityRecorded += partial(_busy, cost)
+    daemon.getCycle(userId).start()
+
+
+def _records(daemon):
+    """
+    @return: number of activities ended in all shards
+    @rtype: int
+    """
+    return sum(stats['records'] for stats in daemon.stats().values())
+
+
+def _measure(workers, users, duration, hookCost):
+    """
+    Run the load on the given number of shards
+    @return: ended activities per second
+    @rtype: float
+    """
+    settings = Settings()
+    settings.workPeriod = settings.shortRestPeriod = settings.longRestPeriod = 1
+    settings.autoStart = True
+    daemon = ShardedDaemon(workers, partial(_setupUser, hookCost))
+    try:
+        daemon.addUsers((str(userId), settings) for userId in range(users))
+        time.sleep(1.0)
+        records = _records(daemon)
+        started = time.perf_counter()
+        time.sleep(duration)
+        records = _records(daemon) - records
+        return records / (time.perf_counter() - started)
+    finally:
+        daemon.close()
+
+
+def run(workers=(1, 2, 4), users=20000, duration=3.0, hookCost=0.0002):
+    """
+    Run the benchmark
+    @param workers: numbers of shards to measure
+    @type workers: tuple
+    @param users: number of users, each ending up to one activity per second
+    @type users: int
+    @param duration: measurement time in seconds for every number of shards
+    @type duration: float
+    @param hookCost: processor time spent on every ended activity in seconds
+    @type hookCost: float
+    @return: benchmark results
+    @rtype: dict
+    """
+    result = {'cores': os.cpu_count(), 'users': users, 'offeredPerSecond': users}
+    base = None
+    for count in workers:
+        throughput = _measure(count, users, duration, hookCost)
+        base = base or throughput
+        result['workers{0}PerSecond'.format(count)] = throughput
+        result['workers{0}Efficiency'.format(count)] = throughput / base / count
+    return result
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Sharded daemon scaling benchmark')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--hook-cost', type=float, default=0.0002)
+    arguments = parser.parse_args()
+    result = run(arguments.workers, arguments.users, arguments.duration, arguments.hook_cost)
+    print('{cores} cores, {users} users offering {offeredPerSecond} activities/s'
+          .format(**result))
+    for count in arguments.workers:
+        print('{0:>3} workers: {1:8.0f} activities/s, {2:4.0%} scaling efficiency'
+              .format(count, result['workers{0}PerSecond'.format(count)],
+                      result['workers{0}Efficiency'.format(count)]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Benchmark suite. Runs every benchmark with a fixed workload, saves the results as JSON
+and compares the tracked metrics with a stored baseline. A metric worse than the baseline
+by more than the tolerance is a regression and makes the suite fail, so does a missing
+baseline file.
+
+Usage: python -m bench.suite [--output FILE] [--baseline FILE] [--tolerance 0.25]
+                             [--repeats 3] [--only NAME ...]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+
+"""Directions of metric improvement"""
+HIGHER = 'higher'
+LOWER = 'lower'
+
+"""Benchmarks of the suite: name, module, run arguments and tracked metrics"""
+BENCHMARKS = [
+    ('eventhook_fire', 'bench.eventhook_fire', {'subscribers': 10, 'calls': 500000},
+     {'handlerCallsPerSecond': HIGHER}),
+    ('activity_tick', 'bench.activity_tick', {'ticks': 100000},
+     {'microsecondsPerTick': LOWER}),
+    ('manager_transitions', 'bench.manager_transitions', {'cycles': 10000},
+     {'microsecondsPerTransition': LOWER}),
+    ('gui_paths', 'bench.gui_paths', {'repeats': 20},
+     {'iconPaintMicroseconds': LOWER, 'cachedIconMicroseconds': LOWER,
+      'windowPositionMicroseconds': LOWER}),
+    ('alarm_dispatch', 'bench.alarm_dispatch', {'alarms': 1000},
+     {'dispatchMedianMicroseconds': LOWER, 'latencyMeanMicroseconds': LOWER}),
+    ('cold_start', 'bench.cold_start', {'samples': 5},
+     {'medianMilliseconds': LOWER}),
+    ('import_time', 'bench.import_time', {'samples': 10},
+     {'medianMilliseconds': LOWER}),
+    ('replay', 'bench.replay', {'days': 30},
+     {'simulatedSecondsPerSecond': HIGHER}),
+    ('daemon_load', 'bench.daemon_load', {'users': 1000},
+     {'microsecondsPerEvent': LOWER}),
+    ('history_store', 'bench.history_store', {'records': 100000, 'queries': 1000},
+     {'appendsPerSecond': HIGHER, 'openMilliseconds': LOWER, 'queryMicroseconds': LOWER}),
+    ('power_idle', 'bench.power_idle', {},
+     {'hiddenWakeupsPerMinute': LOWER, 'lockedWakeupsPerMinute': LOWER}),
+    ('asyncio_activities', 'bench.asyncio_activities', {'activities': 2000, 'period': 1},
+     {'cpuSeconds': LOWER}),
+    ('tenant_memory', 'bench.tenant_memory', {'tenants': 20000, 'cycles': True},
+     {'bytesPerTenant': LOWER, 'bytesPerActiveTimer': LOWER}),
+]
+
+
+def runSuite(only=None, repeats=3):
+    """
+    Run the benchmarks
+    @param only: names of benchmarks to run, all if None
+    @type only: list
+    @param repeats: number of runs of every benchmark, the best value of each tracked
+    metric is kept to reduce noise
+    @type repeats: int
+    @return: suite results with the description of the environment
+    @rtype: dict
+    """
+    results = {}
+    for name, moduleName, arguments, metrics in BENCHMARKS:
+        if only and name not in only:
+            continue
+        print('running {0}...'.format(name), file=sys.stderr)
+        module = importlib.import_module(moduleName)
+        started = time.perf_counter()
+        best = module.run(**arguments)
+        for _ in range(repeats - 1):
+            if 'skipped' in best:
+                break
+            result = module.run(**arguments)
+            for metric, direction in metrics.items():
+                choose = max if direction == HIGHER else min
+                result[metric] = choose(result[metric], best[metric])
+            best = result
+        best['benchmarkSeconds'] = time.perf_counter() - started
+        results[name] = best
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeats': repeats,
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """
+    Compare tracked metrics of two suite runs
+    @param current: results of the checked run
+    @type current: dict
+    @param baseline: results of the reference run
+    @type baseline: dict
+    @param tolerance: allowed relative worsening of a metric
+    @type tolerance: float
+    @return: tuples of benchmark, metric, baseline value, current value, relative change
+    and whether it is a regression; the change is positive when the metric got better
+    @rtype: list
+    """
+    comparison = []
+    for name, _, _, metrics in BENCHMARKS:
+        currentResult = current['results'].get(name, {})
+        baselineResult = baseline['results'].get(name, {})
+        for metric, direction in sorted(metrics.items()):
+            if metric not in currentResult or not baselineResult.get(metric):
+                continue
+            ratio = currentResult[metric] / baselineResult[metric]
+            change = ratio - 1 if direction == HIGHER else 1 - ratio
+            comparison.append((name, metric, baselineResult[metric], currentResult[metric],
+                               change, change < -tolerance))
+    return comparison
+
+
+def main():
+    """
+    Run the suite with command line parameters, exit with 1 on regressions and with 2 if
+    the baseline is missing
+    """
+    parser = ArgumentParser(description='Pomidorka benchmark suite')
+    parser.add_argument('--output', help='file to save results to')
+    parser.add_argument('--baseline', help='results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative worsening of a metric')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='runs of every benchmark, the best result is kept')
+    parser.add_argument('--only', nargs='+', metavar='NAME',
+                        choices=[benchmark[0] for benchmark in BENCHMARKS],
+                        help='benchmarks to run')
+    arguments = parser.parse_args()
+    if arguments.baseline and not os.path.exists(arguments.baseline):
+        parser.error('no baseline {0}, create it with "make bench-baseline"'
+                     .format(arguments.baseline))
+    current = runSuite(arguments.only, arguments.repeats)
+    for name, result in sorted(current['results'].items()):
+        if 'skipped' in result:
+            print('{0:<22}skipped: {1}'.format(name, result['skipped']))
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(current, output, indent=2, sort_keys=True)
+    if not arguments.baseline:
+        return
+    with open(arguments.baseline) as baselineFile:
+        baseline = json.load(baselineFile)
+    regressions = 0
+    for name, metric, old, new, change, regression in compare(current, baseline,
+                                                               arguments.tolerance):
+        regressions += regression
+        print('{0:<22}{1:<30}{2:>14.2f}{3:>14.2f}{4:>+9.0%}{5}'.format(
+            name, metric, old, new, change, '  REGRESSION' if regression else ''))
+    if regressions:
+        print('{0} metrics regressed by more than {1:.0%}'.format(regressions,
+                                                                 arguments.tolerance))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
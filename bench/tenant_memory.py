@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Memory benchmark of the timer daemon: bytes per registered tenant without an activity and
+per active timer, i.e. tenant with a running activity, measured with tracemalloc.
+
+Usage: python -m bench.tenant_memory [--tenants 100000] [--cycles]
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from argparse import ArgumentParser
+import gc
+import tracemalloc
+from pomidorka.core import Settings
+from pomidorka.daemon import TimerDaemon
+from pomidorka.timers import SimulatedClock
+
+
+def _allocated():
+    """
+    @return: bytes currently allocated by Python objects
+    @rtype: int
+    """
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def run(tenants=100000, cycles=False):
+    """
+    Run the benchmark
+    @param tenants: number of registered tenants, every one runs a work activity
+    @type tenants: int
+    @param cycles: whether tenants follow pomodoro cycles
+    @type cycles: bool
+    @return: benchmark results
+    @rtype: dict
+    """
+    clock = SimulatedClock()
+    daemon = TimerDaemon(clock.scheduler)
+    settings = Settings()
+    userIds = [str(userId) for userId in range(tenants)]
+    tracemalloc.start()
+    try:
+        started = _allocated()
+        for userId in userIds:
+            daemon.addUser(userId, settings)
+            if cycles:
+                daemon.getCycle(userId)
+        registered = _allocated()
+        for userId in userIds:
+            daemon.getManager(userId).startWorkActivity()
+        active = _allocated()
+    finally:
+        tracemalloc.stop()
+    return {
+        'tenants': tenants,
+        'cycles': cycles,
+        'activeTimers': len(clock.scheduler),
+        'bytesPerTenant': (registered - started) / float(tenants),
+        'bytesPerActiveTimer': (active - registered) / float(tenants),
+        'bytesPerActiveTenant': (active - started) / float(tenants),
+    }
+
+
+def main():
+    """Run the benchmark with command line parameters and print results"""
+    parser = ArgumentParser(description='Timer daemon memory benchmark')
+    parser.add_argument('--tenants', type=int, default=100000)
+    parser.add_argument('--cycles', action='store_true')
+    arguments = parser.parse_args()
+    result = run(arguments.tenants, arguments.cycles)
+    print('{tenants} tenants, {activeTimers} active timers: {bytesPerTenant:.0f} bytes per '
+          'idle tenant, {bytesPerActiveTimer:.0f} bytes per active timer, '
+          '{bytesPerActiveTenant:.0f} bytes per active tenant'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
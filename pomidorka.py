@@ -31,8 +31,140 @@ Starter module for the Pomidorka app - the support tool for pomodoro technique
 __author__ = 'Andrey Vasilev <vamonster@gmail.com>'
 
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
+import datetime
 import logging
-from pomidorka import gui
+import os
+import sys
+
+
+def showStatistics(historyPath, period):
+    """
+    Print productivity statistics of the history log
+    @param historyPath: path to the history log, the one from the settings if None
+    @type historyPath: str
+    @param period: name of aggregation period: daily, weekly or hourly
+    @type period: str
+    @return: exit code
+    @rtype: int
+    """
+    from pomidorka.history import HistoryStore
+    from pomidorka.stats import ProductivityStatistics
+    if historyPath is None:
+        historyPath = loadSettings().historyFile
+    historyPath = os.path.expanduser(historyPath)
+    if not os.path.exists(historyPath):
+        logging.error('History log %s does not exist', historyPath)
+        return 1
+    store = HistoryStore(historyPath, readOnly=True)
+    statistics = ProductivityStatistics()
+    statistics.loadHistory(store)
+    store.close()
+    print('{0:<12}{1:>10}{2:>13}{3:>12}{4:>12}{5:>12}'.format(
+        period.capitalize(), 'Completed', 'Interrupted', 'Rate', 'Focus', 'Paused'))
+    for row in getattr(statistics, period)():
+        print('{0!s:<12}{1:>10}{2:>13}{3:>11.0%}{4:>10.0f} m{5:>10.0f} m'.format(
+            row.period, row.completed, row.interrupted, row.interruptionRate,
+            row.focusTime / 60, row.pausedTime / 60))
+    current, longest = statistics.streaks(datetime.date.today())
+    print('Streak: {0} days, longest: {1} days'.format(current, longest))
+    return 0
+
+
+def loadSettings():
+    """
+    Load settings of the user
+    @return: loaded settings, defaults if the settings file is invalid
+    @rtype: Settings
+    """
+    from pomidorka.config import SettingsFile, SettingsError
+    settingsFile = SettingsFile()
+    try:
+        return settingsFile.load()
+    except SettingsError as error:
+        logging.error('Default settings are used: %s', error)
+        return settingsFile.settings
+
+
+def controlRunningInstance(action):
+    """
+    Send a command to the running application and print its status
+    @param action: command to send
+    @type action: str
+    @return: exit code
+    @rtype: int
+    """
+    from pomidorka.control import ControlError, sendCommand
+    try:
+        response = sendCommand(action)
+    except ControlError as error:
+        logging.error('%s', error)
+        return 2
+    if not response['ok']:
+        logging.error('%s', response['error'])
+        return 1
+    status = response['status']
+    if status['running']:
+        minutes, seconds = divmod(status['remainingTime'], 60)
+        print('{0}: {1:02d}:{2:02d} left{3}'.format(status['kind'], minutes, seconds,
+                                                   ' (paused)' if status['paused'] else ''))
+    else:
+        print('idle')
+    if 'wakeupsPerMinute' in status:
+        print('timer wakeups: {0:.1f} per minute'.format(status['wakeupsPerMinute']))
+    return 0
+
+
+def enableProfiling(tracePath):
+    """
+    Start collecting measurements of hot paths and report them on exit
+    @param tracePath: file for the Chrome trace, the summary is logged if empty
+    @type tracePath: str
+    """
+    import atexit
+    from pomidorka.profiling import PROFILER
+    PROFILER.enable(trace=bool(tracePath))
+
+    def report():
+        PROFILER.disable()
+        if tracePath:
+            PROFILER.writeChromeTrace(tracePath)
+            logging.info('Profiling trace is written to %s', tracePath)
+        else:
+            logging.info('Profiling summary:\n%s', PROFILER.summary())
+
+    atexit.register(report)
+
+
+def startSingleInstance(initialCommand):
+    """
+    Start the application unless it is already running, otherwise pass the command to the
+    running instance: the requested activity start or showing its window
+    @param initialCommand: command to execute after start or None
+    @type initialCommand: str
+    @return: exit code
+    @rtype: int
+    """
+    from pomidorka.control import ControlError, InstanceLock, forwardToRunningInstance
+    try:
+        lock = InstanceLock()
+        acquired = lock.acquire()
+    except ControlError as error:
+        logging.error('%s', error)
+        return 2
+    if not acquired:
+        logging.debug('Application is already running, forwarding command')
+        try:
+            response = forwardToRunningInstance(initialCommand or 'show')
+        except ControlError as error:
+            logging.error('%s', error)
+            return 2
+        if not response['ok']:
+            logging.error('%s', response['error'])
+            return 1
+        return 0
+    from pomidorka import gui
+    return gui.startApplication(initialCommand)
+
 
 if __name__ == '__main__':
     app_license = '''
@@ -50,9 +182,29 @@ if __name__ == '__main__':
                             formatter_class=RawDescriptionHelpFormatter)
     parser.add_argument('-v', '--verbose', help='show verbose information during run',
                         action='store_true')
+    parser.add_argument('--start', choices=['work', 'short', 'long', 'next'],
+                        help='start an activity, in the already running instance if any')
+    parser.add_argument('--profile', nargs='?', const='', metavar='FILE',
+                        help='measure hot paths and print a summary on exit, or write a '
+                             'Chrome trace to FILE')
+    commands = parser.add_subparsers(dest='command')
+    statsParser = commands.add_parser('stats', help='show productivity statistics')
+    statsParser.add_argument('--history', help='path to the activity history log, the '
+                                               'one from the settings by default')
+    statsParser.add_argument('--period', choices=['daily', 'weekly', 'hourly'],
+                             default='daily', help='aggregation period')
+    controlParser = commands.add_parser('ctl', help='control the running application')
+    controlParser.add_argument('action', help='command to send: work, short, long, next, '
+                                              'pause, resume, stop, status')
     arguments = parser.parse_args()
     logLevel = logging.INFO
     if arguments.verbose:
         logLevel = logging.DEBUG
     logging.basicConfig(format='%(levelname)s:%(message)s', level=logLevel)
-    gui.startApplication()
+    if arguments.profile is not None:
+        enableProfiling(arguments.profile)
+    if arguments.command == 'stats':
+        sys.exit(showStatistics(arguments.history, arguments.period))
+    if arguments.command == 'ctl':
+        sys.exit(controlRunningInstance(arguments.action))
+    sys.exit(startSingleInstance(arguments.start))
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+End of activity actions: external commands run without a shell on a bounded pool of
+reusable worker threads. Every command gets its own session, so a timeout or cancellation
+stops the whole process group, and every started process is waited for, so hung commands
+neither pile up nor leave zombies. Submitting actions never blocks the caller.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from pomidorka.core import EventHook
+from pomidorka.profiling import PROFILER
+
+"""Outcomes of an action"""
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+TIMED_OUT = 'timedOut'
+CANCELLED = 'cancelled'
+
+"""Time given to a stopped action to exit after SIGTERM before it is killed, seconds"""
+TERMINATION_GRACE = 2.0
+
+"""
+Outcome of an action: the command, kind of the ended activity, one of the outcomes above,
+exit code or None if the process did not exit by itself and duration in seconds
+"""
+ActionResult = namedtuple('ActionResult', ['command', 'kind', 'status', 'exitCode',
+                                           'duration'])
+
+
+class ActionMetrics:
+    """Numbers of outcomes, exit statuses and durations of actions by executable name"""
+
+    def __init__(self):
+        self.__actions = {}
+        self.__lock = threading.Lock()
+
+    def add(self, result):
+        """
+        Account an action outcome
+        @param result: outcome of the action
+        @type result: ActionResult
+        """
+        name = os.path.basename(result.command[0])
+        with self.__lock:
+            action = self.__actions.get(name)
+            if action is None:
+                action = {'count': 0, SUCCEEDED: 0, FAILED: 0, TIMED_OUT: 0, CANCELLED: 0,
+                          'totalDuration': 0.0, 'maxDuration': 0.0, 'lastExitCode': None}
+                self.__actions[name] = action
+            action['count'] += 1
+            action[result.status] += 1
+            action['totalDuration'] += result.duration
+            action['maxDuration'] = max(action['maxDuration'], result.duration)
+            action['lastExitCode'] = result.exitCode
+
+    def summary(self):
+        """
+        @return: copy of the metrics by executable name
+        @rtype: dict
+        """
+        with self.__lock:
+            return dict((name, dict(action)) for name, action in self.__actions.items())
+
+
+class ActionHandle:
+    """Submitted action, which can be cancelled before or while it runs"""
+
+    def __init__(self, command, kind, timeout):
+        self.command = command
+        self.kind = kind
+        self.timeout = timeout
+        self.future = None
+        self.__process = None
+        self.__cancelled = False
+        self.__lock = threading.Lock()
+
+    def cancel(self):
+        """Cancel the action, a running process is terminated"""
+        with self.__lock:
+            self.__cancelled = True
+            process = self.__process
+        if self.future is not None:
+            self.future.cancel()
+        if process is not None:
+            _signalGroup(process, signal.SIGTERM)
+
+    def isCancelled(self):
+        """
+        @return: whether the action was cancelled
+        @rtype: bool
+        """
+        return self.__cancelled
+
+    def result(self, timeout=None):
+        """
+        Wait for the outcome of the action
+        @param timeout: longest wait in seconds or None to wait until the action ends
+        @type timeout: float
+        @return: outcome of the action
+        @rtype: ActionResult
+        """
+        if self.future.cancelled():
+            return ActionResult(self.command, self.kind, CANCELLED, None, 0.0)
+        return self.future.result(timeout)
+
+    def _attach(self, process):
+        """
+        Remember the started process
+        @return: False if the action was cancelled meanwhile
+        @rtype: bool
+        """
+        with self.__lock:
+            if self.__cancelled:
+                return False
+            self.__process = process
+            return True
+
+
+def _signalGroup(process, signalNumber):
+    """Send a signal to the process group of an action, ignoring exited ones"""
+    try:
+        os.killpg(process.pid, signalNumber)
+    except OSError:
+        pass
+
+
+class ActionRunner:
+    """
+    Runner of end of activity actions. At most the given number of actions run at once,
+    the others wait in order of submission. The finished hook is fired on the worker
+    thread, subscribers touching the user interface need an executor.
+    """
+
+    def __init__(self, workers=2, timeout=60.0):
+        """
+        @param workers: number of actions running at once
+        @type workers: int
+        @param timeout: default longest duration of an action in seconds
+        @type timeout: float
+        """
+        self.__pool = ThreadPoolExecutor(workers, thread_name_prefix='ActionRunner')
+        self.__timeout = timeout
+        self.__pending = set()
+        self.__lock = threading.Lock()
+        self.metrics = ActionMetrics()
+        self.finished = EventHook('ActionRunner.finished')
+
+    def run(self, commands, kind=None, timeout=None):
+        """
+        Submit actions, returning at once
+        @param commands: commands as lists of arguments
+        @type commands: list
+        @param kind: kind of the ended activity, passed to the results
+        @type kind: str
+        @param timeout: longest duration of every action in seconds, the runner default
+        if omitted
+        @type timeout: float
+        @return: handles of the submitted actions
+        @rtype: list
+        """
+        handles = []
+        for command in commands:
+            handle = ActionHandle(list(command), kind, timeout or self.__timeout)
+            with self.__lock:
+                self.__pending.add(handle)
+            handle.future = self.__pool.submit(self._execute, handle)
+            handle.future.add_done_callback(lambda _, handle=handle: self._forget(handle))
+            handles.append(handle)
+        return handles
+
+    def cancel(self):
+        """Cancel all waiting and running actions"""
+        with self.__lock:
+            handles = list(self.__pending)
+        for handle in handles:
+            handle.cancel()
+
+    def close(self):
+        """Cancel all actions and stop the workers once the processes have exited"""
+        self.cancel()
+        self.__pool.shutdown(wait=True)
+
+    def _forget(self, handle):
+        """Drop a finished or cancelled action from the pending ones"""
+        with self.__lock:
+            self.__pending.discard(handle)
+        if handle.future.cancelled():
+            self.metrics.add(handle.result())
+
+    def _execute(self, handle):
+        """
+        Run an action on a worker thread
+        @param handle: the action
+        @type handle: ActionHandle
+        @return: outcome of the action
+        @rtype: ActionResult
+        """
+        started = time.perf_counter()
+        exitCode = None
+        try:
+            process = subprocess.Popen(handle.command, stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.DEVNULL, start_new_session=True)
+        except OSError as error:
+            logging.warning('Unable to start action %s: %s', handle.command[0], error)
+            status = FAILED
+        else:
+            if not handle._attach(process):
+                _signalGroup(process, signal.SIGTERM)
+            try:
+                exitCode = process.wait(handle.timeout)
+            except subprocess.TimeoutExpired:
+                logging.warning('Action %s timed out after %s s', handle.command[0],
+                                handle.timeout)
+                _signalGroup(process, signal.SIGTERM)
+                try:
+                    process.wait(TERMINATION_GRACE)
+                except subprocess.TimeoutExpired:
+                    _signalGroup(process, signal.SIGKILL)
+                    process.wait()
+                status = TIMED_OUT
+            else:
+                if handle.isCancelled():
+                    status, exitCode = CANCELLED, None
+                else:
+                    status = SUCCEEDED if exitCode == 0 else FAILED
+        finished = time.perf_counter()
+        result = ActionResult(handle.command, handle.kind, status, exitCode,
+                              finished - started)
+        logging.debug('Action %s %s in %.3f s', handle.command[0], status, result.duration)
+        if PROFILER.enabled:
+            PROFILER.record('action:' + os.path.basename(handle.command[0]), started, finished)
+        self.metrics.add(result)
+        self.finished.fire(result)
+        return result
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Asyncio integration: activity manager with awaitable activities. Activity timers are
+deadlines on the event loop, so no task is created per activity or per tick.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import asyncio
+from pomidorka.core import ActivityManager
+from pomidorka.timers import AsyncioOneSecondTimer
+
+
+class AsyncActivityManager(ActivityManager):
+    """
+    Activity manager running on an asyncio event loop. Besides the usual methods it
+    provides coroutines, which start an activity and return its record when it ends.
+    """
+
+    def __init__(self, settings, loop=None, history=None):
+        """
+        @param settings: the timer settings
+        @type settings: Settings
+        @param loop: event loop to run timers on, the running loop is used if omitted
+        @type loop: asyncio.AbstractEventLoop
+        @param history: storage to append records of finished activities to
+        @type history: HistoryStore
+        """
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        ActivityManager.__init__(self, settings, lambda: AsyncioOneSecondTimer(loop), history)
+        self.__loop = loop
+        self.__finished = None
+        self.activityRecorded += self._resolveFinished
+
+    async def startWorkActivityAsync(self):
+        """
+        Start working period and wait for its end
+        @return: record of the finished activity
+        @rtype: ActivityRecord
+        """
+        return await self._waitActivity(self.startWorkActivity)
+
+    async def startShortBreakActivityAsync(self):
+        """
+        Start short break session and wait for its end
+        @return: record of the finished activity
+        @rtype: ActivityRecord
+        """
+        return await self._waitActivity(self.startShortBreakActivity)
+
+    async def startLongBreakActivityAsync(self):
+        """
+        Start long break session and wait for its end
+        @return: record of the finished activity
+        @rtype: ActivityRecord
+        """
+        return await self._waitActivity(self.startLongBreakActivity)
+
+    def _waitActivity(self, startActivity):
+        """
+        Start an activity and get a future resolved with its record. Cancelling the future
+        does not stop the activity.
+        @param startActivity: method starting the activity
+        @type startActivity: function
+        @return: future of the activity record
+        @rtype: asyncio.Future
+        """
+        if self.currentActivity() is not None:
+            raise RuntimeError('Another activity is running')
+        self.__finished = self.__loop.create_future()
+        finished = self.__finished
+        startActivity()
+        return finished
+
+    def _resolveFinished(self, record):
+        """
+        Pass the record of the finished activity to the waiting coroutine
+        @param record: record of the finished activity
+        @type record: ActivityRecord
+        """
+        finished, self.__finished = self.__finished, None
+        if finished is not None and not finished.done():
+            finished.set_result(record)
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Alarm sound playback. The sound is decoded once and replayed from memory"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from collections import deque
+import logging
+import subprocess
+import threading
+import time
+from pomidorka.profiling import PROFILER
+
+"""Policies of handling an alarm requested while another one is playing"""
+DROP = 'drop'
+QUEUE = 'queue'
+RESTART = 'restart'
+
+"""Format of the decoded sound: signed 16 bit little endian stereo samples"""
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_WIDTH = 2
+
+
+def decodeMp3(path):
+    """
+    Decode mp3 file into raw PCM data using mpg123
+    @param path: path to the mp3 file
+    @type path: str
+    @return: decoded sound in the module sound format
+    @rtype: bytes
+    """
+    logging.debug('Decoding alarm sound %s', path)
+    return subprocess.check_output(['mpg123', '-q', '-s', '--stereo', '-r', str(SAMPLE_RATE),
+                                    path])
+
+
+def decodeMp3Data(data):
+    """
+    Decode mp3 data held in memory into raw PCM data using mpg123
+    @param data: contents of an mp3 file
+    @type data: bytes
+    @return: decoded sound in the module sound format
+    @rtype: bytes
+    """
+    logging.debug('Decoding alarm sound of %d bytes', len(data))
+    return subprocess.run(['mpg123', '-q', '-s', '--stereo', '-r', str(SAMPLE_RATE), '-'],
+                          input=data, stdout=subprocess.PIPE, check=True).stdout
+
+
+class AudioSink:
+    """
+    Abstract class for a destination of PCM data. Write blocks until the sink is ready to
+    accept the next portion of data.
+    """
+
+    def write(self, data):
+        """
+        Write a chunk of sound data to the sink
+        @param data: PCM data in the module sound format
+        @type data: bytes
+        """
+        pass
+
+    def close(self):
+        """Release resources held by the sink"""
+        pass
+
+
+class PipeAudioSink(AudioSink):
+    """
+    Sink sending sound to the standard input of a long-lived player process. The process
+    is started on the first write and restarted if it dies.
+    """
+
+    def __init__(self, command):
+        """
+        @param command: player command line reading raw PCM from standard input
+        @type command: list
+        """
+        self.__command = command
+        self.__process = None
+        self.__startFailed = False
+
+    def write(self, data):
+        """
+        Write a chunk of sound data to the player, the chunk is dropped if the player can
+        not be started
+        @param data: PCM data in the module sound format
+        @type data: bytes
+        """
+        try:
+            if self.__process is None or self.__process.poll() is not None:
+                logging.debug('Starting sound player: %s', ' '.join(self.__command))
+                self.__process = subprocess.Popen(self.__command, stdin=subprocess.PIPE)
+        except (IOError, OSError) as error:
+            if not self.__startFailed:
+                logging.error('Unable to start sound player %s: %s', self.__command[0],
+                              error)
+                self.__startFailed = True
+            self.__process = None
+            return
+        self.__startFailed = False
+        try:
+            self.__process.stdin.write(data)
+            self.__process.stdin.flush()
+        except (IOError, OSError):
+            logging.warning('Sound player terminated unexpectedly')
+            self.__process = None
+
+    def close(self):
+        """Stop the player process"""
+        if self.__process is not None:
+            self.__process.stdin.close()
+            self.__process.wait()
+            self.__process = None
+
+
+class MemoryAudioSink(AudioSink):
+    """
+    Pure Python sink, which stores the written data instead of playing it. With realTime
+    enabled writes take as much time as the sound would play, which allows checking
+    overlapping alarms without a sound card.
+    """
+
+    def __init__(self, realTime=False):
+        """
+        @param realTime: whether writes must last for the duration of the written sound
+        @type realTime: bool
+        """
+        self.__realTime = realTime
+        self.chunks = []
+
+    def write(self, data):
+        """
+        Store a chunk of sound data together with the moment it was written
+        @param data: PCM data in the module sound format
+        @type data: bytes
+        """
+        self.chunks.append((time.monotonic(), data))
+        if self.__realTime:
+            time.sleep(len(data) / float(SAMPLE_RATE * CHANNELS * SAMPLE_WIDTH))
+
+
+class LatencyStatistics:
+    """Summary of delays between alarm requests and the start of their playback"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.last = 0.0
+
+    def add(self, latency):
+        """
+        Account one more measured delay
+        @param latency: delay in seconds
+        @type latency: float
+        """
+        self.count += 1
+        self.total += latency
+        self.maximum = max(self.maximum, latency)
+        self.last = latency
+
+    def mean(self):
+        """
+        @return: average delay in seconds
+        @rtype: float
+        """
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+
+class AlarmPlayer:
+    """
+    Long-lived alarm player. Sound is decoded once by a worker thread and replayed from
+    memory on every request, so an alarm costs neither a fork nor decoding.
+    """
+
+    def __init__(self, decoder, sink, policy=RESTART, chunkDuration=0.05):
+        """
+        @param decoder: function returning the sound in the module sound format
+        @type decoder: function
+        @param sink: destination of the sound
+        @type sink: AudioSink
+        @param policy: what to do with an alarm requested while another one plays
+        @type policy: str
+        @param chunkDuration: duration of sound written at once in seconds, playback can
+        be interrupted only between chunks
+        @type chunkDuration: float
+        """
+        if policy not in (DROP, QUEUE, RESTART):
+            raise ValueError('Unknown alarm overlap policy: {0}'.format(policy))
+        self.__decoder = decoder
+        self.__sink = sink
+        self.__policy = policy
+        self.__chunkSize = int(SAMPLE_RATE * chunkDuration) * CHANNELS * SAMPLE_WIDTH
+        self.__requests = deque()
+        self.__condition = threading.Condition()
+        self.__playing = False
+        self.__interrupted = False
+        self.__closed = False
+        self.latency = LatencyStatistics()
+        self.__worker = threading.Thread(target=self._run, name='AlarmPlayer')
+        self.__worker.daemon = True
+        self.__worker.start()
+
+    def play(self):
+        """Request the alarm to be played according to the overlap policy"""
+        requestTime = time.perf_counter()
+        if PROFILER.enabled:
+            PROFILER.count('AlarmPlayer.requests')
+        with self.__condition:
+            busy = self.__playing or self.__requests
+            if busy and self.__policy == DROP:
+                logging.debug('Alarm is already playing, request dropped')
+                return
+            if busy and self.__policy == RESTART:
+                self.__requests.clear()
+                self.__interrupted = self.__playing
+            self.__requests.append(requestTime)
+            self.__condition.notify()
+
+    def close(self):
+        """Stop playback and the worker thread"""
+        with self.__condition:
+            self.__closed = True
+            self.__interrupted = True
+            self.__condition.notify()
+        self.__worker.join()
+        self.__sink.close()
+
+    def _run(self):
+        """Worker thread body: decode the sound and play requested alarms"""
+        try:
+            sound = self.__decoder()
+        except (IOError, OSError, subprocess.CalledProcessError):
+            logging.exception('Unable to decode alarm sound')
+            sound = b''
+        while True:
+            with self.__condition:
+                while not self.__requests and not self.__closed:
+                    self.__condition.wait()
+                if self.__closed:
+                    return
+                requestTime = self.__requests.popleft()
+                self.__playing = True
+                self.__interrupted = False
+            self._playSound(sound, requestTime)
+            with self.__condition:
+                self.__playing = False
+
+    def _playSound(self, sound, requestTime):
+        """
+        Write the sound to the sink chunk by chunk until it ends or gets interrupted
+        @param sound: decoded sound
+        @type sound: bytes
+        @param requestTime: moment the alarm was requested at
+        @type requestTime: float
+        """
+        playbackStarted = time.perf_counter()
+        self.latency.add(playbackStarted - requestTime)
+        if PROFILER.enabled:
+            PROFILER.record('AlarmPlayer.latency', requestTime, playbackStarted)
+        for offset in range(0, len(sound), self.__chunkSize):
+            if self.__interrupted:
+                logging.debug('Alarm playback interrupted')
+                return
+            self.__sink.write(sound[offset:offset + self.__chunkSize])
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Checkpoint of the current activity, which lets a restarted application continue it.
+
+The state is kept in a small fixed-size file holding the kind, planned duration, start
+time and either the absolute wall clock deadline of a running activity or the remaining
+time of a paused one. The file is written only on state transitions: start, pause, resume
+and end. Ticks never touch it. Every write goes to a temporary file, which is synced and
+atomically renamed over the checkpoint, so a crash leaves either the old or the new state.
+The deadline is stored in wall clock time, because monotonic clocks start anew after a
+reboot, and time spent while the application was not running counts as activity time.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from collections import namedtuple
+import logging
+import os
+import struct
+import zlib
+from pomidorka.core import WORK, SHORT_BREAK, LONG_BREAK
+
+"""Checkpoint file layout: magic, version, state, kind, planned duration, start time,
+deadline, pause start, remaining time, paused duration, pause count and CRC32 of the
+preceding fields"""
+_RECORD = struct.Struct('<4sHBBIdddddH2xI')
+_MAGIC = b'PMDC'
+_VERSION = 1
+
+"""States of the checkpointed activity"""
+IDLE = 0
+RUNNING = 1
+PAUSED = 2
+
+"""Codes of activity kinds stored in the checkpoint"""
+_KIND_CODES = {WORK: 0, SHORT_BREAK: 1, LONG_BREAK: 2}
+_KINDS = dict((code, kind) for kind, code in _KIND_CODES.items())
+
+"""
+Checkpointed activity. The wall clock deadline is meaningful for a running activity, the
+pause start and remaining time for a paused one.
+"""
+Checkpoint = namedtuple('Checkpoint', ['state', 'kind', 'plannedDuration', 'startTime',
+                                       'deadline', 'pausedSince', 'remainingTime',
+                                       'pausedDuration', 'pauseCount'])
+
+
+def snapshot(activity):
+    """
+    Capture the state of an activity
+    @param activity: running or paused activity
+    @type activity: Activity
+    @return: checkpoint of the activity
+    @rtype: Checkpoint
+    """
+    pausedSince = activity.pausedSince()
+    return Checkpoint(RUNNING if pausedSince is None else PAUSED, activity.kind,
+                      activity.maxTimeInterval, activity.startTime, activity.wallDeadline(),
+                      pausedSince or 0.0, activity.exactRemainingTime(),
+                      activity.pausedDuration, activity.pauseCount)
+
+
+def restoreCheckpoint(manager, checkpoint):
+    """
+    Continue a checkpointed activity in a manager without a current activity
+    @param manager: manager to run the activity
+    @type manager: ActivityManager
+    @param checkpoint: state of the activity
+    @type checkpoint: Checkpoint
+    @return: restored activity or None if nothing is left of it
+    @rtype: Activity
+    """
+    if checkpoint.state == IDLE:
+        return None
+    pausedSince = checkpoint.pausedSince if checkpoint.state == PAUSED else None
+    return manager.restoreActivity(checkpoint.kind, checkpoint.plannedDuration,
+                                   checkpoint.startTime, checkpoint.deadline,
+                                   checkpoint.remainingTime, checkpoint.pausedDuration,
+                                   checkpoint.pauseCount, pausedSince)
+
+
+def _packCheckpoint(checkpoint):
+    """
+    @param checkpoint: checkpoint to be stored
+    @type checkpoint: Checkpoint
+    @return: record of the checkpoint file
+    @rtype: bytes
+    """
+    values = (_MAGIC, _VERSION, checkpoint.state, _KIND_CODES.get(checkpoint.kind, 0)) + \
+        tuple(checkpoint[2:]) + (0,)
+    data = _RECORD.pack(*values)
+    return data[:-4] + struct.pack('<I', zlib.crc32(data[:-4]) & 0xffffffff)
+
+
+def _unpackCheckpoint(data):
+    """
+    @param data: contents of the checkpoint file
+    @type data: bytes
+    @return: stored checkpoint or None if the data are not a valid checkpoint
+    @rtype: Checkpoint
+    """
+    if len(data) != _RECORD.size:
+        return None
+    values = _RECORD.unpack(data)
+    if values[0] != _MAGIC or values[1] != _VERSION or values[3] not in _KINDS or \
+            zlib.crc32(data[:-4]) & 0xffffffff != values[-1]:
+        return None
+    return Checkpoint(values[2], _KINDS[values[3]], *values[4:-1])
+
+
+class CheckpointStore:
+    """
+    Fixed-size file holding the state of the current activity of an activity manager
+    """
+
+    def __init__(self, path):
+        """
+        @param path: path to the checkpoint file, its directory is created if needed. The
+        file must not be in the runtime directory, which is removed on logout.
+        @type path: str
+        """
+        self.path = path
+        self.writes = 0
+
+    def load(self):
+        """
+        Read the checkpoint
+        @return: stored checkpoint or None if it is missing or damaged
+        @rtype: Checkpoint
+        """
+        try:
+            with open(self.path, 'rb') as checkpointFile:
+                data = checkpointFile.read(_RECORD.size + 1)
+        except (IOError, OSError):
+            return None
+        checkpoint = _unpackCheckpoint(data)
+        if checkpoint is None:
+            logging.warning('Damaged activity checkpoint %s is ignored', self.path)
+        return checkpoint
+
+    def save(self, activity):
+        """
+        Store the state of an activity
+        @param activity: running or paused activity
+        @type activity: Activity
+        """
+        self._write(snapshot(activity))
+
+    def clear(self):
+        """Store that no activity is running"""
+        self._write(Checkpoint(IDLE, WORK, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0))
+
+    def _write(self, checkpoint):
+        """
+        Atomically replace the checkpoint file
+        @param checkpoint: new contents of the file
+        @type checkpoint: Checkpoint
+        """
+        directory = os.path.dirname(self.path)
+        temporaryPath = self.path + '.tmp'
+        try:
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(temporaryPath, 'wb') as temporary:
+                temporary.write(_packCheckpoint(checkpoint))
+                temporary.flush()
+                os.fsync(temporary.fileno())
+            os.replace(temporaryPath, self.path)
+        except (IOError, OSError) as error:
+            logging.warning('Unable to write activity checkpoint: %s', error)
+            return
+        self.writes += 1
+
+    def restore(self, manager):
+        """
+        Continue the checkpointed activity with a single read of the file. Must be called
+        before anything else starts an activity of the manager.
+        @param manager: manager to run the activity
+        @type manager: ActivityManager
+        @return: restored activity or None if there is nothing to continue
+        @rtype: Activity
+        """
+        checkpoint = self.load()
+        if checkpoint is None or checkpoint.state == IDLE:
+            return None
+        logging.debug('Restoring %s activity from checkpoint', checkpoint.kind)
+        activity = restoreCheckpoint(manager, checkpoint)
+        if activity is None:
+            self.clear()
+        return activity
+
+    def connect(self, manager):
+        """
+        Keep the checkpoint in sync with the current activity of a manager
+        @param manager: manager to be followed
+        @type manager: ActivityManager
+        """
+        manager.activityStarted += self.save
+        manager.activityPaused += self.save
+        manager.activityResumed += self.save
+        manager.activityRecorded += self._activityRecorded
+
+    def _activityRecorded(self, _):
+        """Forget the ended activity"""
+        self.clear()
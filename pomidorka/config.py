@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Persistent settings. Settings are kept in a human-editable INI file and validated once
+when the file is read. Validated values are saved to a marshal cache, so while the file
+stays unchanged startup loads them without parsing. The file is watched by cheap mtime
+polling and changes are applied to the shared Settings object in place, so new periods
+take effect with the next activity.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import logging
+import marshal
+import os
+from pomidorka.core import EventHook, Settings
+
+"""Name of the INI file section holding the settings"""
+SECTION = 'pomidorka'
+
+"""Version of the cache format, a cache of another version is ignored"""
+CACHE_VERSION = 1
+
+"""Longest allowed activity period in seconds, the tray icon shows at most 60 minutes"""
+MAX_PERIOD = 60 * 60
+
+"""Header of the settings file created with default values"""
+_FILE_HEADER = '''\
+# Pomidorka settings, changes are applied to the next activity.
+# Periods are in seconds, up to an hour. Every longBreakInterval-th work period is
+# followed by a long break, autoStart makes the next activity of the cycle start by itself.
+# workEndActions and breakEndActions hold one command per indented line, commands are run
+# without a shell and stopped after actionTimeout seconds. actionWorkers, historyFile and
+# checkpointFile are read on start only.
+'''
+
+
+def defaultSettingsPath():
+    """
+    Get path of the settings file of the current user
+    @return: path to the settings file
+    @rtype: str
+    """
+    directory = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    return os.path.join(directory, 'pomidorka', 'settings.ini')
+
+
+def defaultCachePath():
+    """
+    Get path of the precompiled settings cache of the current user
+    @return: path to the cache file
+    @rtype: str
+    """
+    directory = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(directory, 'pomidorka', 'settings.cache')
+
+
+class SettingsError(Exception):
+    """Invalid settings file"""
+    pass
+
+
+def _parsePeriod(text):
+    """Convert a period in seconds"""
+    value = int(text)
+    if not 0 < value <= MAX_PERIOD:
+        raise ValueError('must be between 1 and {0} seconds'.format(MAX_PERIOD))
+    return value
+
+
+def _parseInterval(text):
+    """Convert a number of work periods"""
+    value = int(text)
+    if value < 1:
+        raise ValueError('must be positive')
+    return value
+
+
+def _parseFlag(text):
+    """Convert a yes or no value"""
+    value = {'yes': True, 'true': True, 'on': True, '1': True,
+             'no': False, 'false': False, 'off': False, '0': False}.get(text.lower())
+    if value is None:
+        raise ValueError('must be yes or no')
+    return value
+
+
+def _formatFlag(value):
+    """Convert a flag to the file value"""
+    return 'yes' if value else 'no'
+
+
+def _parseCommand(text):
+    """Convert a command line to the list of arguments"""
+    import shlex
+    command = shlex.split(text)
+    if not command:
+        raise ValueError('must not be empty')
+    return command
+
+
+def _parseCommands(text):
+    """Convert lines of command lines to the list of commands"""
+    import shlex
+    return [shlex.split(line) for line in text.splitlines() if line.strip()]
+
+
+def _formatCommands(commands):
+    """Convert the list of commands to indented lines of command lines"""
+    return ''.join('\n    ' + _formatCommand(command) for command in commands)
+
+
+def _parseCount(text):
+    """Convert a positive number"""
+    value = int(text)
+    if value < 1:
+        raise ValueError('must be positive')
+    return value
+
+
+def _parsePolicy(text):
+    """Check an alarm overlap policy"""
+    from pomidorka.alarm import DROP, QUEUE, RESTART
+    if text not in (DROP, QUEUE, RESTART):
+        raise ValueError('must be one of {0}, {1}, {2}'.format(DROP, QUEUE, RESTART))
+    return text
+
+
+def _formatCommand(command):
+    """Convert the list of arguments to a command line"""
+    import shlex
+    return ' '.join(shlex.quote(argument) for argument in command)
+
+
+"""Converters of the file values by setting name"""
+_PARSERS = {
+    'workPeriod': _parsePeriod,
+    'shortRestPeriod': _parsePeriod,
+    'longRestPeriod': _parsePeriod,
+    'longBreakInterval': _parseInterval,
+    'autoStart': _parseFlag,
+    'alarmFile': str,
+    'alarmPlayerCommand': _parseCommand,
+    'alarmOverlapPolicy': _parsePolicy,
+    'workEndActions': _parseCommands,
+    'breakEndActions': _parseCommands,
+    'actionTimeout': _parsePeriod,
+    'actionWorkers': _parseCount,
+    'historyFile': str,
+    'checkpointFile': str,
+}
+
+"""Converters of the settings to the file values by setting name"""
+_FORMATTERS = {'alarmPlayerCommand': _formatCommand, 'autoStart': _formatFlag,
+               'workEndActions': _formatCommands, 'breakEndActions': _formatCommands}
+
+
+def parseSettings(text, source='<string>'):
+    """
+    Parse and validate the contents of a settings file
+    @param text: contents of the file
+    @type text: str
+    @param source: name of the file used in error messages
+    @type source: str
+    @return: values of the settings present in the file by setting name
+    @rtype: dict
+    @raise SettingsError: if the file is malformed or has invalid values
+    """
+    import configparser
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.optionxform = str
+    try:
+        parser.read_string(text, source)
+    except configparser.Error as error:
+        raise SettingsError(str(error))
+    values = {}
+    for section in parser.sections():
+        if section != SECTION:
+            raise SettingsError('{0}: unknown section [{1}]'.format(source, section))
+        for name, text in parser.items(section):
+            if name not in _PARSERS:
+                raise SettingsError('{0}: unknown setting {1}'.format(source, name))
+            try:
+                values[name] = _PARSERS[name](text)
+            except ValueError as error:
+                raise SettingsError('{0}: invalid {1} = {2!r}: {3}'.format(source, name,
+                                                                          text, error))
+    return values
+
+
+def formatSettings(settings):
+    """
+    Format settings as the contents of a settings file
+    @param settings: settings to save
+    @type settings: Settings
+    @return: contents of the file
+    @rtype: str
+    """
+    lines = [_FILE_HEADER, '[{0}]'.format(SECTION)]
+    for name in _PARSERS:
+        value = getattr(settings, name)
+        lines.append('{0} = {1}'.format(name, _FORMATTERS.get(name, str)(value)))
+    return '\n'.join(lines) + '\n'
+
+
+class SettingsFile:
+    """
+    Settings file bound to one Settings object. Every load or successful reload updates
+    that object in place and fires the changed hook with it.
+    """
+
+    def __init__(self, path=None, cachePath=None, settings=None):
+        """
+        @param path: path to the settings file, the file of the current user by default
+        @type path: str
+        @param cachePath: path to the precompiled cache or None for the default one
+        @type cachePath: str
+        @param settings: object to update, a new one with default values if omitted
+        @type settings: Settings
+        """
+        self.path = path or defaultSettingsPath()
+        self.__cachePath = cachePath or defaultCachePath()
+        self.settings = settings or Settings()
+        self.changed = EventHook('SettingsFile.changed')
+        self.__signature = None
+
+    def load(self):
+        """
+        Read the settings, creating the file with default values if it does not exist
+        @return: the updated settings
+        @rtype: Settings
+        @raise SettingsError: if the file is invalid, the settings are left unchanged
+        """
+        signature = self._signature()
+        if signature is None:
+            self._createDefaultFile()
+            signature = self._signature()
+        self.__signature = signature
+        if signature is None:
+            self._apply({})
+            return self.settings
+        values = self._readCache(signature)
+        if values is None:
+            values = self._readFile()
+            self._writeCache(signature, values)
+        self._apply(values)
+        return self.settings
+
+    def poll(self):
+        """
+        Reload the settings if the file has changed since the last check. Invalid changes
+        are logged and ignored, the previous settings stay in effect.
+        @return: whether the settings were reloaded
+        @rtype: bool
+        """
+        signature = self._signature()
+        if signature == self.__signature or signature is None:
+            return False
+        self.__signature = signature
+        try:
+            values = self._readFile()
+        except SettingsError as error:
+            logging.warning('Settings are not reloaded: %s', error)
+            return False
+        self._writeCache(signature, values)
+        logging.debug('Settings are reloaded from %s', self.path)
+        self._apply(values)
+        return True
+
+    def _signature(self):
+        """
+        @return: modification time and size of the file or None if it does not exist
+        @rtype: tuple
+        """
+        try:
+            status = os.stat(self.path)
+        except OSError:
+            return None
+        return status.st_mtime_ns, status.st_size
+
+    def _readFile(self):
+        """Parse and validate the settings file"""
+        try:
+            with open(self.path) as settingsFile:
+                text = settingsFile.read()
+        except (IOError, OSError) as error:
+            raise SettingsError('Unable to read {0}: {1}'.format(self.path, error))
+        return parseSettings(text, self.path)
+
+    def _readCache(self, signature):
+        """
+        @return: values of the cache made for the file with the signature or None
+        @rtype: dict
+        """
+        try:
+            with open(self.__cachePath, 'rb') as cacheFile:
+                version, path, cachedSignature, values = marshal.load(cacheFile)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+        if (version, path, cachedSignature) != (CACHE_VERSION, self.path, signature):
+            return None
+        return values
+
+    def _writeCache(self, signature, values):
+        """Save validated values, failure to save only costs parsing on the next start"""
+        temporaryPath = '{0}.{1}'.format(self.__cachePath, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self.__cachePath), exist_ok=True)
+            with open(temporaryPath, 'wb') as cacheFile:
+                marshal.dump((CACHE_VERSION, self.path, signature, values), cacheFile)
+            os.replace(temporaryPath, self.__cachePath)
+        except (IOError, OSError) as error:
+            logging.debug('Settings cache is not saved: %s', error)
+
+    def _createDefaultFile(self):
+        """Save the default settings, so the user has a file to edit"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w') as settingsFile:
+                settingsFile.write(formatSettings(Settings()))
+        except (IOError, OSError) as error:
+            logging.warning('Unable to create settings file %s: %s', self.path, error)
+
+    def _apply(self, values):
+        """Update the settings object, settings missing in the file get default values"""
+        for name, default in vars(Settings()).items():
+            setattr(self.settings, name, values.get(name, default))
+        self.changed.fire(self.settings)
@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Local control of a running application through a Unix domain socket. Clients send one
+command per line and get one JSON object per line in response. The module does not depend
+on Qt, the server is attached to an event loop through a watcher of file descriptors.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import errno
+import fcntl
+import json
+import logging
+import os
+import selectors
+import socket
+import stat
+import time
+
+
+def defaultSocketPath():
+    """
+    Get path of the control socket of the current user
+    @return: path to the socket
+    @rtype: str
+    """
+    return _runtimePath('sock')
+
+
+def defaultLockPath():
+    """
+    Get path of the lock file guarding against several running instances
+    @return: path to the lock file
+    @rtype: str
+    """
+    return _runtimePath('lock')
+
+
+def _runtimePath(extension):
+    """
+    Get path of a runtime file of the current user. Without XDG_RUNTIME_DIR the file is put
+    into a private directory in /tmp, so other users can't occupy its name.
+    @raise ControlError: if the private directory can't be used
+    """
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if not directory:
+        directory = _privateDirectory('/tmp/pomidorka-{0}'.format(os.getuid()))
+    return os.path.join(directory, 'pomidorka.' + extension)
+
+
+def _privateDirectory(path):
+    """
+    Create a directory accessible only by the current user unless it exists
+    @param path: path to the directory
+    @type path: str
+    @return: path to the directory
+    @rtype: str
+    @raise ControlError: if the directory can't be created or is not private to the user
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    except OSError as error:
+        raise ControlError('Unable to create runtime directory: {0}'.format(error))
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or \
+            info.st_mode & 0o077:
+        raise ControlError('Runtime directory {0} is not private to the user'.format(path))
+    return path
+
+
+class ControlError(Exception):
+    """Error of communication with the running application"""
+    pass
+
+
+class ControlProtocol:
+    """
+    Commands understood by the control server. Every command returns a dictionary, which is
+    sent to the client. Additional commands can be registered with addCommand.
+    """
+
+    def __init__(self, activityManager):
+        """
+        @param activityManager: manager controlled through the protocol
+        @type activityManager: ActivityManager
+        """
+        self.__activityManager = activityManager
+        self.__commands = {
+            'work': self._idleOnly(activityManager.startWorkActivity),
+            'short': self._idleOnly(activityManager.startShortBreakActivity),
+            'long': self._idleOnly(activityManager.startLongBreakActivity),
+            'stop': activityManager.stopCurrentActivity,
+            'pause': activityManager.pauseCurrentActivity,
+            'resume': activityManager.resumeCurrentActivity,
+            'status': lambda: None,
+        }
+        self.__statusFields = {}
+
+    def _idleOnly(self, function):
+        """
+        Wrap a command starting an activity, so that it does not replace the running one
+        @param function: function without arguments starting an activity
+        @type function: function
+        @return: function raising ControlError if an activity is running
+        @rtype: function
+        """
+        def start():
+            if self.__activityManager.currentActivity() is not None:
+                raise ControlError('activity running')
+            function()
+        return start
+
+    def addCommand(self, name, function):
+        """
+        Register a command
+        @param name: name of the command
+        @type name: str
+        @param function: function without arguments executing the command
+        @type function: function
+        """
+        self.__commands[name] = function
+
+    def addStatusField(self, name, function):
+        """
+        Register an additional field of the status sent to clients
+        @param name: name of the field
+        @type name: str
+        @param function: function without arguments returning the field value
+        @type function: function
+        """
+        self.__statusFields[name] = function
+
+    def commands(self):
+        """
+        @return: names of known commands
+        @rtype: list
+        """
+        return sorted(self.__commands)
+
+    def handle(self, line):
+        """
+        Execute a command and describe the result, errors of the command are reported
+        to the client. Commands starting activities fail while an activity is running.
+        @param line: command line received from a client
+        @type line: str
+        @return: response with ok flag and status of the activity manager or error text
+        @rtype: dict
+        """
+        command = line.strip()
+        function = self.__commands.get(command)
+        if function is None:
+            return {'ok': False, 'error': 'unknown command: {0}'.format(command)}
+        try:
+            function()
+        except Exception as error:
+            logging.debug('Control command %s failed', command, exc_info=True)
+            return {'ok': False, 'error': str(error)}
+        return {'ok': True, 'status': self.status()}
+
+    def status(self):
+        """
+        @return: description of the running activity
+        @rtype: dict
+        """
+        activity = self.__activityManager.currentActivity()
+        if activity is None:
+            status = {'running': False}
+        else:
+            status = {'running': True, 'kind': activity.kind, 'paused': activity.isPaused(),
+                      'remainingTime': activity.currentRemainingTime()}
+        for name, function in self.__statusFields.items():
+            status[name] = function()
+        return status
+
+
+class SelectorWatcher:
+    """Watcher of file descriptors for applications without another event loop"""
+
+    def __init__(self):
+        self.__selector = selectors.DefaultSelector()
+
+    def watch(self, fileno, callback):
+        """
+        Call the callback whenever the descriptor becomes readable
+        @param fileno: file descriptor
+        @type fileno: int
+        @param callback: function without arguments
+        @type callback: function
+        """
+        self.__selector.register(fileno, selectors.EVENT_READ, callback)
+
+    def unwatch(self, fileno):
+        """
+        Stop watching the descriptor
+        @param fileno: file descriptor
+        @type fileno: int
+        """
+        self.__selector.unregister(fileno)
+
+    def poll(self, timeout=None):
+        """
+        Wait for readable descriptors and call their callbacks
+        @param timeout: maximum time to wait in seconds, None to wait forever
+        @type timeout: float
+        """
+        for key, _ in self.__selector.select(timeout):
+            key.data()
+
+
+class ControlServer:
+    """Non-blocking server of the control socket"""
+
+    def __init__(self, protocol, watcher, path=None):
+        """
+        @param protocol: commands of the server
+        @type protocol: ControlProtocol
+        @param watcher: object with watch(fileno, callback) and unwatch(fileno) methods
+        integrating the server into an event loop
+        @type watcher: SelectorWatcher
+        @param path: path to the socket, the default one if omitted
+        @type path: str
+        @raise ControlError: if another application listens to the socket
+        """
+        self.path = path or defaultSocketPath()
+        self.__protocol = protocol
+        self.__watcher = watcher
+        self.__clients = {}
+        _removeStaleSocket(self.path)
+        self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__socket.setblocking(False)
+        self.__socket.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self.__socket.listen(8)
+        self.__watcher.watch(self.__socket.fileno(), self._acceptClients)
+
+    def _acceptClients(self):
+        """Accept all pending connections"""
+        while True:
+            try:
+                client, _ = self.__socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            client.setblocking(False)
+            self.__clients[client.fileno()] = [client, b'']
+            self.__watcher.watch(client.fileno(), lambda fileno=client.fileno():
+                                 self._readClient(fileno))
+
+    def _readClient(self, fileno):
+        """
+        Read available data of a client and answer all complete commands
+        @param fileno: descriptor of the client socket
+        @type fileno: int
+        """
+        client, buffered = self.__clients[fileno]
+        try:
+            data = client.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._closeClient(fileno)
+            return
+        buffered += data
+        while b'\n' in buffered:
+            line, buffered = buffered.split(b'\n', 1)
+            response = self.__protocol.handle(line.decode('utf-8', 'replace'))
+            logging.debug('Control command %r: %r', line, response)
+            try:
+                client.sendall(json.dumps(response).encode() + b'\n')
+            except OSError:
+                self._closeClient(fileno)
+                return
+        self.__clients[fileno][1] = buffered
+
+    def _closeClient(self, fileno):
+        """Stop serving a client"""
+        client, _ = self.__clients.pop(fileno)
+        self.__watcher.unwatch(fileno)
+        client.close()
+
+    def close(self):
+        """Close all connections and remove the socket"""
+        for fileno in list(self.__clients):
+            self._closeClient(fileno)
+        self.__watcher.unwatch(self.__socket.fileno())
+        self.__socket.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def _removeStaleSocket(path):
+    """
+    Remove a socket left by a crashed application
+    @param path: path to the socket
+    @type path: str
+    @raise ControlError: if the socket is alive
+    """
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError as error:
+        if error.errno not in (errno.ECONNREFUSED, errno.ENOENT):
+            raise
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise ControlError('Another instance listens to {0}'.format(path))
+
+
+class InstanceLock:
+    """
+    Lock file held by the running application for its whole life. The lock is released by
+    the system when the process exits, so a crashed instance never blocks a new one.
+    """
+
+    def __init__(self, path=None):
+        """
+        @param path: path to the lock file, the default one if omitted
+        @type path: str
+        @raise ControlError: if the default path can't be used
+        """
+        self.path = path or defaultLockPath()
+        self.__file = None
+
+    def acquire(self):
+        """
+        Try to take the lock without waiting
+        @return: whether the lock is taken, False means another instance is running
+        @rtype: bool
+        @raise ControlError: if the lock file can't be opened
+        """
+        try:
+            lockFile = open(self.path, 'a')
+        except OSError as error:
+            raise ControlError('Unable to open lock file: {0}'.format(error))
+        try:
+            fcntl.flock(lockFile.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lockFile.close()
+            return False
+        self.__file = lockFile
+        return True
+
+    def release(self):
+        """Release the lock"""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+def forwardToRunningInstance(command, path=None, timeout=2.0):
+    """
+    Pass a command to the instance holding the lock. The instance might be still starting,
+    so the socket is retried until it answers or the timeout expires.
+    @param command: command to execute in the running instance
+    @type command: str
+    @param path: path to the socket, the default one if omitted
+    @type path: str
+    @param timeout: time to wait for the running instance in seconds
+    @type timeout: float
+    @return: response of the running instance
+    @rtype: dict
+    @raise ControlError: if the running instance does not answer in time
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return sendCommand(command, path, timeout)
+        except ControlError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+
+def sendCommand(command, path=None, timeout=2.0):
+    """
+    Send a command to the running application
+    @param command: command name
+    @type command: str
+    @param path: path to the socket, the default one if omitted
+    @type path: str
+    @param timeout: time to wait for the answer in seconds
+    @type timeout: float
+    @return: response of the application
+    @rtype: dict
+    @raise ControlError: if the application is not running or does not answer
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+    try:
+        connection.connect(path or defaultSocketPath())
+        connection.sendall(command.encode('utf-8') + b'\n')
+        response = b''
+        while not response.endswith(b'\n'):
+            data = connection.recv(4096)
+            if not data:
+                break
+            response += data
+    except OSError as error:
+        raise ControlError('Unable to reach running application: {0}'.format(error))
+    finally:
+        connection.close()
+    if not response:
+        raise ControlError('Running application closed the connection')
+    return json.loads(response.decode('utf-8'))
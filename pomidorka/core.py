@@ -27,7 +27,31 @@
 
 __author__ = 'Andrey Vasilev <vamonster@gmail.com>'
 
-from PySide.QtCore import QTimer
+from collections import namedtuple
+import math
+import time
+import weakref
+from pomidorka.profiling import PROFILER
+
+"""Kinds of user activities"""
+WORK = 'work'
+SHORT_BREAK = 'shortBreak'
+LONG_BREAK = 'longBreak'
+
+"""Resolutions of remaining time notifications in seconds"""
+SECOND = 1
+MINUTE = 60
+
+"""
+Description of a finished activity. Start and end are wall clock times, durations are in
+seconds, interrupted tells whether the activity was stopped before its end. The actual
+duration excludes pausedDuration, the total time of the activity pauses, pauseCount is the
+number of the pauses.
+"""
+ActivityRecord = namedtuple('ActivityRecord', ['start', 'end', 'kind', 'plannedDuration',
+                                               'actualDuration', 'interrupted',
+                                               'pausedDuration', 'pauseCount'],
+                            defaults=(0.0, 0))
 
 
 class EventHook():
@@ -44,23 +68,45 @@ class EventHook():
     # add a listener to the event
     theBroadcaster.onChange += myFunction
 
+    # add a listener called before listeners with lower priority
+    theBroadcaster.onChange.subscribe(myOtherFunction, priority=10)
+
     # remove listener from the event
     theBroadcaster.onChange -= myFunction
 
     # fire event
     theBroadcaster.onChange.fire()
 
+    Bound methods are held through weak references, other callables are held strongly.
+    Handlers, whose object died, are dropped on the next fire. Handlers are called in order of
+    decreasing priority, handlers of equal priority in order of subscription. Handlers
+    subscribed during fire are called starting from the next fire, handlers unsubscribed
+    during fire are not called anymore.
+
+    A handler subscribed with an executor (see pomidorka.dispatch) is called on the
+    executor thread: directly if the hook fires there, otherwise the call is queued and
+    made after fire returns. Subscription must still happen on a single thread.
+
     @authors: Michael Foord
     """
 
-    def __init__(self):
-        self.__handlers = []
+    __slots__ = ('__handlers', '__order', '__sequence', '__name')
+
+    def __init__(self, name=None):
+        """
+        @param name: name of the hook shown in profiling results
+        @type name: str
+        """
+        self.__handlers = {}
+        self.__order = None
+        self.__sequence = 0
+        self.__name = name
 
     def __iadd__(self, handler):
         """
         Add handler to event hook
         """
-        self.__handlers.append(handler)
+        self.subscribe(handler)
         return self
 
     def __isub__(self, handler):
@@ -68,15 +114,96 @@ class EventHook():
         Remove handler from event hook
         @type handler: method
         """
-        self.__handlers.remove(handler)
+        self.unsubscribe(handler)
         return self
 
+    def __len__(self):
+        """
+        @return: number of subscribed handlers with live objects
+        @rtype: int
+        """
+        for key, entry in list(self.__handlers.items()):
+            if entry[2] is not None and entry[2]() is None:
+                del self.__handlers[key]
+                self.__order = None
+                self._handlerDropped(key)
+        return len(self.__handlers)
+
+    def subscribe(self, handler, priority=0, executor=None):
+        """
+        Add handler to event hook. Subscribing a handler once more changes its priority
+        and executor.
+        @param handler: function or method to be called on fire
+        @type handler: function
+        @param priority: handlers with higher priority are called first
+        @type priority: int
+        @param executor: executor of the thread the handler must be called on, None to call
+        it on the firing thread
+        @type executor: Executor
+        """
+        key = _handlerKey(handler)
+        self.__sequence += 1
+        entry = (priority, self.__sequence, None, handler, executor)
+        if isinstance(key, tuple):
+            try:
+                entry = (priority, entry[1], weakref.ref(handler.__self__), handler.__func__,
+                         executor)
+            except TypeError:
+                pass
+        self.__handlers[key] = entry
+        self.__order = None
+
+    def unsubscribe(self, handler):
+        """
+        Remove handler from event hook
+        @param handler: previously subscribed function or method
+        @type handler: function
+        """
+        try:
+            del self.__handlers[_handlerKey(handler)]
+        except KeyError:
+            raise ValueError('Handler {0!r} is not subscribed'.format(handler))
+        self.__order = None
+
     def fire(self, *args, **keywargs):
         """
         Send notification to subscribers, passing all arguments
         """
-        for handler in self.__handlers:
-            handler(*args, **keywargs)
+        handlers = self.__handlers
+        if not handlers:
+            return
+        profiled = PROFILER.enabled
+        if profiled:
+            started = time.perf_counter()
+        order = self.__order
+        if order is None:
+            if len(handlers) > 1:
+                order = sorted(handlers.items(), key=_entryOrder)
+            else:
+                order = list(handlers.items())
+            self.__order = order
+        for key, entry in order:
+            if handlers.get(key) is not entry:
+                continue
+            reference = entry[2]
+            executor = entry[4]
+            if reference is None:
+                if executor is None or executor.isCurrent():
+                    entry[3](*args, **keywargs)
+                else:
+                    executor.post(entry[3], args, keywargs)
+                continue
+            target = reference()
+            if target is None:
+                del handlers[key]
+                self.__order = None
+                self._handlerDropped(key)
+            elif executor is None or executor.isCurrent():
+                entry[3](target, *args, **keywargs)
+            else:
+                executor.post(entry[3], (target,) + args, keywargs)
+        if profiled:
+            PROFILER.record(_profileName(self.__name), started)
 
     def clearObjectHandlers(self, inObject):
         """
@@ -84,15 +211,309 @@ class EventHook():
         @param inObject: object to clear handlers
         @type inObject: object
         """
-        for theHandler in self.__handlers:
-            if theHandler.im_self == inObject:
-                self -= theHandler
+        for key, entry in list(self.__handlers.items()):
+            if entry[2] is not None:
+                target = entry[2]()
+            else:
+                target = getattr(entry[3], '__self__', None)
+            if target is inObject:
+                del self.__handlers[key]
+                self._handlerDropped(key)
+        self.__order = None
+
+    def _handlerDropped(self, key):
+        """
+        Called when a handler is removed without unsubscribe: its object died or got
+        cleared. Subclasses tracking handlers by key override it.
+        @param key: key of the removed handler
+        @type key: object
+        """
+        pass
 
     def clearHandlers(self):
         """
         Remove all event handlers from the hook
         """
-        self.__handlers = []
+        self.__handlers.clear()
+        self.__order = None
+
+
+"""Names of hooks in profiling results by hook name, built when profiling needs them"""
+_profileNames = {}
+
+
+def _profileName(name):
+    """
+    @param name: name of an event hook or None
+    @type name: str
+    @return: name of the hook fire in profiling results
+    @rtype: str
+    """
+    profileName = _profileNames.get(name)
+    if profileName is None:
+        profileName = 'EventHook.fire:{0}'.format(name or 'anonymous')
+        _profileNames[name] = profileName
+    return profileName
+
+
+class LazyHook:
+    """
+    Class attribute providing an event hook of an instance, which is created on first
+    access. Objects nobody subscribes to keep just an empty slot instead of a hook. The
+    hook is kept in the slot named _<attribute>Hook, which
+    must be None initially; firing code reads the slot and skips a hook, which is None.
+    """
+
+    def __init__(self, factory=None, created=None):
+        """
+        @param factory: function creating the hook from its name, EventHook if omitted
+        @type factory: function
+        @param created: name of the instance method called with the hook once it is created
+        @type created: str
+        """
+        self.__factory = factory or EventHook
+        self.__created = created
+        self.__slot = None
+        self.__name = None
+
+    def __set_name__(self, owner, name):
+        """Remember the slot and the name of the hook"""
+        self.__slot = '_{0}Hook'.format(name)
+        self.__name = '{0}.{1}'.format(owner.__name__, name)
+
+    def __get__(self, instance, owner):
+        """
+        @return: hook of the instance, created if it does not exist yet
+        @rtype: EventHook
+        """
+        if instance is None:
+            return self
+        hook = getattr(instance, self.__slot)
+        if hook is None:
+            hook = self.__factory(self.__name)
+            setattr(instance, self.__slot, hook)
+            if self.__created is not None:
+                getattr(instance, self.__created)(hook)
+        return hook
+
+    def __set__(self, instance, hook):
+        """Store the hook, which allows += on the attribute"""
+        setattr(instance, self.__slot, hook)
+
+
+class TimeChangedHook:
+    """
+    Event hook for remaining time notifications, where each subscriber declares the
+    resolution it needs. A handler subscribed with resolution MINUTE gets only the values,
+    where the remaining time in whole minutes changes, and always gets the final zero.
+    Handlers are grouped by resolution, groups of finer resolution are notified first.
+    Other hooks can be chained to receive all values this hook receives, this way the hook
+    knows the finest resolution anybody listening to it needs.
+    """
+
+    __slots__ = ('resolutionChanged', '__name', '__groups', '__order', '__resolutions',
+                 '__chained', '__finest', '__weakref__')
+
+    def __init__(self, name=None):
+        """
+        @param name: name of the hook shown in profiling results
+        @type name: str
+        """
+        self.resolutionChanged = EventHook('TimeChangedHook.resolutionChanged')
+        self.__name = name
+        self.__groups = {}
+        self.__order = []
+        self.__resolutions = {}
+        self.__chained = []
+        self.__finest = None
+
+    def __iadd__(self, handler):
+        """
+        Add handler, which needs every change of remaining time
+        """
+        self.subscribe(handler)
+        return self
+
+    def __isub__(self, handler):
+        """
+        Remove handler from the hook
+        @type handler: method
+        """
+        self.unsubscribe(handler)
+        return self
+
+    def __len__(self):
+        """
+        @return: number of subscribed handlers
+        @rtype: int
+        """
+        return sum(len(group[0]) for _, group in self.__order)
+
+    def subscribe(self, handler, priority=0, resolution=SECOND, executor=None):
+        """
+        Add handler to the hook. Subscribing a handler once more changes its resolution.
+        @param handler: function or method to be called with remaining time
+        @type handler: function
+        @param priority: handlers with higher priority are called first within the group
+        @type priority: int
+        @param resolution: resolution of remaining time the handler needs in seconds
+        @type resolution: int
+        @param executor: executor of the thread the handler must be called on, None to call
+        it on the firing thread
+        @type executor: Executor
+        """
+        key = _handlerKey(handler)
+        if key in self.__resolutions:
+            try:
+                self.__groups[self.__resolutions[key]][0].unsubscribe(handler)
+            except ValueError:
+                pass
+        group = self.__groups.get(resolution)
+        if group is None:
+            group = [_ResolutionGroup(self.__name, self), None]
+            self.__groups[resolution] = group
+            self.__order = sorted(self.__groups.items())
+        group[0].subscribe(handler, priority, executor)
+        self.__resolutions[key] = resolution
+        self._updateFinestResolution()
+
+    def unsubscribe(self, handler):
+        """
+        Remove handler from the hook
+        @param handler: previously subscribed function or method
+        @type handler: function
+        """
+        key = _handlerKey(handler)
+        if key not in self.__resolutions:
+            raise ValueError('Handler {0!r} is not subscribed'.format(handler))
+        self.__groups[self.__resolutions.pop(key)][0].unsubscribe(handler)
+        self._updateFinestResolution()
+
+    def chain(self, hook):
+        """
+        Pass all notifications of this hook to another one
+        @param hook: hook to receive notifications
+        @type hook: TimeChangedHook
+        """
+        self.__chained.append(hook)
+        hook.resolutionChanged += self._updateFinestResolution
+        self._updateFinestResolution()
+
+    def _handlerDropped(self, key):
+        """
+        Forget the resolution of a handler its group dropped, e.g. because its object died
+        @param key: key of the dropped handler
+        @type key: object
+        """
+        if self.__resolutions.pop(key, None) is not None:
+            self._updateFinestResolution()
+
+    def finestResolution(self):
+        """
+        Get the finest resolution needed by subscribers of the hook and chained hooks
+        @return: resolution in seconds or None if nobody listens to the hook
+        @rtype: int
+        """
+        return self.__finest
+
+    def _updateFinestResolution(self):
+        """Recalculate the finest resolution and notify about its change"""
+        finest = None
+        for resolution, group in self.__groups.items():
+            if len(group[0]) and (finest is None or resolution < finest):
+                finest = resolution
+        for hook in self.__chained:
+            resolution = hook.finestResolution()
+            if resolution is not None and (finest is None or resolution < finest):
+                finest = resolution
+        if finest != self.__finest:
+            self.__finest = finest
+            self.resolutionChanged.fire()
+
+    def fire(self, remainingTime):
+        """
+        Notify subscribers, which need this value of remaining time
+        @param remainingTime: remaining time in seconds
+        @type remainingTime: int
+        """
+        for resolution, group in self.__order:
+            bucket = remainingTime // resolution
+            if bucket != group[1] or remainingTime == 0:
+                group[1] = bucket
+                group[0].fire(remainingTime)
+        for hook in self.__chained:
+            hook.fire(remainingTime)
+
+    def reset(self):
+        """Forget delivered values, so the next value is delivered to every subscriber"""
+        for _, group in self.__order:
+            group[1] = None
+
+    def clearObjectHandlers(self, inObject):
+        """
+        Remove all event handlers coming from specified object
+        @param inObject: object to clear handlers
+        @type inObject: object
+        """
+        for _, group in self.__order:
+            group[0].clearObjectHandlers(inObject)
+        self._updateFinestResolution()
+
+    def clearHandlers(self):
+        """
+        Remove all event handlers and chained hooks
+        """
+        for _, group in self.__order:
+            group[0].clearHandlers()
+        self.__resolutions.clear()
+        for hook in self.__chained:
+            hook.resolutionChanged -= self._updateFinestResolution
+        self.__chained = []
+        self._updateFinestResolution()
+
+
+class _ResolutionGroup(EventHook):
+    """Handlers of one resolution, which report dropped handlers to their TimeChangedHook"""
+
+    __slots__ = ('__owner',)
+
+    def __init__(self, name, owner):
+        """
+        @param name: name of the hook shown in profiling results
+        @type name: str
+        @param owner: hook the group belongs to, referenced weakly
+        @type owner: TimeChangedHook
+        """
+        EventHook.__init__(self, name)
+        self.__owner = weakref.ref(owner)
+
+    def _handlerDropped(self, key):
+        """Let the owner forget the resolution of the dropped handler"""
+        owner = self.__owner()
+        if owner is not None:
+            owner._handlerDropped(key)
+
+
+def _handlerKey(handler):
+    """
+    Get a key identifying the handler. Bound methods are identified by their object and
+    function, other callables by themselves.
+    @param handler: function or method
+    @type handler: function
+    @return: key of the handler
+    @rtype: object
+    """
+    target = getattr(handler, '__self__', None)
+    function = getattr(handler, '__func__', None)
+    if target is None or function is None:
+        return handler
+    return (id(target), function)
+
+
+def _entryOrder(item):
+    """Sorting key of handler entries: priority descending, then subscription order"""
+    entry = item[1]
+    return -entry[0], entry[1]
 
 
 class ActivityManager:
@@ -101,39 +522,169 @@ class ActivityManager:
     @authors: Andrey Vasilev
     """
 
-    def __init__(self, settings):
+    __slots__ = ('settings', '__timerFactory', '__history', '__currentActivity',
+                 '_activityStartedHook', '_workActivityEndedHook', '_breakActivityEndedHook',
+                 '_activityTimeChangedHook', '_activityRecordedHook', '_activityPausedHook',
+                 '_activityResumedHook', '__weakref__')
+
+    """Hooks of the manager, created when somebody subscribes"""
+    activityStarted = LazyHook()
+    workActivityEnded = LazyHook()
+    breakActivityEnded = LazyHook()
+    activityTimeChanged = LazyHook(TimeChangedHook, '_timeHookCreated')
+    activityRecorded = LazyHook()
+    activityPaused = LazyHook()
+    activityResumed = LazyHook()
+
+    def __init__(self, settings, timerFactory=None, history=None):
         """
         @param settings: the timer settings
         @type settings: Settings
+        @param timerFactory: function creating a timer for each new activity, if it is None
+        activities use timers running in background threads
+        @type timerFactory: function
+        @param history: storage to append records of finished activities to
+        @type history: HistoryStore
         """
-        self.activityStarted = EventHook()
-        self.workActivityEnded = EventHook()
-        self.breakActivityEnded = EventHook()
-        self.activityTimeChanged = EventHook()
+        self._activityStartedHook = None
+        self._workActivityEndedHook = None
+        self._breakActivityEndedHook = None
+        self._activityTimeChangedHook = None
+        self._activityRecordedHook = None
+        self._activityPausedHook = None
+        self._activityResumedHook = None
         self.settings = settings
+        self.__timerFactory = timerFactory
+        self.__history = history
         self.__currentActivity = None
 
-    def _startActivity(self, timePeriod, finishedHook):
+    def _startActivity(self, timePeriod, kind, finishedHook):
         """
         Create new activity object start it and store a link to it
         @param timePeriod: time period in minutes that activity must last
         @type timePeriod: int
+        @param kind: kind of the activity
+        @type kind: str
         @param finishedHook: hook to be executed on activity end
         @type finishedHook: function
         @return: new work activity
         @rtype: Activity
         """
-        self.__currentActivity = Activity(timePeriod)
+        self.__currentActivity = self._createActivity(timePeriod, kind)
         self.__currentActivity.finished += finishedHook
-        self.__currentActivity.timeChanged += self.activityTimeChanged.fire
+        self._chainTimeHook(self.__currentActivity)
         self.__currentActivity.start()
-        self.activityStarted.fire(self.__currentActivity)
+        if self._activityStartedHook is not None:
+            self._activityStartedHook.fire(self.__currentActivity)
+        return self.__currentActivity
+
+    def _chainTimeHook(self, activity):
+        """Pass remaining time of a new activity to the manager hook if it exists"""
+        hook = self._activityTimeChangedHook
+        if hook is not None:
+            hook.reset()
+            activity.timeChanged.chain(hook)
+
+    def _timeHookCreated(self, hook):
+        """Pass remaining time of the current activity to the just created hook"""
+        if self.__currentActivity is not None:
+            self.__currentActivity.timeChanged.chain(hook)
+
+    def restoreActivity(self, kind, timePeriod, startTime, deadline, remainingTime,
+                        pausedDuration=0.0, pauseCount=0, pausedSince=None):
+        """
+        Continue an activity of a previous run of the application. An activity which
+        should have ended meanwhile ends at once.
+        @param kind: kind of the activity
+        @type kind: str
+        @param timePeriod: planned duration of the activity in seconds
+        @type timePeriod: int
+        @param startTime: wall clock time the activity was started at
+        @type startTime: float
+        @param deadline: wall clock time a running activity ends at
+        @type deadline: float
+        @param remainingTime: exact remaining time of a paused activity in seconds
+        @type remainingTime: float
+        @param pausedDuration: total duration of the finished pauses in seconds
+        @type pausedDuration: float
+        @param pauseCount: number of the finished pauses
+        @type pauseCount: int
+        @param pausedSince: wall clock time the activity is paused since or None if it is
+        running
+        @type pausedSince: float
+        @return: the restored activity or None if it has ended
+        @rtype: Activity
+        """
+        if self.__currentActivity is not None:
+            raise ValueError('Another activity is running')
+        finishedHook = self._workActivityEnded if kind == WORK else self._restActivityEnded
+        activity = self._createActivity(timePeriod, kind)
+        self.__currentActivity = activity
+        activity.finished += finishedHook
+        self._chainTimeHook(activity)
+        activity.restore(startTime, deadline, remainingTime, pausedDuration, pauseCount,
+                         pausedSince)
+        if activity is not self.__currentActivity:
+            return None
+        if self._activityStartedHook is not None:
+            self._activityStartedHook.fire(activity)
+        if activity.isPaused() and self._activityPausedHook is not None:
+            self._activityPausedHook.fire(activity)
+        return activity
+
+    def releaseActivity(self):
+        """
+        Forget the current activity without ending or recording it, e.g. because it
+        continues in another manager. No hooks are fired.
+        @return: the released activity or None, it is paused and must not be used further
+        @rtype: Activity
+        """
+        activity = self.__currentActivity
+        if activity is None:
+            return None
+        activity.pause()
+        activity.removeHookHandlers()
+        self.__currentActivity = None
+        return activity
+
+    def _createActivity(self, timePeriod, kind):
+        """
+        Create new activity object using the configured timer
+        @param timePeriod: time period in seconds that activity must last
+        @type timePeriod: int
+        @param kind: kind of the activity
+        @type kind: str
+        @return: new activity
+        @rtype: Activity
+        """
+        if self.__timerFactory is None:
+            from pomidorka.timers import ThreadingOneSecondTimer
+            self.__timerFactory = ThreadingOneSecondTimer
+        return Activity(timePeriod, self.__timerFactory(), kind)
+
+    def currentActivity(self):
+        """
+        Get the running activity
+        @return: running activity or None if there is no one
+        @rtype: Activity
+        """
         return self.__currentActivity
 
     def _clearCurrentActivity(self):
-        """Remove all associations with the current activity"""
-        self.__currentActivity.removeHookHandlers()
+        """
+        Remove all associations with the current activity and record it as finished
+        """
+        activity = self.__currentActivity
+        activity.removeHookHandlers()
         self.__currentActivity = None
+        record = ActivityRecord(activity.startTime, activity.endTime, activity.kind,
+                                activity.maxTimeInterval, activity.actualDuration,
+                                activity.interrupted, activity.pausedDuration,
+                                activity.pauseCount)
+        if self.__history is not None:
+            self.__history.append(record)
+        if self._activityRecordedHook is not None:
+            self._activityRecordedHook.fire(record)
 
     def startWorkActivity(self):
         """
@@ -141,14 +692,15 @@ class ActivityManager:
         @return: new work activity object
         @rtype: Activity
         """
-        return self._startActivity(self.settings.workPeriod, self._workActivityEnded)
+        return self._startActivity(self.settings.workPeriod, WORK, self._workActivityEnded)
 
     def _workActivityEnded(self):
         """
         Process the end of work activity
         """
-        self.workActivityEnded.fire()
         self._clearCurrentActivity()
+        if self._workActivityEndedHook is not None:
+            self._workActivityEndedHook.fire()
 
     def startShortBreakActivity(self):
         """
@@ -156,7 +708,8 @@ class ActivityManager:
         @return: new short break activity
         @rtype: Activity
         """
-        return self._startActivity(self.settings.shortRestPeriod, self._restActivityEnded)
+        return self._startActivity(self.settings.shortRestPeriod, SHORT_BREAK,
+                                   self._restActivityEnded)
 
     def startLongBreakActivity(self):
         """
@@ -164,91 +717,323 @@ class ActivityManager:
         @return new long break activity
         @rtype: Activity
         """
-        return self._startActivity(self.settings.longRestPeriod, self._restActivityEnded)
+        return self._startActivity(self.settings.longRestPeriod, LONG_BREAK,
+                                   self._restActivityEnded)
 
     def _restActivityEnded(self):
         """
         Process the end of rest activity
         """
-        self.breakActivityEnded.fire()
         self._clearCurrentActivity()
+        if self._breakActivityEndedHook is not None:
+            self._breakActivityEndedHook.fire()
 
     def stopCurrentActivity(self):
         """Try to stop activity if it is running"""
         if self.__currentActivity:
             self.__currentActivity.stop()
 
+    def pauseCurrentActivity(self):
+        """Pause the running activity, if there is one and it is not paused yet"""
+        activity = self.__currentActivity
+        if activity is not None and activity.pause():
+            if self._activityPausedHook is not None:
+                self._activityPausedHook.fire(activity)
+
+    def resumeCurrentActivity(self):
+        """Resume the paused activity, if there is one"""
+        activity = self.__currentActivity
+        if activity is not None and activity.resume():
+            if self._activityResumedHook is not None:
+                self._activityResumedHook.fire(activity)
+
 
 class OneSecondTimer:
     """
-    Abstract class for a timer, which notifies it listeners about each second passing by.
+    Abstract class for a timer, which notifies it listeners when the requested delay passes.
     Objects, implementing this interface must implement start and stop methods. And notify
-    listeners with elapsed message on every second passed.
+    listeners with elapsed message once the delay given to start is over. The timer also
+    serves as a clock: all deadlines passed around are expressed in its now() time.
     """
 
+    __slots__ = ('elapsed', '__weakref__')
+
     def __init__(self):
-        self.elapsed = EventHook()
+        self.elapsed = EventHook('OneSecondTimer.elapsed')
 
-    def start(self):
-        """Start timer"""
+    def now(self):
+        """
+        Get current time of the timer clock
+        @return: current time in seconds
+        @rtype: float
+        """
+        return monotonicTime()
+
+    def wallTime(self):
+        """
+        Get current wall clock time, used to date activities
+        @return: seconds since the epoch
+        @rtype: float
+        """
+        return time.time()
+
+    def start(self, delay=1.0):
+        """
+        Start timer
+        @param delay: time in seconds after which listeners are notified
+        @type delay: float
+        """
         pass
 
     def stop(self):
         """Stop timer"""
 
 
-class QtOneSecondTimer(OneSecondTimer):
-    """
-    Concrete implementation of the timer based on Qt classes
-    """
+"""Clock used to measure activity time, None if only time.monotonic is available"""
+_CLOCK_ID = getattr(time, 'CLOCK_BOOTTIME', None)
 
-    def __init__(self):
-        OneSecondTimer.__init__(self)
-        self.__timer = QTimer()
-        self.__timer.setInterval(1000)
-        self.__timer.setSingleShot(False)
-        self.__timer.timeout.connect(self._timerElapsed)
 
-    def start(self):
-        """Start the timer"""
-        self.__timer.start()
+def monotonicTime():
+    """
+    Get time of a clock that is never set back. Where the system allows it the clock keeps
+    running while the machine is suspended, so activities end on time after a wake up.
+    @return: current time in seconds
+    @rtype: float
+    """
+    if _CLOCK_ID is None:
+        return time.monotonic()
+    return time.clock_gettime(_CLOCK_ID)
 
-    def _timerElapsed(self):
-        """Process notification from the timer"""
-        self.elapsed.fire()
 
-    def stop(self):
-        """Stop the timer"""
-        self.__timer.stop()
+class Activity:
+    """
+    Arbitrary user activity. Activity remembers the moment it must end and calculates the
+    remaining time from the timer clock, so late or missed timer notifications do not
+    postpone its end.
+    """
 
+    __slots__ = ('maxTimeInterval', '__timer', '__deadline', '__startedAt', '__pausedAt',
+                 '__pausedWallTime', '__pausedRemainder', 'remainingTime', 'kind',
+                 'startTime', 'endTime', 'actualDuration', 'interrupted', 'pausedDuration',
+                 'pauseCount', 'pauses', '_finishedHook', '_timeChangedHook', '__weakref__')
 
-class Activity:
-    """Arbitrary user activity"""
+    """Hooks of the activity, created when somebody subscribes"""
+    finished = LazyHook()
+    timeChanged = LazyHook(TimeChangedHook, '_timeHookCreated')
 
-    def __init__(self, timeInterval, timer=QtOneSecondTimer()):
+    def __init__(self, timeInterval, timer, kind=WORK):
         """
         @param timeInterval: proposed time interval for the activity
         @type timeInterval: int
+        @param timer: timer used to wake the activity up when remaining time changes
+        @type timer: OneSecondTimer
+        @param kind: kind of the activity
+        @type kind: str
         """
-        self.finished = EventHook()
-        self.timeChanged = EventHook()
+        self._finishedHook = None
+        self._timeChangedHook = None
         self.maxTimeInterval = timeInterval
         self.__timer = timer
-        self.__timer.elapsed += self._decreasePeriod
+        self.__timer.elapsed += self._updateRemainingTime
+        self.__deadline = None
+        self.__startedAt = None
+        self.__pausedAt = None
+        self.__pausedWallTime = None
+        self.__pausedRemainder = None
         self.remainingTime = self.maxTimeInterval
+        self.kind = kind
+        self.startTime = None
+        self.endTime = None
+        self.actualDuration = 0.0
+        self.interrupted = False
+        self.pausedDuration = 0.0
+        self.pauseCount = 0
+        self.pauses = ()
 
     def start(self):
         """Start working on the current activity"""
+        self.startTime = self.__timer.wallTime()
+        self.__startedAt = self.__timer.now()
+        self.__deadline = self.__startedAt + self.maxTimeInterval
         self._setRemainingTime(self.maxTimeInterval)
-        self.__timer.start()
+        self._scheduleUpdate()
+
+    def restore(self, startTime, deadline, remainingTime, pausedDuration=0.0, pauseCount=0,
+                pausedSince=None):
+        """
+        Continue an activity started earlier, e.g. by a previous run of the application.
+        The time passed since then counts as activity time, or as pause time if the
+        activity was paused. An activity which should have ended meanwhile ends at once.
+        @param startTime: wall clock time the activity was started at
+        @type startTime: float
+        @param deadline: wall clock time a running activity ends at
+        @type deadline: float
+        @param remainingTime: exact remaining time of a paused activity in seconds
+        @type remainingTime: float
+        @param pausedDuration: total duration of the finished pauses in seconds
+        @type pausedDuration: float
+        @param pauseCount: number of the finished pauses
+        @type pauseCount: int
+        @param pausedSince: wall clock time the activity is paused since or None if it is
+        running
+        @type pausedSince: float
+        """
+        now = self.__timer.now()
+        wallTime = self.__timer.wallTime()
+        if pausedSince is None:
+            remainingTime = deadline - wallTime
+        remainingTime = max(0.0, min(remainingTime, float(self.maxTimeInterval)))
+        self.startTime = startTime
+        self.pausedDuration = pausedDuration
+        self.pauseCount = pauseCount
+        self.__startedAt = now - pausedDuration - (self.maxTimeInterval - remainingTime)
+        if pausedSince is not None:
+            openPause = max(0.0, wallTime - pausedSince)
+            self.__startedAt -= openPause
+            self.__pausedAt = now - openPause
+            self.__pausedWallTime = pausedSince
+            self.__pausedRemainder = remainingTime
+            self.remainingTime = int(math.ceil(remainingTime))
+            return
+        self.__deadline = now + remainingTime
+        self._setRemainingTime(int(math.ceil(remainingTime)))
+        if self.__deadline is not None:
+            self._scheduleUpdate()
+
+    def wallDeadline(self):
+        """
+        Get wall clock time of the activity end, assuming it is not paused any more
+        @return: seconds since the epoch
+        @rtype: float
+        """
+        return self.__timer.wallTime() + self.exactRemainingTime()
 
     def stop(self):
         """Terminate current activity before time period ended"""
+        if self.__pausedAt is not None:
+            self._endPause()
+        self.interrupted = self.remainingTime > 0
         self._setRemainingTime(0)
 
-    def _decreasePeriod(self):
-        """Add one second to the """
-        self._setRemainingTime(self.remainingTime - 1)
+    def pause(self):
+        """
+        Suspend the activity keeping its exact remaining time. The timer is disarmed, so a
+        paused activity neither wakes up nor reports remaining time changes.
+        @return: whether the activity got paused, it is not if it is not running
+        @rtype: bool
+        """
+        if self.__deadline is None:
+            return False
+        now = self.__timer.now()
+        if self.__deadline <= now:
+            self._updateRemainingTime()
+            return False
+        self.__timer.stop()
+        self.__pausedRemainder = self.__deadline - now
+        self.__deadline = None
+        self.__pausedAt = now
+        self.__pausedWallTime = self.__timer.wallTime()
+        return True
+
+    def resume(self):
+        """
+        Continue the paused activity with the remaining time it had when paused
+        @return: whether the activity got resumed, it is not if it was not paused
+        @rtype: bool
+        """
+        if self.__pausedAt is None:
+            return False
+        self.__deadline = self._endPause() + self.__pausedRemainder
+        self._scheduleUpdate()
+        return True
+
+    def isPaused(self):
+        """
+        @return: whether the activity is paused
+        @rtype: bool
+        """
+        return self.__pausedAt is not None
+
+    def pausedSince(self):
+        """
+        @return: wall clock time the activity is paused since or None if it is running
+        @rtype: float
+        """
+        return self.__pausedWallTime if self.__pausedAt is not None else None
+
+    def _endPause(self):
+        """
+        Account the pause which is over now
+        @return: current time of the timer clock
+        @rtype: float
+        """
+        now = self.__timer.now()
+        self.pausedDuration += now - self.__pausedAt
+        self.pauseCount += 1
+        self.pauses += ((self.__pausedWallTime, self.__timer.wallTime()),)
+        self.__pausedAt = None
+        return now
+
+    def _updateRemainingTime(self):
+        """Recalculate remaining time after the timer woke the activity up"""
+        if self.__deadline is None:
+            return
+        if PROFILER.enabled:
+            started = time.perf_counter()
+            PROFILER.count('Activity.wakeups')
+        newTime = self._calculateRemainingTime()
+        if newTime != self.remainingTime:
+            self._setRemainingTime(newTime)
+        if self.__deadline is not None:
+            self._scheduleUpdate()
+        if PROFILER.enabled:
+            PROFILER.record('Activity.tick', started)
+
+    def currentRemainingTime(self):
+        """
+        Get up to date remaining time, even if changes of it are not reported
+        @return: whole seconds left till the end of the activity
+        @rtype: int
+        """
+        if self.__pausedAt is not None:
+            return int(math.ceil(self.__pausedRemainder))
+        if self.__deadline is None:
+            return self.remainingTime
+        return self._calculateRemainingTime()
+
+    def exactRemainingTime(self):
+        """
+        Get remaining time with sub-second precision
+        @return: seconds left till the end of the activity
+        @rtype: float
+        """
+        if self.__pausedAt is not None:
+            return self.__pausedRemainder
+        if self.__deadline is None:
+            return float(self.remainingTime)
+        return max(0.0, self.__deadline - self.__timer.now())
+
+    def _calculateRemainingTime(self):
+        """
+        Calculate remaining time using the activity deadline
+        @return: whole seconds left till the deadline
+        @rtype: int
+        """
+        return max(0, int(math.ceil(self.__deadline - self.__timer.now())))
+
+    def _scheduleUpdate(self):
+        """
+        Arm the timer for the moment when the remaining time changes next time in the
+        finest resolution listeners need, or for the activity end if nobody listens
+        """
+        hook = self._timeChangedHook
+        resolution = hook.finestResolution() if hook is not None else None
+        if resolution is None:
+            nextValue = 0
+        else:
+            nextValue = max(0, self.remainingTime // resolution * resolution - 1)
+        nextChange = self.__deadline - nextValue
+        self.__timer.start(max(0.0, nextChange - self.__timer.now()))
 
     def _setRemainingTime(self, newTime):
         """
@@ -258,15 +1043,27 @@ class Activity:
         @type newTime: int
         """
         self.remainingTime = newTime
-        self.timeChanged.fire(self.remainingTime)
+        if self._timeChangedHook is not None:
+            self._timeChangedHook.fire(self.remainingTime)
         if self.remainingTime == 0:
+            self.endTime = self.__timer.wallTime()
+            self.actualDuration = self.__timer.now() - self.__startedAt - self.pausedDuration
+            self.__deadline = None
             self.__timer.stop()
-            self.finished.fire()
+            if self._finishedHook is not None:
+                self._finishedHook.fire()
+
+    def _timeHookCreated(self, hook):
+        """Reschedule the timer whenever the resolution subscribers need changes"""
+        hook.resolutionChanged += self._updateRemainingTime
 
     def removeHookHandlers(self):
         """Remove all handlers form all available event hooks"""
-        self.finished.clearHandlers()
-        self.timeChanged.clearHandlers()
+        if self._finishedHook is not None:
+            self._finishedHook.clearHandlers()
+        if self._timeChangedHook is not None:
+            self._timeChangedHook.clearHandlers()
+        self.__timer.elapsed -= self._updateRemainingTime
 
 
 class Settings:
@@ -276,6 +1073,17 @@ class Settings:
         self.workPeriod = 1500
         self.shortRestPeriod = 300
         self.longRestPeriod = 1500
-        self.endActivityAction = 'mpg123 {base}/assets/alarm.mp3'
+        self.longBreakInterval = 4
+        self.autoStart = False
+        self.alarmFile = '{base}/assets/alarm.mp3'
+        self.alarmPlayerCommand = ['pacat', '--raw', '--format=s16le', '--rate=44100',
+                                   '--channels=2']
+        self.alarmOverlapPolicy = 'restart'
+        self.workEndActions = []
+        self.breakEndActions = []
+        self.actionTimeout = 60
+        self.actionWorkers = 2
+        self.historyFile = '~/.local/share/pomidorka/history.log'
+        self.checkpointFile = '~/.local/state/pomidorka/checkpoint'
 
 
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Pomodoro cycle: work periods separated by short breaks, every longBreakInterval-th work
+period followed by a long break. The cycle is a table-driven state machine on top of
+ActivityManager. Tables depend only on the interval, so they are computed once and shared
+by all schedulers, which keeps a transition a pair of tuple lookups even for a daemon
+with many users.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from pomidorka.core import WORK, SHORT_BREAK, LONG_BREAK
+
+"""Events of the cycle state machine: an activity ended by itself or got interrupted"""
+FINISHED = 0
+INTERRUPTED = 1
+
+"""Priority of the scheduler handlers, lower than any other so the next activity starts
+after everybody has processed the end of the previous one"""
+HANDLER_PRIORITY = -1000
+
+"""Activity manager methods starting activities by kind"""
+_STARTERS = {WORK: 'startWorkActivity', SHORT_BREAK: 'startShortBreakActivity',
+             LONG_BREAK: 'startLongBreakActivity'}
+
+
+class CycleTable:
+    """
+    Transition table of a cycle. States are numbered from 0: even states are work
+    periods, odd states are breaks after them, the last state is the long break. An
+    interrupted work period has to be repeated, a long break taken out of turn restarts
+    the cycle.
+    """
+
+    def __init__(self, longBreakInterval):
+        """
+        @param longBreakInterval: number of work periods in the cycle
+        @type longBreakInterval: int
+        """
+        if longBreakInterval < 1:
+            raise ValueError('Long break interval must be positive')
+        self.kinds = (WORK, SHORT_BREAK) * (longBreakInterval - 1) + (WORK, LONG_BREAK)
+        self.size = len(self.kinds)
+        states = range(self.size)
+        self.transitions = (
+            tuple((state + 1) % self.size for state in states),
+            tuple(state if self.kinds[state] == WORK else (state + 1) % self.size
+                  for state in states),
+        )
+        alignments = []
+        for state in states:
+            isBreak = state % 2
+            workState = (state + isBreak) % self.size
+            breakState = state + 1 - isBreak
+            alignments.append({WORK: workState, SHORT_BREAK: breakState,
+                               LONG_BREAK: self.size - 1})
+        self.alignments = tuple(alignments)
+
+    def next(self, state, event):
+        """
+        @param state: current state
+        @type state: int
+        @param event: FINISHED or INTERRUPTED
+        @type event: int
+        @return: state after the event
+        @rtype: int
+        """
+        return self.transitions[event][state]
+
+    def align(self, state, kind):
+        """
+        Find the state matching an activity started outside of the cycle
+        @param state: current state
+        @type state: int
+        @param kind: kind of the started activity
+        @type kind: str
+        @return: state the activity is accounted as
+        @rtype: int
+        """
+        return self.alignments[state][kind]
+
+    def clamp(self, state):
+        """
+        Map a state of a longer cycle to this one, used when the interval gets changed
+        @param state: state of another table
+        @type state: int
+        @return: the same state or the last state of the same parity
+        @rtype: int
+        """
+        return min(state, self.size - 2 + state % 2)
+
+
+"""Tables by long break interval"""
+_TABLES = {}
+
+
+def cycleTable(longBreakInterval):
+    """
+    Get the shared table of a cycle
+    @param longBreakInterval: number of work periods in the cycle
+    @type longBreakInterval: int
+    @return: transition table
+    @rtype: CycleTable
+    """
+    table = _TABLES.get(longBreakInterval)
+    if table is None:
+        table = _TABLES[longBreakInterval] = CycleTable(longBreakInterval)
+    return table
+
+
+class CycleScheduler:
+    """
+    Chains activities of the manager according to the cycle. The long break interval and
+    auto-start flag are read from the manager settings on every transition, so reloaded
+    settings apply immediately. Activities started directly through the manager are
+    accounted too: the cycle is aligned to their kind.
+    """
+
+    __slots__ = ('__manager', '__state', '__event', '__weakref__')
+
+    def __init__(self, manager):
+        """
+        @param manager: manager running the activities
+        @type manager: ActivityManager
+        """
+        self.__manager = manager
+        self.__state = 0
+        self.__event = None
+        manager.activityStarted.subscribe(self._activityStarted, HANDLER_PRIORITY)
+        manager.activityRecorded.subscribe(self._activityRecorded, HANDLER_PRIORITY)
+        manager.workActivityEnded.subscribe(self._activityEnded, HANDLER_PRIORITY)
+        manager.breakActivityEnded.subscribe(self._activityEnded, HANDLER_PRIORITY)
+        if manager.currentActivity() is not None:
+            self._activityStarted(manager.currentActivity())
+
+    def _table(self):
+        """Get the table for the current settings, keeping the state within it"""
+        table = cycleTable(self.__manager.settings.longBreakInterval)
+        self.__state = table.clamp(self.__state)
+        return table
+
+    def nextKind(self):
+        """
+        @return: kind of the activity the cycle is going to start next
+        @rtype: str
+        """
+        return self._table().kinds[self.__state]
+
+    def completedWorkPeriods(self):
+        """
+        @return: number of work periods finished in the current cycle
+        @rtype: int
+        """
+        self._table()
+        return (self.__state + 1) // 2
+
+    def isPaused(self):
+        """
+        @return: whether the cycle is paused
+        @rtype: bool
+        """
+        activity = self.__manager.currentActivity()
+        return activity is not None and activity.isPaused()
+
+    def start(self):
+        """
+        Start the next activity of the cycle unless an activity is already running
+        @return: started activity or None
+        @rtype: Activity
+        """
+        if self.__manager.currentActivity() is not None:
+            return None
+        return getattr(self.__manager, _STARTERS[self.nextKind()])()
+
+    def pause(self):
+        """Pause the running activity keeping its remaining time"""
+        self.__manager.pauseCurrentActivity()
+
+    def resume(self):
+        """Resume the paused activity"""
+        self.__manager.resumeCurrentActivity()
+
+    def reset(self):
+        """Start the cycle from the first work period, the running activity is kept"""
+        self.__state = 0
+
+    def position(self):
+        """
+        @return: index of the current state in the cycle table
+        @rtype: int
+        """
+        self._table()
+        return self.__state
+
+    def setPosition(self, position):
+        """
+        Move the cycle to a state, e.g. one saved by another scheduler of the user
+        @param position: index of the state in the cycle table
+        @type position: int
+        """
+        self.__state = position
+        self._table()
+
+    def detach(self):
+        """Stop following the activities of the manager"""
+        self.__manager.activityStarted.unsubscribe(self._activityStarted)
+        self.__manager.activityRecorded.unsubscribe(self._activityRecorded)
+        self.__manager.workActivityEnded.unsubscribe(self._activityEnded)
+        self.__manager.breakActivityEnded.unsubscribe(self._activityEnded)
+
+    def _activityStarted(self, activity):
+        """Align the cycle to the started activity"""
+        self.__state = self._table().align(self.__state, activity.kind)
+
+    def _activityRecorded(self, record):
+        """Move the cycle according to the way the activity ended"""
+        self.__event = INTERRUPTED if record.interrupted else FINISHED
+        self.__state = self._table().next(self.__state, self.__event)
+
+    def _activityEnded(self):
+        """Start the next activity after a finished one if auto-start is enabled"""
+        event, self.__event = self.__event, None
+        if event == FINISHED and self.__manager.settings.autoStart and \
+                self.__manager.currentActivity() is None:
+            self.start()
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Headless daemon hosting activity managers of many users on a single scheduler"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from pomidorka.core import ActivityManager, Settings
+from pomidorka.cycle import CycleScheduler
+from pomidorka.scheduler import HeapScheduler, SchedulerTimer
+
+
+class UnknownUserError(KeyError):
+    """User identifier not registered in the daemon"""
+
+    def __str__(self):
+        return 'unknown user: {0}'.format(self.args[0])
+
+
+class TimerDaemon:
+    """
+    Host of activity managers, one per user. All activities share one scheduler. Unless
+    somebody subscribes to remaining time changes, activities wake up only when they end,
+    so the daemon does no work while nothing expires.
+    """
+
+    def __init__(self, scheduler=None):
+        """
+        @param scheduler: scheduler for activity timers, a new one is created if omitted
+        @type scheduler: HeapScheduler
+        """
+        if scheduler is None:
+            scheduler = HeapScheduler()
+        self.scheduler = scheduler
+        self.__managers = {}
+        self.__cycles = {}
+
+    def addUser(self, userId, settings=None):
+        """
+        Create an activity manager for the user
+        @param userId: identifier of the user
+        @type userId: str
+        @param settings: settings of the user, default settings are used if omitted
+        @type settings: Settings
+        @return: activity manager of the user
+        @rtype: ActivityManager
+        """
+        if userId in self.__managers:
+            raise KeyError('User {0} is already registered'.format(userId))
+        if settings is None:
+            settings = Settings()
+        manager = ActivityManager(settings, self._createTimer)
+        self.__managers[userId] = manager
+        return manager
+
+    def removeUser(self, userId):
+        """
+        Stop the running activity of the user and forget about the user
+        @param userId: identifier of the user
+        @type userId: str
+        """
+        manager = self._manager(userId)
+        del self.__managers[userId]
+        cycle = self.__cycles.pop(userId, None)
+        if cycle is not None:
+            cycle.detach()
+        manager.stopCurrentActivity()
+
+    def exportUser(self, userId):
+        """
+        Forget about the user keeping the running activity going, so the user can be
+        moved to another daemon
+        @param userId: identifier of the user
+        @type userId: str
+        @return: settings, checkpoint of the current activity or None and cycle position or
+        None if the user does not follow a cycle
+        @rtype: tuple
+        """
+        manager = self._manager(userId)
+        del self.__managers[userId]
+        cycle = self.__cycles.pop(userId, None)
+        position = None
+        if cycle is not None:
+            position = cycle.position()
+            cycle.detach()
+        activity = manager.currentActivity()
+        checkpoint = None
+        if activity is not None:
+            from pomidorka.checkpoint import snapshot
+            checkpoint = snapshot(activity)
+        manager.releaseActivity()
+        return manager.settings, checkpoint, position
+
+    def importUser(self, userId, settings, checkpoint=None, position=None):
+        """
+        Register a user exported by another daemon and continue the user activity
+        @param userId: identifier of the user
+        @type userId: str
+        @param settings: settings of the user
+        @type settings: Settings
+        @param checkpoint: state of the user activity or None
+        @type checkpoint: Checkpoint
+        @param position: cycle position of the user or None
+        @type position: int
+        @return: activity manager of the user
+        @rtype: ActivityManager
+        """
+        manager = self.addUser(userId, settings)
+        if position is not None:
+            self.getCycle(userId).setPosition(position)
+        if checkpoint is not None:
+            from pomidorka.checkpoint import restoreCheckpoint
+            restoreCheckpoint(manager, checkpoint)
+        return manager
+
+    def getManager(self, userId):
+        """
+        Get activity manager of the user
+        @param userId: identifier of the user
+        @type userId: str
+        @return: activity manager of the user
+        @rtype: ActivityManager
+        @raise UnknownUserError: if the user is not registered
+        """
+        return self._manager(userId)
+
+    def getCycle(self, userId):
+        """
+        Get pomodoro cycle of the user, it is created on the first request, so users not
+        following cycles cost nothing
+        @param userId: identifier of the user
+        @type userId: str
+        @return: cycle scheduler of the user
+        @rtype: CycleScheduler
+        """
+        cycle = self.__cycles.get(userId)
+        if cycle is None:
+            cycle = CycleScheduler(self._manager(userId))
+            self.__cycles[userId] = cycle
+        return cycle
+
+    def users(self):
+        """
+        @return: identifiers of all registered users
+        @rtype: list
+        """
+        return list(self.__managers)
+
+    def __len__(self):
+        """
+        @return: number of registered users
+        @rtype: int
+        """
+        return len(self.__managers)
+
+    def status(self, userId):
+        """
+        Get the state of the user activity
+        @param userId: identifier of the user
+        @type userId: str
+        @return: dictionary with running and paused flags and remaining time in seconds
+        @rtype: dict
+        """
+        activity = self._manager(userId).currentActivity()
+        if activity is None:
+            return {'running': False, 'paused': False, 'remainingTime': 0}
+        return {'running': True, 'paused': activity.isPaused(),
+                'remainingTime': activity.currentRemainingTime()}
+
+    def run(self):
+        """Process activity timers until all activities end or the scheduler is stopped"""
+        self.scheduler.run()
+
+    def _manager(self, userId):
+        """Get the activity manager of a registered user"""
+        try:
+            return self.__managers[userId]
+        except KeyError:
+            raise UnknownUserError(userId) from None
+
+    def _createTimer(self):
+        """
+        Create a timer for a new activity
+        @return: timer bound to the daemon scheduler
+        @rtype: SchedulerTimer
+        """
+        return SchedulerTimer(self.scheduler)
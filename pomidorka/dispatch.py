@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Executors delivering event hook notifications on the thread their handlers belong to.
+
+A handler subscribed with an executor is called directly when the hook fires on the
+executor thread, which costs one thread identity check. Fired on another thread, the call
+is queued and the executor thread is woken up once for the whole batch of calls queued
+until it drains the queue. Appending to the queue takes no lock, so firing threads do not
+contend with each other or with the draining thread.
+
+Executor backends are imported lazily, so the core does not depend on any event loop.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from collections import deque
+import logging
+import threading
+import time
+from pomidorka.profiling import PROFILER
+
+"""Signal object waking up the Qt main thread, its class is created on first use"""
+_qtWakeupClass = None
+
+
+class Executor:
+    """
+    Abstract target thread of handler calls. Implementations define isCurrent and
+    arrange a drain call on the target thread in _wakeup.
+    """
+
+    def __init__(self, name=None):
+        """
+        @param name: name of the executor shown in profiling results
+        @type name: str
+        """
+        self.__calls = deque()
+        self.__wakeupPending = False
+        self.__profileName = 'Executor.drain:{0}'.format(name or 'anonymous')
+        self.batches = 0
+        self.delivered = 0
+
+    def isCurrent(self):
+        """
+        @return: whether the calling thread is the thread of the executor
+        @rtype: bool
+        """
+        return False
+
+    def call(self, function, *args, **keywargs):
+        """
+        Call a function on the executor thread, directly if it is the calling thread
+        @param function: function to be called
+        @type function: function
+        """
+        if self.isCurrent():
+            function(*args, **keywargs)
+        else:
+            self.post(function, args, keywargs)
+
+    def post(self, function, args=(), keywargs=None):
+        """
+        Queue a call to be made on the executor thread. Calls are made in order of posting.
+        @param function: function to be called
+        @type function: function
+        @param args: positional arguments of the call
+        @type args: tuple
+        @param keywargs: keyword arguments of the call
+        @type keywargs: dict
+        """
+        self.__calls.append((function, args, keywargs))
+        if not self.__wakeupPending:
+            self.__wakeupPending = True
+            self._wakeup()
+
+    def drain(self):
+        """
+        Make all queued calls, must be called on the executor thread. A failing call is
+        logged and does not prevent the following ones.
+        @return: number of made calls
+        @rtype: int
+        """
+        self.__wakeupPending = False
+        calls = self.__calls
+        profiled = PROFILER.enabled
+        if profiled:
+            started = time.perf_counter()
+        count = 0
+        while calls:
+            function, args, keywargs = calls.popleft()
+            count += 1
+            try:
+                if keywargs:
+                    function(*args, **keywargs)
+                else:
+                    function(*args)
+            except Exception:
+                logging.exception('Queued handler %r failed', function)
+        self.batches += 1
+        self.delivered += count
+        if profiled:
+            PROFILER.record(self.__profileName, started)
+        return count
+
+    def _wakeup(self):
+        """Arrange drain to be called on the executor thread"""
+        pass
+
+
+class QtExecutor(Executor):
+    """Executor of the Qt main thread, it must be created on that thread"""
+
+    def __init__(self, name='qt'):
+        """
+        @param name: name of the executor shown in profiling results
+        @type name: str
+        """
+        global _qtWakeupClass
+        from PySide.QtCore import QObject, Qt, Signal
+        Executor.__init__(self, name)
+        if _qtWakeupClass is None:
+            _qtWakeupClass = type('QtExecutorWakeup', (QObject,), {'wakeup': Signal()})
+        self.__threadId = threading.get_ident()
+        self.__wakeup = _qtWakeupClass()
+        self.__wakeup.wakeup.connect(self.drain, Qt.QueuedConnection)
+
+    def isCurrent(self):
+        """
+        @return: whether the calling thread is the Qt main thread
+        @rtype: bool
+        """
+        return threading.get_ident() == self.__threadId
+
+    def _wakeup(self):
+        """Post an event to the main thread event loop"""
+        self.__wakeup.wakeup.emit()
+
+
+class AsyncioExecutor(Executor):
+    """Executor of an asyncio event loop thread, it must be created on that thread"""
+
+    def __init__(self, loop=None, name='asyncio'):
+        """
+        @param loop: event loop to deliver calls on, the running loop is used if omitted
+        @type loop: asyncio.AbstractEventLoop
+        @param name: name of the executor shown in profiling results
+        @type name: str
+        """
+        Executor.__init__(self, name)
+        if loop is None:
+            import asyncio
+            loop = asyncio.get_running_loop()
+        self.__loop = loop
+        self.__threadId = threading.get_ident()
+
+    def isCurrent(self):
+        """
+        @return: whether the calling thread runs the event loop
+        @rtype: bool
+        """
+        return threading.get_ident() == self.__threadId
+
+    def _wakeup(self):
+        """Schedule draining on the event loop"""
+        self.__loop.call_soon_threadsafe(self.drain)
+
+
+class PoolExecutor(Executor):
+    """
+    Executor of a thread pool. A batch runs on one pool thread at a time, so calls keep
+    their order. Calls posted by a handler running in a batch are made directly.
+    """
+
+    def __init__(self, pool, name='pool'):
+        """
+        @param pool: pool running the batches
+        @type pool: concurrent.futures.Executor
+        @param name: name of the executor shown in profiling results
+        @type name: str
+        """
+        Executor.__init__(self, name)
+        self.__pool = pool
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+
+    def isCurrent(self):
+        """
+        @return: whether the calling thread is draining this executor
+        @rtype: bool
+        """
+        return getattr(self.__local, 'draining', False)
+
+    def drain(self):
+        """
+        Make all queued calls on the calling pool thread
+        @return: number of made calls
+        @rtype: int
+        """
+        with self.__lock:
+            self.__local.draining = True
+            try:
+                return Executor.drain(self)
+            finally:
+                self.__local.draining = False
+
+    def _wakeup(self):
+        """Submit draining to the pool"""
+        self.__pool.submit(self.drain)
@@ -29,14 +29,28 @@ __author__ = 'Andrey Vasilev <vamonster@gmail.com>'
 
 from PySide.QtGui import QMainWindow, QSystemTrayIcon, QWidget, QPushButton, QLabel, \
     QVBoxLayout, QHBoxLayout, QAction, QMenu, QApplication, QIcon, QPainter, QFont, QPen, \
-    QColor
-from PySide.QtCore import QCoreApplication, Qt, QPoint
-from pomidorka.core import ActivityManager, Settings
-import subprocess
-from multiprocessing import Process
+    QColor, QPixmap
+from PySide.QtCore import QCoreApplication, Qt, QPoint, QSocketNotifier, QTimer
+from pomidorka.core import ActivityManager, WORK
+from pomidorka.timers import QtOneSecondTimer
 from pomidorka import resources
+from pomidorka.actions import ActionRunner
+from pomidorka.alarm import AlarmPlayer, PipeAudioSink, decodeMp3, decodeMp3Data
+from pomidorka.checkpoint import CheckpointStore
+from pomidorka.config import SettingsFile, SettingsError
+from pomidorka.control import ControlServer, ControlProtocol, ControlError
+from pomidorka.cycle import CycleScheduler
+from pomidorka.dispatch import QtExecutor
+from pomidorka.history import HistoryStore
+from pomidorka.power import DisplayUpdater, ScreenLockMonitor, WakeupMeter
+from pomidorka.profiling import PROFILER
+import os
 import sys
 import logging
+from time import perf_counter
+
+"""Interval of checking the settings file for changes in milliseconds"""
+SETTINGS_POLL_INTERVAL = 5000
 
 
 class ActivityStatus(QMainWindow):
@@ -46,18 +60,48 @@ class ActivityStatus(QMainWindow):
 
     def __init__(self):
         QMainWindow.__init__(self, None, Qt.FramelessWindowHint)
-        self.__settings = Settings()
-        self.__activityManager = ActivityManager(self.__settings)
+        self.__mainThread = QtExecutor()
+        self.__settingsFile = _loadSettings()
+        self.__settings = self.__settingsFile.settings
+        self.__history = _openHistory(self.__settings)
+        self.__wakeupMeter = WakeupMeter()
+        self.__activityManager = ActivityManager(
+            self.__settings, self.__wakeupMeter.timerFactory(QtOneSecondTimer),
+            history=self.__history)
+        self.__checkpoint = CheckpointStore(os.path.expanduser(self.__settings.checkpointFile))
+        self.__checkpoint.restore(self.__activityManager)
+        self.__checkpoint.connect(self.__activityManager)
+        self.__cycle = CycleScheduler(self.__activityManager)
         self.__trayIcon = QSystemTrayIcon(self)
-        self.__managerController = ActivityManagerControl(self, self.__activityManager)
+        self.__managerController = ActivityManagerControl(self, self.__activityManager,
+                                                          self.__mainThread)
         self.__appMenu = QMenu(self)
         self.__closeAction = QAction(self.tr('Close'), self)
         self.__appIcon = resources.getIcon('pomidor.png')
+        self.__timeIcons = RemainingTimeIcons('pomidor.png')
+        self.__alarmPlayer = _createAlarmPlayer(self.__settings)
+        self.__alarmConfiguration = _alarmConfiguration(self.__settings)
+        self.__actionRunner = ActionRunner(self.__settings.actionWorkers)
+        self.__shownTime = None
+        self.__settingsTimer = QTimer(self)
         self._configureActions()
         self._configureMenu()
         self._setupTrayIcon()
         self._configureMainWindow()
+        self.__displayUpdater = DisplayUpdater(self.__activityManager, self._showRemainingTime,
+                                               self.__managerController.setRemainingTime,
+                                               self.__mainThread)
         self._setupEventHooks()
+        self.__controlProtocol = ControlProtocol(self.__activityManager)
+        self.__controlProtocol.addCommand('show', self._showMainWindw)
+        self.__controlProtocol.addCommand('next', self.__cycle.start)
+        self.__controlProtocol.addStatusField('wakeupsPerMinute',
+                                              self.__wakeupMeter.perMinute)
+        self.__controlProtocol.addStatusField('actions', self.__actionRunner.metrics.summary)
+        self.__screenLockMonitor = ScreenLockMonitor(QtSocketWatcher(self))
+        self.__screenLockMonitor.lockChanged += self.__displayUpdater.setLocked
+        QCoreApplication.instance().aboutToQuit.connect(self.__screenLockMonitor.close)
+        self.__controlServer = self._startControlServer()
         logging.debug('Application started')
 
     def _setupTrayIcon(self):
@@ -75,11 +119,69 @@ class ActivityStatus(QMainWindow):
         self.setWindowIcon(self.__appIcon)
 
     def _setupEventHooks(self):
-        """Connect to event hooks provided by the activity manager"""
-        self.__activityManager.activityStarted += self._hideMainWindow
-        self.__activityManager.workActivityEnded += self._notifyActivityEnding
-        self.__activityManager.breakActivityEnded += self._notifyActivityEnding
-        self.__activityManager.activityTimeChanged += self._showRemainingTime
+        """
+        Connect to event hooks provided by the activity manager. Handlers touching widgets
+        run on the main thread whichever thread fires the hooks.
+        """
+        manager = self.__activityManager
+        manager.activityStarted.subscribe(self._hideMainWindow, executor=self.__mainThread)
+        manager.workActivityEnded.subscribe(self._notifyActivityEnding,
+                                            executor=self.__mainThread)
+        manager.breakActivityEnded.subscribe(self._notifyActivityEnding,
+                                             executor=self.__mainThread)
+        manager.activityRecorded += self._runEndActions
+        self.__settingsFile.changed += self._applySettings
+        self.__settingsTimer.timeout.connect(self.__settingsFile.poll)
+        self.__settingsTimer.start(SETTINGS_POLL_INTERVAL)
+        self.__displayUpdater.lockChanged += self._screenLockChanged
+
+    def _screenLockChanged(self, locked):
+        """
+        Stop periodic work while the screen is locked, catch up once it is unlocked
+        @param locked: whether the screen is locked
+        @type locked: bool
+        """
+        if locked:
+            self.__settingsTimer.stop()
+        else:
+            self.__settingsFile.poll()
+            self.__settingsTimer.start(SETTINGS_POLL_INTERVAL)
+
+    def _applySettings(self, settings):
+        """
+        Apply reloaded settings, which are not read anew on every activity
+        @param settings: the reloaded settings
+        @type settings: Settings
+        """
+        alarmConfiguration = _alarmConfiguration(settings)
+        if alarmConfiguration != self.__alarmConfiguration:
+            self.__alarmConfiguration = alarmConfiguration
+            self.__alarmPlayer.close()
+            self.__alarmPlayer = _createAlarmPlayer(settings)
+
+    def _startControlServer(self):
+        """
+        Start listening to commands of local clients
+        @return: started server or None if it cannot be started
+        @rtype: ControlServer
+        """
+        try:
+            server = ControlServer(self.__controlProtocol, QtSocketWatcher(self))
+        except (ControlError, OSError) as error:
+            logging.warning('Control socket is not available: %s', error)
+            return None
+        QCoreApplication.instance().aboutToQuit.connect(server.close)
+        return server
+
+    def executeCommand(self, command):
+        """
+        Execute a control command as if it came from a local client
+        @param command: name of the command
+        @type command: str
+        """
+        response = self.__controlProtocol.handle(command)
+        if not response['ok']:
+            logging.warning('Command %s failed: %s', command, response['error'])
 
     def _configureMenu(self):
         """Configure application menu, add all actions and separators"""
@@ -90,6 +192,9 @@ class ActivityStatus(QMainWindow):
     def _configureActions(self):
         """Configure actions of the main controller"""
         self.__closeAction.triggered.connect(_closeApplication)
+        if self.__history is not None:
+            QCoreApplication.instance().aboutToQuit.connect(self.__history.close)
+        QCoreApplication.instance().aboutToQuit.connect(self.__actionRunner.close)
 
     def _trayIconClicked(self, reason):
         """
@@ -115,23 +220,51 @@ class ActivityStatus(QMainWindow):
     def _hideMainWindow(self, _=''):
         """Hide main window from the screen"""
         logging.debug('Main window is hidden')
+        if PROFILER.enabled:
+            started = perf_counter()
         self.setVisible(False)
+        self.__displayUpdater.setWindowVisible(False)
+        if PROFILER.enabled:
+            PROFILER.record('window.hide', started)
 
     def _showMainWindw(self):
         """Show main window near-by to the system tray icon"""
         logging.debug('Main window is shown')
+        if PROFILER.enabled:
+            started = perf_counter()
         self.setVisible(True)
+        self.__displayUpdater.setWindowVisible(True)
         trayIconGeometry = self.__trayIcon.geometry()
         screenGeometry = QApplication.desktop().screenGeometry(trayIconGeometry.topLeft())
         self.move(_calculateWindowPosition(screenGeometry, trayIconGeometry, self.width(),
                                            self.height()))
+        if PROFILER.enabled:
+            PROFILER.record('window.show', started)
 
     def _notifyActivityEnding(self):
         """Invoke activity ending action"""
         logging.debug('Notifying user about action ending')
-        process = Process(target=_executeAction, args=(self.__settings.endActivityAction,))
-        process.start()
+        if PROFILER.enabled:
+            started = perf_counter()
+        self.__alarmPlayer.play()
+        if PROFILER.enabled:
+            PROFILER.record('alarm.dispatch', started)
         self.__trayIcon.setIcon(self.__appIcon)
+        self.__shownTime = None
+
+    def _runEndActions(self, record):
+        """
+        Submit the actions configured for the ended activity, returning at once
+        @param record: record of the ended activity
+        @type record: ActivityRecord
+        """
+        if record.kind == WORK:
+            commands = self.__settings.workEndActions
+        else:
+            commands = self.__settings.breakEndActions
+        if commands:
+            self.__actionRunner.run(_expandCommands(commands), record.kind,
+                                    self.__settings.actionTimeout)
 
     def _showRemainingTime(self, seconds):
         """
@@ -143,17 +276,106 @@ class ActivityStatus(QMainWindow):
             time = int(seconds / 60)
         else:
             time = seconds
+        if time == self.__shownTime:
+            if PROFILER.enabled:
+                PROFILER.count('tray.unchanged')
+            return
+        if PROFILER.enabled:
+            started = perf_counter()
+        self.__shownTime = time
+        self.__trayIcon.setIcon(self.__timeIcons.getIcon(time))
+        if PROFILER.enabled:
+            PROFILER.record('tray.update', started)
+
+
+class RemainingTimeIcons:
+    """
+    Cache of tray icons showing the remaining time. Icons are painted on the first request
+    and reused afterwards, the shown value never exceeds 60, so the cache stays small.
+    """
+
+    def __init__(self, baseImageName):
+        """
+        @param baseImageName: name of the image the time is painted on
+        @type baseImageName: str
+        """
+        self.__basePixelMap = resources.getPixelMap(baseImageName)
+        self.__shadowFont = QFont("PT Sans", 64, QFont.Bold)
+        self.__textFont = QFont("PT Sans", 58, QFont.Bold)
+        self.__icons = {}
+
+    def getIcon(self, time):
+        """
+        Get an icon with the time painted on it
+        @param time: value to be shown on the icon
+        @type time: int
+        @return: icon for the time value
+        @rtype: QIcon
+        """
+        icon = self.__icons.get(time)
+        if icon is None:
+            icon = self._paintIcon(time)
+            self.__icons[time] = icon
+        return icon
+
+    def _paintIcon(self, time):
+        """
+        Paint a new icon for the time value
+        @param time: value to be shown on the icon
+        @type time: int
+        @return: new icon object
+        @rtype: QIcon
+        """
+        if PROFILER.enabled:
+            started = perf_counter()
         text = "{0:02d}".format(time)
-        basePixelMap = resources.getPixelMap('pomidor.png')
-        painter = QPainter(basePixelMap)
-        painter.setFont(QFont("PT Sans", 64, QFont.Bold))
+        pixelMap = QPixmap(self.__basePixelMap)
+        painter = QPainter(pixelMap)
+        painter.setFont(self.__shadowFont)
         painter.setPen(QPen(QColor(0, 0, 0)))
-        painter.drawText(basePixelMap.rect(), Qt.AlignCenter, text)
-        painter.setFont(QFont("PT Sans", 58, QFont.Bold))
+        painter.drawText(pixelMap.rect(), Qt.AlignCenter, text)
+        painter.setFont(self.__textFont)
         painter.setPen(QPen(QColor(240, 240, 240)))
-        painter.drawText(basePixelMap.rect(), Qt.AlignCenter, text)
+        painter.drawText(pixelMap.rect(), Qt.AlignCenter, text)
         painter.end()
-        self.__trayIcon.setIcon(QIcon(basePixelMap))
+        icon = QIcon(pixelMap)
+        if PROFILER.enabled:
+            PROFILER.record('icon.render', started)
+        return icon
+
+
+class QtSocketWatcher:
+    """Watcher of file descriptors for the control server based on the Qt event loop"""
+
+    def __init__(self, parent):
+        """
+        @param parent: object owning socket notifiers
+        @type parent: QObject
+        """
+        self.__parent = parent
+        self.__notifiers = {}
+
+    def watch(self, fileno, callback):
+        """
+        Call the callback whenever the descriptor becomes readable
+        @param fileno: file descriptor
+        @type fileno: int
+        @param callback: function without arguments
+        @type callback: function
+        """
+        notifier = QSocketNotifier(fileno, QSocketNotifier.Read, self.__parent)
+        notifier.activated.connect(lambda _: callback())
+        self.__notifiers[fileno] = notifier
+
+    def unwatch(self, fileno):
+        """
+        Stop watching the descriptor
+        @param fileno: file descriptor
+        @type fileno: int
+        """
+        notifier = self.__notifiers.pop(fileno)
+        notifier.setEnabled(False)
+        notifier.deleteLater()
 
 
 def _closeApplication():
@@ -164,15 +386,75 @@ def _closeApplication():
     QCoreApplication.quit()
 
 
-def _executeAction(action):
+def _loadSettings():
+    """
+    Load settings of the user, invalid settings file is reported and replaced by defaults
+    @return: loaded settings file
+    @rtype: SettingsFile
+    """
+    settingsFile = SettingsFile()
+    try:
+        settingsFile.load()
+    except SettingsError as error:
+        logging.error('Default settings are used: %s', error)
+    return settingsFile
+
+
+def _openHistory(settings):
+    """
+    Open the storage of finished activities, creating its directory if needed. A storage
+    that can't be opened is reported and the history is not kept
+    @param settings: application settings
+    @type settings: Settings
+    @return: opened history storage or None
+    @rtype: HistoryStore
+    """
+    path = os.path.expanduser(settings.historyFile)
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        return HistoryStore(path)
+    except (OSError, ValueError) as error:
+        logging.error('History is not kept: %s', error)
+        return None
+
+
+def _createAlarmPlayer(settings):
+    """
+    Create the player of the activity ending alarm
+    @param settings: application settings
+    @type settings: Settings
+    @return: new alarm player
+    @rtype: AlarmPlayer
+    """
+    assetName = resources.assetName(settings.alarmFile)
+    if assetName is not None:
+        decoder = lambda: decodeMp3Data(resources.getData(assetName))
+    else:
+        alarmFile = os.path.expanduser(settings.alarmFile.format(base=resources.BASEDIR))
+        decoder = lambda: decodeMp3(alarmFile)
+    sink = PipeAudioSink(settings.alarmPlayerCommand)
+    return AlarmPlayer(decoder, sink, settings.alarmOverlapPolicy)
+
+
+def _alarmConfiguration(settings):
     """
-    Execute an action specified by a string
-    @param action: action to be executed
-    @type action: str
+    @return: settings the alarm player is created with
+    @rtype: tuple
     """
-    runningAction = action.format(base=resources.BASEDIR)
-    logging.debug('Executing subprocess: %s', runningAction)
-    subprocess.call(runningAction, shell=True)
+    return settings.alarmFile, tuple(settings.alarmPlayerCommand), settings.alarmOverlapPolicy
+
+
+def _expandCommands(commands):
+    """
+    Substitute the application directory for {base} in the action arguments
+    @param commands: commands as lists of arguments
+    @type commands: list
+    @return: commands ready to be run
+    @rtype: list
+    """
+    return [[argument.replace('{base}', resources.BASEDIR) for argument in command]
+            for command in commands]
 
 """Possible locations of the system tray in which tray icon is shown"""
 LEFT = 'left'
@@ -257,26 +539,33 @@ class ActivityManagerControl(QWidget):
     Timer status display and control widget
     """
 
-    def __init__(self, parent, activityManager):
+    def __init__(self, parent, activityManager, executor=None):
         """
         @param parent: parent widget to bound with
         @type parent: QWidget
         @param activityManager: the manager of user activities
         @type activityManager: ActivityManager
+        @param executor: executor of the main thread, manager events are handled on the
+        firing thread if omitted
+        @type executor: Executor
         """
         QWidget.__init__(self, parent)
         self.__activityManager = activityManager
+        self.__executor = executor
         self.__startWorkActivity = QAction(self.tr('Start'), self)
         self.__stopActivity = QAction(self.tr('Stop'), self)
+        self.__pauseActivity = QAction(self.tr('Pause'), self)
+        self.__resumeActivity = QAction(self.tr('Resume'), self)
         self.__startShortBreakActivity = QAction(self.tr('Short'), self)
         self.__startLongBreakActivity = QAction(self.tr('Long'), self)
-        self.actionList = [self.__startWorkActivity, self.__stopActivity,
+        self.actionList = [self.__startWorkActivity, self.__pauseActivity,
+                           self.__resumeActivity, self.__stopActivity,
                            self.__startLongBreakActivity, self.__startShortBreakActivity]
         self.__timeLeft = QLabel()
         self._layoutWidgets()
         self._enableActions([self.__startWorkActivity])
         self._setupEventHandlers()
-        self._showStartWorkScreen()
+        self._showCurrentActivityScreen()
 
     def _layoutWidgets(self):
         """
@@ -290,6 +579,8 @@ class ActivityManagerControl(QWidget):
         mainLayout.addLayout(timerLayout)
         buttonLayout = QHBoxLayout()
         buttonLayout.addWidget(ActionButton(self.__startWorkActivity, self))
+        buttonLayout.addWidget(ActionButton(self.__pauseActivity, self))
+        buttonLayout.addWidget(ActionButton(self.__resumeActivity, self))
         buttonLayout.addWidget(ActionButton(self.__stopActivity, self))
         buttonLayout.addWidget(ActionButton(self.__startShortBreakActivity, self))
         buttonLayout.addWidget(ActionButton(self.__startLongBreakActivity, self))
@@ -300,12 +591,17 @@ class ActivityManagerControl(QWidget):
         """Setup connection between events and corresponding event handlers"""
         self.__startWorkActivity.triggered.connect(self._startWorkActivity)
         self.__stopActivity.triggered.connect(self._stopRunningActivity)
+        self.__pauseActivity.triggered.connect(self._pauseRunningActivity)
+        self.__resumeActivity.triggered.connect(self._resumePausedActivity)
         self.__startShortBreakActivity.triggered.connect(self._startShortBreakActivity)
         self.__startLongBreakActivity.triggered.connect(self._startLongBreakActivity)
-        self.__activityManager.activityStarted += self._showActivityRunningScreen
-        self.__activityManager.workActivityEnded += self._showStartRestScreen
-        self.__activityManager.activityTimeChanged += self._setActivityRemainingTime
-        self.__activityManager.breakActivityEnded += self._showStartWorkScreen
+        manager = self.__activityManager
+        executor = self.__executor
+        manager.activityStarted.subscribe(self._showActivityRunningScreen, executor=executor)
+        manager.workActivityEnded.subscribe(self._showStartRestScreen, executor=executor)
+        manager.breakActivityEnded.subscribe(self._showStartWorkScreen, executor=executor)
+        manager.activityPaused.subscribe(self._showActivityPausedScreen, executor=executor)
+        manager.activityResumed.subscribe(self._showActivityRunningScreen, executor=executor)
 
     def _startWorkActivity(self):
         """ Start work activity for the user """
@@ -317,6 +613,16 @@ class ActivityManagerControl(QWidget):
         logging.debug('Stopping running activity')
         self.__activityManager.stopCurrentActivity()
 
+    def _pauseRunningActivity(self):
+        """ Pause the currently running activity """
+        logging.debug('Pausing running activity')
+        self.__activityManager.pauseCurrentActivity()
+
+    def _resumePausedActivity(self):
+        """ Resume the paused activity """
+        logging.debug('Resuming paused activity')
+        self.__activityManager.resumeCurrentActivity()
+
     def _startShortBreakActivity(self):
         """ Start short break activity """
         logging.debug('Starting short break activity')
@@ -327,10 +633,27 @@ class ActivityManagerControl(QWidget):
         logging.debug('Starting long break activity')
         self.__activityManager.startLongBreakActivity()
 
+    def _showCurrentActivityScreen(self):
+        """Show screen matching the activity the manager has, e.g. a restored one"""
+        activity = self.__activityManager.currentActivity()
+        if activity is None:
+            self._showStartWorkScreen()
+        elif activity.isPaused():
+            self._showActivityPausedScreen(activity)
+        else:
+            self._showActivityRunningScreen(activity)
+
     def _showActivityRunningScreen(self, _):
         """Show activity running screen"""
         logging.debug('Activity started')
-        self._enableActions([self.__stopActivity])
+        self._enableActions([self.__pauseActivity, self.__stopActivity])
+
+    def _showActivityPausedScreen(self, activity):
+        """Show screen of the paused activity, allowing to resume it"""
+        logging.debug('Activity paused')
+        self._enableActions([self.__resumeActivity, self.__stopActivity])
+        minutes, seconds = divmod(activity.currentRemainingTime(), 60)
+        self.__timeLeft.setText('{0:02d}:{1:02d} paused'.format(minutes, seconds))
 
     def _showStartWorkScreen(self):
         """Show screen, allowing to start work"""
@@ -344,7 +667,7 @@ class ActivityManagerControl(QWidget):
         self._enableActions([self.__startLongBreakActivity, self.__startShortBreakActivity])
         self.__timeLeft.setText('Take a break')
 
-    def _setActivityRemainingTime(self, secondsLeft):
+    def setRemainingTime(self, secondsLeft):
         """
         Show activity remaining time on the label
         @param secondsLeft: how much time is left for the activity
@@ -395,11 +718,18 @@ class ActionButton(QPushButton):
             self.setFocus()
 
 
-def startApplication():
+def startApplication(initialCommand=None):
     """
     Start application and show application window
+    @param initialCommand: control command to execute once the application is started,
+    e.g. 'work' to start working immediately
+    @type initialCommand: str
     """
     logging.debug('Starting application')
     app = QApplication(sys.argv)
-    ActivityStatus()
-    return app.exec_()
\ No newline at end of file
+    window = ActivityStatus()
+    if initialCommand is not None:
+        window.executeCommand(initialCommand)
+    result = app.exec_()
+    del window
+    return result
\ No newline at end of file
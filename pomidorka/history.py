@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Durable history of finished activities. Records are appended to a binary log of fixed-size
+entries, a sidecar index keeps start time of every INDEX_STEP-th record, so range queries
+seek straight to the interesting part of the log.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from array import array
+from bisect import bisect_right
+import os
+import struct
+import time
+import zlib
+from pomidorka.core import ActivityRecord, WORK, SHORT_BREAK, LONG_BREAK
+
+"""Log file header: magic and format version"""
+_HEADER = struct.Struct('<4sH2x')
+_MAGIC = b'PMDH'
+_VERSION = 1
+
+"""
+Record: start, end, planned duration, actual duration, kind, interrupted flag, number of
+pauses, paused duration, checksum
+"""
+_RECORD = struct.Struct('<ddIdBBHdI')
+_PAYLOAD_SIZE = _RECORD.size - 4
+
+"""Number of records described by one entry of the index"""
+INDEX_STEP = 256
+
+"""Activity kinds, stored in the log as indices in this tuple"""
+KINDS = (WORK, SHORT_BREAK, LONG_BREAK)
+_KIND_CODES = dict((kind, code) for code, kind in enumerate(KINDS))
+
+
+class HistoryStore:
+    """
+    Append-only storage of activity records. Records must be appended in the order of their
+    start time. Written data reach the operating system immediately, fsync is done in
+    batches. A torn record at the end of the log, left by a crash, is dropped on opening.
+    A store opened read-only never modifies the files, it ignores a torn end of the log in
+    memory, so it may be used while another process appends records.
+    """
+
+    def __init__(self, path, syncBatch=16, syncInterval=60.0, readOnly=False):
+        """
+        @param path: path to the log file, the index is stored next to it
+        @type path: str
+        @param syncBatch: number of appended records forcing fsync
+        @type syncBatch: int
+        @param syncInterval: maximum time in seconds between the first not synced record and
+        fsync
+        @type syncInterval: float
+        @param readOnly: open the log for reading only without repairing it
+        @type readOnly: bool
+        """
+        self.path = path
+        self.__readOnly = readOnly
+        self.__syncBatch = syncBatch
+        self.__syncInterval = syncInterval
+        self.__unsynced = 0
+        self.__lastSync = time.monotonic()
+        self.__log = open(path, 'rb' if readOnly else 'a+b')
+        self.__count = self._recoverLog()
+        self.__index = array('d')
+        self.__indexFile = None if readOnly else open(path + '.idx', 'a+b')
+        self._recoverIndex()
+
+    def _recoverLog(self):
+        """
+        Check the log header and cut off incomplete or damaged records at its end
+        @return: number of valid records
+        @rtype: int
+        """
+        log = self.__log
+        size = os.fstat(log.fileno()).st_size
+        header = _HEADER.pack(_MAGIC, _VERSION)
+        log.seek(0)
+        data = log.read(_HEADER.size)
+        if len(data) < _HEADER.size and header.startswith(data):
+            # empty or torn while being created
+            if self.__readOnly:
+                return 0
+            log.truncate(0)
+            log.write(header)
+            log.flush()
+            os.fsync(log.fileno())
+            return 0
+        if data != header:
+            raise ValueError('{0} is not a history log of version {1}'.format(self.path,
+                                                                            _VERSION))
+        count = (size - _HEADER.size) // _RECORD.size
+        while count > 0 and self._readRecordData(count - 1) is None:
+            count -= 1
+        validSize = _HEADER.size + count * _RECORD.size
+        if validSize != size and not self.__readOnly:
+            log.truncate(validSize)
+            os.fsync(log.fileno())
+        return count
+
+    def _recoverIndex(self):
+        """Load the index, dropping extra entries and adding missing ones"""
+        data = self._readIndexData()
+        self.__index.frombytes(data[:len(data) - len(data) % self.__index.itemsize])
+        expected = (self.__count + INDEX_STEP - 1) // INDEX_STEP
+        if len(self.__index) > expected:
+            del self.__index[expected:]
+        for position in range(len(self.__index) * INDEX_STEP, self.__count, INDEX_STEP):
+            self.__index.append(_RECORD.unpack(self._readRecordData(position))[0])
+        if len(data) != len(self.__index) * self.__index.itemsize and not self.__readOnly:
+            indexFile = self.__indexFile
+            indexFile.truncate(0)
+            indexFile.write(self.__index.tobytes())
+            indexFile.flush()
+            os.fsync(indexFile.fileno())
+
+    def _readIndexData(self):
+        """
+        Read the raw content of the index file
+        @return: index data, empty if a read-only store has no index file
+        @rtype: bytes
+        """
+        if not self.__readOnly:
+            self.__indexFile.seek(0)
+            return self.__indexFile.read()
+        try:
+            with open(self.path + '.idx', 'rb') as indexFile:
+                return indexFile.read()
+        except FileNotFoundError:
+            return b''
+
+    def _readRecordData(self, position):
+        """
+        Read raw record data checking its checksum
+        @param position: number of the record
+        @type position: int
+        @return: record data or None if the record is damaged
+        @rtype: bytes
+        """
+        self.__log.seek(_HEADER.size + position * _RECORD.size)
+        data = self.__log.read(_RECORD.size)
+        if len(data) != _RECORD.size:
+            return None
+        checksum = struct.unpack_from('<I', data, _PAYLOAD_SIZE)[0]
+        if zlib.crc32(data[:_PAYLOAD_SIZE]) & 0xffffffff != checksum:
+            return None
+        return data
+
+    def __len__(self):
+        """
+        @return: number of stored records
+        @rtype: int
+        """
+        return self.__count
+
+    def append(self, record):
+        """
+        Append a record to the log
+        @param record: record of a finished activity
+        @type record: ActivityRecord
+        @raise ValueError: if the store is opened read-only
+        """
+        if self.__readOnly:
+            raise ValueError('{0} is opened read-only'.format(self.path))
+        self.__log.seek(0, os.SEEK_END)
+        self.__log.write(_packRecord((record.start, record.end, record.plannedDuration,
+                                      record.actualDuration, _KIND_CODES[record.kind],
+                                      record.interrupted, min(record.pauseCount, 0xffff),
+                                      record.pausedDuration)))
+        self.__log.flush()
+        if self.__count % INDEX_STEP == 0:
+            self.__index.append(record.start)
+            self.__indexFile.write(struct.pack('<d', record.start))
+            self.__indexFile.flush()
+        self.__count += 1
+        self.__unsynced += 1
+        if self.__unsynced >= self.__syncBatch or \
+                time.monotonic() - self.__lastSync >= self.__syncInterval:
+            self.sync()
+
+    def sync(self):
+        """Force written records to the disk"""
+        if self.__unsynced == 0:
+            return
+        os.fsync(self.__log.fileno())
+        os.fsync(self.__indexFile.fileno())
+        self.__unsynced = 0
+        self.__lastSync = time.monotonic()
+
+    def close(self):
+        """Sync and close the log"""
+        self.sync()
+        self.__log.close()
+        if self.__indexFile is not None:
+            self.__indexFile.close()
+
+    def query(self, startTime, endTime):
+        """
+        Find activities started in the time range
+        @param startTime: beginning of the range, inclusive
+        @type startTime: float
+        @param endTime: end of the range, exclusive
+        @type endTime: float
+        @return: generator of records sorted by start time
+        @rtype: generator
+        """
+        block = max(0, bisect_right(self.__index, startTime) - 1)
+        for record in self.records(block * INDEX_STEP):
+            if record.start >= endTime:
+                return
+            if record.start >= startTime:
+                yield record
+
+    def columns(self):
+        """
+        Read all stored records as columns
+        @return: dictionary of arrays with keys named after ActivityRecord fields, kinds
+        are stored as indices in KINDS
+        @rtype: dict
+        """
+        self.__log.seek(_HEADER.size)
+        data = self.__log.read(self.__count * _RECORD.size)
+        names = ('start', 'end', 'plannedDuration', 'actualDuration', 'kind', 'interrupted',
+                 'pauseCount', 'pausedDuration')
+        types = ('d', 'd', 'L', 'd', 'b', 'b', 'H', 'd')
+        values = list(zip(*_RECORD.iter_unpack(data))) or [()] * len(names)
+        return dict((name, array(code, column))
+                    for name, code, column in zip(names, types, values))
+
+    def records(self, first=0):
+        """
+        Read stored records
+        @param first: number of the first record to read
+        @type first: int
+        @return: generator of records in the order of appending
+        @rtype: generator
+        """
+        count = self.__count
+        position = first
+        while position < count:
+            size = min(INDEX_STEP, count - position)
+            self.__log.seek(_HEADER.size + position * _RECORD.size)
+            data = self.__log.read(size * _RECORD.size)
+            for values in _RECORD.iter_unpack(data):
+                start, end, planned, actual, kind, interrupted, pauseCount, paused = \
+                    values[:8]
+                yield ActivityRecord(start, end, KINDS[kind], planned, actual,
+                                     bool(interrupted), paused, pauseCount)
+            position += size
+
+
+def _packRecord(values):
+    """
+    Pack record fields adding their checksum
+    @param values: record fields in the order of the log format without the checksum
+    @type values: tuple
+    @return: packed record
+    @rtype: bytes
+    """
+    payload = _RECORD.pack(*(values + (0,)))[:_PAYLOAD_SIZE]
+    return payload + struct.pack('<I', zlib.crc32(payload) & 0xffffffff)
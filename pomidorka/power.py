@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Power saving. Remaining time handlers of the user interface are subscribed only while
+their output can be seen, with the coarsest resolution that changes what is shown. While
+the screen is locked nothing is subscribed at all, so a running activity wakes the process
+up only at its end. The module does not depend on Qt: the screen lock is followed through
+gdbus, which is attached to an event loop through a watcher of file descriptors.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from collections import deque
+import logging
+import os
+import re
+import subprocess
+import time
+from pomidorka.core import EventHook, SECOND, MINUTE
+
+"""Remaining time from which the tray shows seconds instead of minutes"""
+TRAY_SECONDS_THRESHOLD = 2 * MINUTE
+
+"""D-Bus services of screen savers announcing screen locking"""
+SCREENSAVER_SERVICES = ('org.freedesktop.ScreenSaver', 'org.gnome.ScreenSaver')
+
+_ACTIVE_CHANGED = re.compile(r'ScreenSaver\.ActiveChanged \((true|false),?\)')
+
+
+class WakeupMeter:
+    """Counter of timer wakeups over a sliding window"""
+
+    def __init__(self, clock=time.monotonic, window=60.0):
+        """
+        @param clock: function returning current time in seconds
+        @type clock: function
+        @param window: length of the window in seconds
+        @type window: float
+        """
+        self.__clock = clock
+        self.__window = window
+        self.__moments = deque()
+        self.total = 0
+
+    def record(self):
+        """Account one wakeup"""
+        self.__moments.append(self.__clock())
+        self.total += 1
+
+    def perMinute(self):
+        """
+        @return: number of wakeups per minute during the last window
+        @rtype: float
+        """
+        moments = self.__moments
+        threshold = self.__clock() - self.__window
+        while moments and moments[0] <= threshold:
+            moments.popleft()
+        return len(moments) * 60.0 / self.__window
+
+    def timerFactory(self, timerFactory):
+        """
+        Wrap a timer factory, so wakeups of all created timers are counted
+        @param timerFactory: function creating a timer
+        @type timerFactory: function
+        @return: function creating a timer counted by the meter
+        @rtype: function
+        """
+        def createTimer():
+            timer = timerFactory()
+            timer.elapsed.subscribe(self.record, 1000)
+            return timer
+        return createTimer
+
+
+class DisplayUpdater:
+    """
+    Subscriber of the tray and window handlers to remaining time changes. The window
+    handler gets every second while the window is visible. The tray handler gets changes
+    of shown minutes and every second of the last minutes only. While the screen is locked
+    both are unsubscribed and get the current remaining time as soon as it is unlocked.
+    """
+
+    def __init__(self, activityManager, trayHandler, windowHandler, executor=None):
+        """
+        @param activityManager: manager of the shown activities
+        @type activityManager: ActivityManager
+        @param trayHandler: function showing remaining time in the tray
+        @type trayHandler: function
+        @param windowHandler: function showing remaining time in the window
+        @type windowHandler: function
+        @param executor: executor of the user interface thread, the handlers are called on
+        the firing thread if omitted
+        @type executor: Executor
+        """
+        self.__manager = activityManager
+        self.__executor = executor
+        self.__trayHandler = trayHandler
+        self.__windowHandler = windowHandler
+        self.__windowVisible = False
+        self.__locked = False
+        self.__trayResolution = None
+        self.__windowSubscribed = False
+        self.lockChanged = EventHook('DisplayUpdater.lockChanged')
+        activityManager.activityStarted.subscribe(self._activityStarted, executor=executor)
+        self._update()
+
+    def setWindowVisible(self, visible):
+        """
+        @param visible: whether the main window is shown
+        @type visible: bool
+        """
+        self.__windowVisible = visible
+        self._update()
+
+    def setLocked(self, locked):
+        """
+        @param locked: whether the screen is locked
+        @type locked: bool
+        """
+        if locked == self.__locked:
+            return
+        logging.debug('Screen is %s', 'locked' if locked else 'unlocked')
+        self.__locked = locked
+        self._update()
+        self.lockChanged.fire(locked)
+
+    def isLocked(self):
+        """
+        @return: whether the screen is locked
+        @rtype: bool
+        """
+        return self.__locked
+
+    def _activityStarted(self, activity):
+        """Choose the tray resolution for a new activity"""
+        if self.__trayResolution is not None:
+            self._subscribeTray(_trayResolution(activity.currentRemainingTime()))
+
+    def _update(self):
+        """Bring subscriptions in line with what is visible, catching up new subscribers"""
+        hook = self.__manager.activityTimeChanged
+        activity = self.__manager.currentActivity()
+        remainingTime = None
+        if activity is not None and not activity.isPaused():
+            remainingTime = activity.currentRemainingTime()
+        trayWanted = not self.__locked
+        if trayWanted and self.__trayResolution is None:
+            self._subscribeTray(_trayResolution(remainingTime))
+            if remainingTime is not None:
+                self.__trayHandler(remainingTime)
+        elif not trayWanted and self.__trayResolution is not None:
+            hook.unsubscribe(self._trayTimeChanged)
+            self.__trayResolution = None
+        windowWanted = self.__windowVisible and not self.__locked
+        if windowWanted and not self.__windowSubscribed:
+            hook.subscribe(self.__windowHandler, resolution=SECOND, executor=self.__executor)
+            self.__windowSubscribed = True
+            if remainingTime is not None:
+                self.__windowHandler(remainingTime)
+        elif not windowWanted and self.__windowSubscribed:
+            hook.unsubscribe(self.__windowHandler)
+            self.__windowSubscribed = False
+
+    def _subscribeTray(self, resolution):
+        """Subscribe the tray to remaining time changes with the resolution"""
+        if resolution != self.__trayResolution:
+            self.__manager.activityTimeChanged.subscribe(self._trayTimeChanged,
+                                                         resolution=resolution,
+                                                         executor=self.__executor)
+            self.__trayResolution = resolution
+
+    def _trayTimeChanged(self, remainingTime):
+        """Pass remaining time to the tray, switching to seconds for the last minutes"""
+        if remainingTime <= TRAY_SECONDS_THRESHOLD:
+            self._subscribeTray(SECOND)
+        self.__trayHandler(remainingTime)
+
+
+def _trayResolution(remainingTime):
+    """
+    @param remainingTime: remaining time of the activity or None if there is no activity
+    @type remainingTime: int
+    @return: resolution of remaining time the tray needs
+    @rtype: int
+    """
+    if remainingTime is not None and remainingTime <= TRAY_SECONDS_THRESHOLD:
+        return SECOND
+    return MINUTE
+
+
+class ScreenLockMonitor:
+    """
+    Follower of screen saver activation announced over the session D-Bus. gdbus monitor
+    processes print signals of the screen savers to pipes watched by the event loop, so
+    waiting for the lock costs no wakeups. Without gdbus the screen is never reported
+    locked.
+    """
+
+    def __init__(self, watcher, services=SCREENSAVER_SERVICES):
+        """
+        @param watcher: object with watch(fileno, callback) and unwatch(fileno) methods
+        @type watcher: SelectorWatcher
+        @param services: D-Bus names of screen savers to follow
+        @type services: tuple
+        """
+        self.__watcher = watcher
+        self.__processes = {}
+        self.lockChanged = EventHook('ScreenLockMonitor.lockChanged')
+        for service in services:
+            self._startMonitor(service)
+
+    def _startMonitor(self, service):
+        """Start following one screen saver"""
+        try:
+            process = subprocess.Popen(['gdbus', 'monitor', '--session', '--dest', service],
+                                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError as error:
+            logging.debug('Screen lock is not followed: %s', error)
+            return
+        fileno = process.stdout.fileno()
+        os.set_blocking(fileno, False)
+        self.__processes[fileno] = [process, b'']
+        self.__watcher.watch(fileno, lambda: self._readMonitor(fileno))
+
+    def _readMonitor(self, fileno):
+        """Parse signals printed by a monitor process"""
+        process, buffered = self.__processes[fileno]
+        try:
+            data = os.read(fileno, 4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        if not data:
+            self._stopMonitor(fileno)
+            return
+        buffered += data
+        while b'\n' in buffered:
+            line, buffered = buffered.split(b'\n', 1)
+            match = _ACTIVE_CHANGED.search(line.decode('utf-8', 'replace'))
+            if match:
+                self.lockChanged.fire(match.group(1) == 'true')
+        self.__processes[fileno][1] = buffered
+
+    def _stopMonitor(self, fileno):
+        """Stop following one screen saver"""
+        process, _ = self.__processes.pop(fileno)
+        self.__watcher.unwatch(fileno)
+        if process.poll() is None:
+            process.terminate()
+        process.wait()
+        process.stdout.close()
+
+    def close(self):
+        """Stop all monitor processes"""
+        for fileno in list(self.__processes):
+            self._stopMonitor(fileno)
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Opt-in instrumentation of hot paths. Instrumented code checks PROFILER.enabled before
+taking any measurement, so disabled profiling costs a single attribute lookup.
+
+    if PROFILER.enabled:
+        started = time.perf_counter()
+    ...
+    if PROFILER.enabled:
+        PROFILER.record('name', started)
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import os
+import threading
+import time
+
+
+class Histogram:
+    """Latency histogram with buckets growing as powers of two of microseconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = 0.0
+        self.buckets = [0] * 40
+
+    def add(self, duration):
+        """
+        Account a measured duration
+        @param duration: duration in seconds
+        @type duration: float
+        """
+        self.count += 1
+        self.total += duration
+        if self.minimum is None or duration < self.minimum:
+            self.minimum = duration
+        if duration > self.maximum:
+            self.maximum = duration
+        self.buckets[min(int(duration * 1e6).bit_length(), 39)] += 1
+
+    def percentile(self, fraction):
+        """
+        Estimate a percentile by the upper bound of its bucket
+        @param fraction: percentile as a fraction, e.g. 0.99
+        @type fraction: float
+        @return: duration in seconds
+        @rtype: float
+        """
+        threshold = fraction * self.count
+        accumulated = 0
+        for bucket, count in enumerate(self.buckets):
+            accumulated += count
+            if count and accumulated >= threshold:
+                return min((1 << bucket) / 1e6, self.maximum)
+        return self.maximum
+
+
+class Profiler:
+    """Collector of counters, latency histograms and optionally trace events"""
+
+    def __init__(self):
+        self.enabled = False
+        self.__counters = {}
+        self.__histograms = {}
+        self.__trace = None
+        self.__lock = threading.Lock()
+        self.__origin = time.perf_counter()
+
+    def enable(self, trace=False):
+        """
+        Start collecting measurements
+        @param trace: whether every measurement must be kept for a Chrome trace
+        @type trace: bool
+        """
+        if trace:
+            self.__trace = []
+        self.enabled = True
+
+    def disable(self):
+        """Stop collecting measurements"""
+        self.enabled = False
+
+    def count(self, name, value=1):
+        """
+        Increase a counter
+        @param name: name of the counter
+        @type name: str
+        @param value: increment
+        @type value: int
+        """
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def record(self, name, started, finished=None):
+        """
+        Account a measured interval
+        @param name: name of the measured operation
+        @type name: str
+        @param started: perf_counter value at the start of the operation
+        @type started: float
+        @param finished: perf_counter value at the end, current time if omitted
+        @type finished: float
+        """
+        if finished is None:
+            finished = time.perf_counter()
+        with self.__lock:
+            histogram = self.__histograms.get(name)
+            if histogram is None:
+                histogram = Histogram()
+                self.__histograms[name] = histogram
+            histogram.add(finished - started)
+            if self.__trace is not None:
+                self.__trace.append((name, started, finished, threading.get_ident()))
+
+    def histograms(self):
+        """
+        @return: copy of collected histograms by operation name
+        @rtype: dict
+        """
+        with self.__lock:
+            return dict(self.__histograms)
+
+    def counters(self):
+        """
+        @return: copy of counters by name
+        @rtype: dict
+        """
+        with self.__lock:
+            return dict(self.__counters)
+
+    def summary(self):
+        """
+        Format collected measurements as a table
+        @return: text of the summary
+        @rtype: str
+        """
+        lines = ['{0:<56}{1:>9}{2:>11}{3:>11}{4:>11}'.format('operation', 'count',
+                                                             'mean us', 'p99 us', 'max us')]
+        for name, histogram in sorted(self.histograms().items()):
+            lines.append('{0:<56}{1:>9}{2:>11.1f}{3:>11.1f}{4:>11.1f}'.format(
+                name, histogram.count, histogram.total / histogram.count * 1e6,
+                histogram.percentile(0.99) * 1e6, histogram.maximum * 1e6))
+        for name, value in sorted(self.counters().items()):
+            lines.append('{0:<56}{1:>9}'.format(name, value))
+        return '\n'.join(lines)
+
+    def writeChromeTrace(self, path):
+        """
+        Save collected trace events and counters in Chrome trace event format, which can
+        be opened in chrome://tracing or Perfetto
+        @param path: path to the output file
+        @type path: str
+        """
+        import json
+        with self.__lock:
+            trace = list(self.__trace or [])
+            counters = dict(self.__counters)
+        origin = self.__origin
+        processId = os.getpid()
+        events = [{'name': name, 'ph': 'X', 'pid': processId, 'tid': threadId,
+                   'ts': (started - origin) * 1e6, 'dur': (finished - started) * 1e6}
+                  for name, started, finished, threadId in trace]
+        if counters:
+            events.append({'name': 'counters', 'ph': 'C', 'pid': processId, 'tid': 0,
+                           'ts': (time.perf_counter() - origin) * 1e6, 'args': counters})
+        with open(path, 'w') as output:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, output)
+
+
+"""Profiler shared by the whole application"""
+PROFILER = Profiler()
@@ -23,29 +23,233 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-"""Resources configuration module. Provides access to application resources"""
+"""
+Resources configuration module. Provides access to application resources. Resources are
+looked up in a packed asset bundle, if one is built, and in the source tree otherwise.
+The bundle is a single memory-mapped file, so loading all assets costs one open, and it
+is also found inside a zip archive the application is installed as. Loaded resources are
+cached in memory.
+
+Bundle layout: header (magic, version, number of entries), a table of entries (name
+length, offset and size of data) followed by entry names, then the data of all entries.
+"""
 
 __author__ = 'Andrey Vasilev <vamonster@gmail.com>'
 
 import os
+import struct
 import sys
-from PySide.QtGui import QIcon, QPixmap
 
-if os.name == 'nt':
+if os.name == 'nt' or getattr(sys, 'frozen', False):
     BASEDIR = os.path.dirname(sys.executable)
 else:
     BASEDIR = os.path.dirname(os.path.dirname(__file__))
 
+"""Name of the bundle file, it is looked for in the package directory and in BASEDIR"""
+BUNDLE_NAME = 'assets.bundle'
+
+"""Directories of the source tree packed into the bundle"""
+BUNDLED_DIRECTORIES = ('images', 'assets')
+
+"""Extensions of design sources, which are not needed at runtime and not bundled"""
+DESIGN_EXTENSIONS = ('.ora', '.ep')
+
+"""Prefix of settings paths referring to application assets"""
+BASE_PREFIX = '{base}/'
+
+_HEADER = struct.Struct('<4sHxxI')
+_ENTRY = struct.Struct('<HQQ')
+_MAGIC = b'PMDB'
+_VERSION = 1
+
+"""Loaded bundle, False until it is searched for, None if there is no bundle"""
+_bundle = False
+
+"""Caches of loaded resources by name"""
+_data = {}
+_icons = {}
+_pixelMaps = {}
+
+
+class AssetBundle:
+    """Read-only view of a packed asset bundle"""
+
+    def __init__(self, buffer):
+        """
+        @param buffer: contents of the bundle, usually a memory map of the bundle file
+        @type buffer: bytes
+        """
+        magic, version, count = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('Not an asset bundle of version {0}'.format(_VERSION))
+        self.__buffer = buffer
+        self.__entries = {}
+        position = _HEADER.size
+        names = position + count * _ENTRY.size
+        for _ in range(count):
+            nameLength, offset, size = _ENTRY.unpack_from(buffer, position)
+            name = bytes(buffer[names:names + nameLength]).decode('utf-8')
+            self.__entries[name] = (offset, size)
+            position += _ENTRY.size
+            names += nameLength
+
+    def __contains__(self, name):
+        """
+        @return: whether the bundle has the entry
+        @rtype: bool
+        """
+        return name in self.__entries
+
+    def names(self):
+        """
+        @return: names of all entries
+        @rtype: list
+        """
+        return sorted(self.__entries)
+
+    def read(self, name):
+        """
+        Get data of an entry
+        @param name: name of the entry, e.g. images/pomidor.png
+        @type name: str
+        @return: entry data
+        @rtype: bytes
+        @raise KeyError: if there is no such entry
+        """
+        offset, size = self.__entries[name]
+        return self.__buffer[offset:offset + size]
+
+
+def buildBundle(path, files):
+    """
+    Pack files into a bundle
+    @param path: path to the bundle to create
+    @type path: str
+    @param files: paths of files to pack by entry name
+    @type files: dict
+    """
+    names = sorted(files)
+    encodedNames = [name.encode('utf-8') for name in names]
+    contents = []
+    for name in names:
+        with open(files[name], 'rb') as source:
+            contents.append(source.read())
+    offset = _HEADER.size + len(names) * _ENTRY.size + sum(map(len, encodedNames))
+    table = []
+    for encodedName, data in zip(encodedNames, contents):
+        table.append(_ENTRY.pack(len(encodedName), offset, len(data)))
+        offset += len(data)
+    temporaryPath = path + '.tmp'
+    with open(temporaryPath, 'wb') as bundle:
+        bundle.write(_HEADER.pack(_MAGIC, _VERSION, len(names)))
+        bundle.write(b''.join(table + encodedNames + contents))
+    os.replace(temporaryPath, path)
+
+
+def sourceFiles(baseDirectory=BASEDIR):
+    """
+    Find the assets of the source tree
+    @param baseDirectory: root of the source tree
+    @type baseDirectory: str
+    @return: paths of files by entry name
+    @rtype: dict
+    """
+    files = {}
+    for directory in BUNDLED_DIRECTORIES:
+        for fileName in os.listdir(os.path.join(baseDirectory, directory)):
+            path = os.path.join(baseDirectory, directory, fileName)
+            if os.path.isfile(path) and not fileName.endswith(DESIGN_EXTENSIONS):
+                files[directory + '/' + fileName] = path
+    return files
+
+
+def openBundle(path):
+    """
+    Memory-map a bundle file
+    @param path: path to the bundle
+    @type path: str
+    @return: the bundle
+    @rtype: AssetBundle
+    """
+    import mmap
+    with open(path, 'rb') as bundleFile:
+        return AssetBundle(mmap.mmap(bundleFile.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def getBundle():
+    """
+    Find the bundle of the application, in the package directory, next to the frozen
+    executable or inside the zip archive the package is imported from
+    @return: the bundle or None if the application has no bundle
+    @rtype: AssetBundle
+    """
+    global _bundle
+    if _bundle is not False:
+        return _bundle
+    _bundle = None
+    for directory in (os.path.dirname(__file__), BASEDIR):
+        try:
+            _bundle = openBundle(os.path.join(directory, BUNDLE_NAME))
+            return _bundle
+        except (IOError, OSError, ValueError):
+            pass
+    if hasattr(__loader__, 'get_data') and not os.path.isdir(os.path.dirname(__file__)):
+        try:
+            _bundle = AssetBundle(__loader__.get_data(
+                os.path.join(os.path.dirname(__file__), BUNDLE_NAME)))
+        except (IOError, OSError, ValueError):
+            pass
+    return _bundle
+
+
+def getData(name):
+    """
+    Load the contents of a resource
+    @param name: name of the resource relative to the application base, e.g.
+    images/pomidor.png
+    @type name: str
+    @return: resource data
+    @rtype: bytes
+    @raise IOError: if there is no such resource
+    """
+    data = _data.get(name)
+    if data is None:
+        bundle = getBundle()
+        if bundle is not None and name in bundle:
+            data = bundle.read(name)
+        else:
+            with open(os.path.join(BASEDIR, name), 'rb') as resource:
+                data = resource.read()
+        _data[name] = data
+    return data
+
+
+def assetName(path):
+    """
+    Get the resource name of a settings path referring to the application base
+    @param path: path possibly starting with {base}/
+    @type path: str
+    @return: resource name or None if the path refers to a file of the user
+    @rtype: str
+    """
+    if path.startswith(BASE_PREFIX):
+        return path[len(BASE_PREFIX):]
+    return None
+
 
 def getIcon(name):
     """
     Load icon from the file
     @param name: name of the file
     @type name: str
-    @return: new icon object
+    @return: icon object shared by all callers
     @rtype: QIcon
     """
-    return QIcon(getFilePath(name))
+    icon = _icons.get(name)
+    if icon is None:
+        from PySide.QtGui import QIcon
+        icon = _icons[name] = QIcon(getPixelMap(name))
+    return icon
 
 
 def getPixelMap(name):
@@ -53,10 +257,16 @@ def getPixelMap(name):
     Load pixel map from the file
     @param name: name of the file
     @type name: str
-    @return: new pixel map object
+    @return: pixel map object shared by all callers, copy it before painting
     @rtype: QPixmap
     """
-    return QPixmap(getFilePath(name))
+    pixelMap = _pixelMaps.get(name)
+    if pixelMap is None:
+        from PySide.QtGui import QPixmap
+        pixelMap = QPixmap()
+        pixelMap.loadFromData(getData('images/' + name))
+        _pixelMaps[name] = pixelMap
+    return pixelMap
 
 
 def getFilePath(name):
@@ -67,4 +277,17 @@ def getFilePath(name):
     @return: path to the file
     @rtype: str
     """
-    return os.path.join(BASEDIR, 'images', name)
\ No newline at end of file
+    return os.path.join(BASEDIR, 'images', name)
+
+
+def main():
+    """Build the bundle of the source tree, its path may be given as the argument"""
+    output = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__),
+                                                                 BUNDLE_NAME)
+    files = sourceFiles()
+    buildBundle(output, files)
+    print('{0}: {1}'.format(output, ', '.join(sorted(files))))
+
+
+if __name__ == '__main__':
+    main()
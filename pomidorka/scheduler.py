@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Scheduling of many timers on a single min-heap of deadlines"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import heapq
+import itertools
+import time
+from pomidorka.core import OneSecondTimer, monotonicTime
+
+
+class HeapScheduler:
+    """
+    Scheduler of callbacks, keeping pending deadlines in a binary heap. Work done by the
+    scheduler depends only on the number of expiring deadlines, not on the number of
+    timers or the time passed. Cancelled entries are removed lazily.
+    """
+
+    def __init__(self, clock=monotonicTime, wait=time.sleep):
+        """
+        @param clock: function returning current time in seconds
+        @type clock: function
+        @param wait: function blocking for the given number of seconds
+        @type wait: function
+        """
+        self.__clock = clock
+        self.__wait = wait
+        self.__heap = []
+        self.__sequence = itertools.count()
+        self.__cancelled = 0
+        self.__running = False
+
+    def now(self):
+        """
+        Get current time of the scheduler clock
+        @return: current time in seconds
+        @rtype: float
+        """
+        return self.__clock()
+
+    def schedule(self, when, callback):
+        """
+        Schedule a callback to be called at the given time
+        @param when: time of the scheduler clock to call the callback at
+        @type when: float
+        @param callback: function without arguments
+        @type callback: function
+        @return: entry identifying the scheduled call
+        @rtype: list
+        """
+        entry = [when, next(self.__sequence), callback]
+        heapq.heappush(self.__heap, entry)
+        return entry
+
+    def cancel(self, entry):
+        """
+        Cancel a scheduled call
+        @param entry: entry returned by schedule
+        @type entry: list
+        """
+        if entry[2] is None:
+            return
+        entry[2] = None
+        self.__cancelled += 1
+        heap = self.__heap
+        if self.__cancelled > len(heap) / 2:
+            # compact in place, runDue may be iterating over the same list
+            heap[:] = [item for item in heap if item[2] is not None]
+            heapq.heapify(heap)
+            self.__cancelled = 0
+
+    def __len__(self):
+        """
+        @return: number of pending calls
+        @rtype: int
+        """
+        return len(self.__heap) - self.__cancelled
+
+    def nextDeadline(self):
+        """
+        Get the time of the nearest pending call
+        @return: time of the call or None if nothing is scheduled
+        @rtype: float
+        """
+        heap = self.__heap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+            self.__cancelled -= 1
+        if not heap:
+            return None
+        return heap[0][0]
+
+    def runDue(self, now=None):
+        """
+        Call all callbacks whose time has come
+        @param now: current time, read from the clock if not specified
+        @type now: float
+        @return: number of called callbacks
+        @rtype: int
+        """
+        if now is None:
+            now = self.__clock()
+        heap = self.__heap
+        called = 0
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            callback = entry[2]
+            if callback is None:
+                self.__cancelled -= 1
+                continue
+            entry[2] = None
+            callback()
+            called += 1
+        return called
+
+    def run(self):
+        """Call scheduled callbacks in time until stop is called or nothing is left"""
+        self.__running = True
+        while self.__running:
+            deadline = self.nextDeadline()
+            if deadline is None:
+                break
+            delay = deadline - self.__clock()
+            if delay > 0:
+                self.__wait(delay)
+            self.runDue()
+
+    def stop(self):
+        """Make run return after processing the current callbacks"""
+        self.__running = False
+
+
+class SchedulerTimer(OneSecondTimer):
+    """Timer implementation sharing a single scheduler with other timers"""
+
+    __slots__ = ('__scheduler', '__entry')
+
+    def __init__(self, scheduler):
+        """
+        @param scheduler: scheduler to put timer deadlines in
+        @type scheduler: HeapScheduler
+        """
+        OneSecondTimer.__init__(self)
+        self.__scheduler = scheduler
+        self.__entry = None
+
+    def now(self):
+        """
+        Get current time of the scheduler clock
+        @return: current time in seconds
+        @rtype: float
+        """
+        return self.__scheduler.now()
+
+    def start(self, delay=1.0):
+        """
+        Start the timer
+        @param delay: time in seconds after which listeners are notified
+        @type delay: float
+        """
+        self.stop()
+        self.__entry = self.__scheduler.schedule(self.__scheduler.now() + delay,
+                                                 self._timerElapsed)
+
+    def _timerElapsed(self):
+        """Process notification from the scheduler"""
+        self.__entry = None
+        self.elapsed.fire()
+
+    def stop(self):
+        """Stop the timer"""
+        if self.__entry is not None:
+            self.__scheduler.cancel(self.__entry)
+            self.__entry = None
@@ -0,0 +1,569 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Sharded timer daemon spreading users across worker processes.
+
+Users are assigned to shards by consistent hashing of their identifiers. Every shard is
+a process running its own TimerDaemon and scheduler loop, which sleeps on the command
+pipe until the nearest deadline. The front-end routes commands to the owning shard and
+merges status queries of all shards. Adding a shard moves only the users the hash ring
+assigns to it; their activities continue from checkpoints without being interrupted.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+from pomidorka.daemon import TimerDaemon, UnknownUserError
+from pomidorka.scheduler import HeapScheduler
+
+"""Number of points every shard has on the hash ring"""
+REPLICAS = 64
+
+"""Commands executed for users by name of the activity manager method"""
+COMMANDS = {
+    'work': 'startWorkActivity',
+    'short': 'startShortBreakActivity',
+    'long': 'startLongBreakActivity',
+    'stop': 'stopCurrentActivity',
+    'pause': 'pauseCurrentActivity',
+    'resume': 'resumeCurrentActivity',
+}
+
+"""Commands starting an activity, which fail while another activity is running"""
+_STARTS = ('work', 'short', 'long')
+
+
+def _hash(key):
+    """
+    @param key: text to be placed on the ring
+    @type key: str
+    @return: position of the key on the ring
+    @rtype: int
+    """
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring. Adding a node takes over only the keys between its points and
+    their predecessors, so about 1/n of the keys change their node.
+    """
+
+    def __init__(self, nodes=(), replicas=REPLICAS):
+        """
+        @param nodes: names of the initial nodes
+        @type nodes: iterable
+        @param replicas: number of points per node
+        @type replicas: int
+        """
+        self.__replicas = replicas
+        self.__points = []
+        self.__owners = []
+        self.__nodes = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        """
+        Put a node on the ring
+        @param node: name of the node
+        @type node: str
+        """
+        if node in self.__nodes:
+            raise KeyError('Node {0} is already on the ring'.format(node))
+        self.__nodes.append(node)
+        for replica in range(self.__replicas):
+            point = _hash('{0}#{1}'.format(node, replica))
+            index = bisect.bisect(self.__points, point)
+            self.__points.insert(index, point)
+            self.__owners.insert(index, node)
+
+    def remove(self, node):
+        """
+        Take a node off the ring
+        @param node: name of the node
+        @type node: str
+        """
+        self.__nodes.remove(node)
+        kept = [(point, owner) for point, owner in zip(self.__points, self.__owners)
+                if owner != node]
+        self.__points = [point for point, _ in kept]
+        self.__owners = [owner for _, owner in kept]
+
+    def nodes(self):
+        """
+        @return: names of the nodes in the order they were added
+        @rtype: list
+        """
+        return list(self.__nodes)
+
+    def node(self, key):
+        """
+        Find the node owning a key
+        @param key: the key, e.g. user identifier
+        @type key: str
+        @return: name of the node
+        @rtype: str
+        """
+        if not self.__points:
+            raise KeyError('The ring is empty')
+        index = bisect.bisect(self.__points, _hash(key)) % len(self.__points)
+        return self.__owners[index]
+
+
+class ShardWorker:
+    """
+    Body of a shard process: a timer daemon serving requests of the front-end. Every
+    request is a tuple of an operation name and its arguments, the response is a pair of
+    success flag and result or raised exception.
+    """
+
+    def __init__(self, name, connection, userSetup=None, scheduler=None):
+        """
+        @param name: name of the shard on the hash ring
+        @type name: str
+        @param connection: pipe end connected to the front-end
+        @type connection: multiprocessing.connection.Connection
+        @param userSetup: function called with the daemon, user identifier and activity
+        manager of every added user, e.g. to subscribe user hooks
+        @type userSetup: function
+        @param scheduler: scheduler of the shard daemon, a new one is created if omitted
+        @type scheduler: HeapScheduler
+        """
+        self.name = name
+        self.daemon = TimerDaemon(scheduler or HeapScheduler())
+        self.records = 0
+        self.__connection = connection
+        self.__userSetup = userSetup
+        self.__running = False
+
+    def run(self):
+        """Run the scheduler loop, waiting for requests until the nearest deadline"""
+        scheduler = self.daemon.scheduler
+        self.__running = True
+        while self.__running:
+            try:
+                scheduler.runDue()
+            except Exception:
+                logging.exception('Timer callback of shard %s failed', self.name)
+            deadline = scheduler.nextDeadline()
+            timeout = None if deadline is None else max(0.0, deadline - scheduler.now())
+            if self.__connection.poll(timeout):
+                try:
+                    request = self.__connection.recv()
+                except EOFError:
+                    logging.debug('Front-end of shard %s is gone', self.name)
+                    return
+                response = self.handle(request)
+                try:
+                    self.__connection.send(response)
+                except (pickle.PicklingError, TypeError, AttributeError):
+                    self.__connection.send((False, RuntimeError(repr(response[1]))))
+
+    def handle(self, request):
+        """
+        Execute a request of the front-end, exceptions of the operation are returned as
+        its result
+        @param request: operation name followed by its arguments
+        @type request: tuple
+        @return: success flag and result or exception
+        @rtype: tuple
+        """
+        operation = getattr(self, '_' + request[0], None)
+        if operation is None:
+            return False, ValueError('Unknown shard operation: {0}'.format(request[0]))
+        try:
+            return True, operation(*request[1:])
+        except Exception as error:
+            logging.debug('Shard operation %s failed', request[0], exc_info=True)
+            return False, error
+
+    def _setupUser(self, userId, manager):
+        """Subscribe shard hooks of a new user"""
+        manager.activityRecorded += self._activityRecorded
+        if self.__userSetup is not None:
+            self.__userSetup(self.daemon, userId, manager)
+
+    def _activityRecorded(self, _):
+        """Count ended activities"""
+        self.records += 1
+
+    def _addUsers(self, users):
+        """Register pairs of user identifiers and settings"""
+        for userId, settings in users:
+            self._setupUser(userId, self.daemon.addUser(userId, settings))
+
+    def _removeUser(self, userId):
+        """Forget about a user"""
+        self.daemon.removeUser(userId)
+
+    def _execute(self, userId, command):
+        """Execute a user command and return the user status"""
+        if command == 'next':
+            self.daemon.getCycle(userId).start()
+        elif command in COMMANDS:
+            manager = self.daemon.getManager(userId)
+            if command in _STARTS and manager.currentActivity() is not None:
+                raise ValueError('activity running')
+            getattr(manager, COMMANDS[command])()
+        else:
+            raise ValueError('Unknown command: {0}'.format(command))
+        return self.daemon.status(userId)
+
+    def _status(self, userIds=None):
+        """Get statuses of the given or all users by user identifier"""
+        if userIds is None:
+            userIds = self.daemon.users()
+        return dict((userId, self.daemon.status(userId)) for userId in userIds)
+
+    def _stats(self):
+        """Get numbers of users, ended activities and pending timers"""
+        return {'users': len(self.daemon), 'records': self.records,
+                'timers': len(self.daemon.scheduler)}
+
+    def _rebalance(self, nodes):
+        """Export users the ring of the given nodes assigns to other shards"""
+        ring = HashRing(nodes)
+        moved = []
+        for userId in self.daemon.users():
+            owner = ring.node(userId)
+            if owner != self.name:
+                moved.append((owner, userId) + self.daemon.exportUser(userId))
+        return moved
+
+    def _importUsers(self, users):
+        """Register users exported by other shards, continuing their activities"""
+        for userId, settings, checkpoint, position in users:
+            manager = self.daemon.importUser(userId, settings, checkpoint, position)
+            self._setupUser(userId, manager)
+
+    def _close(self):
+        """Stop the scheduler loop"""
+        self.__running = False
+
+
+def _runWorker(name, connection, userSetup):
+    """Entry point of a shard process"""
+    # interrupts from the terminal are handled by the front-end, which stops the shards
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ShardWorker(name, connection, userSetup).run()
+    connection.close()
+
+
+class ShardedDaemon:
+    """
+    Front-end of timer daemons running in worker processes. The interface follows
+    TimerDaemon, but activity managers live in the shards, so users are controlled with
+    commands instead.
+    """
+
+    def __init__(self, workers=None, userSetup=None, context=None):
+        """
+        @param workers: number of shard processes, one per processor if omitted
+        @type workers: int
+        @param userSetup: picklable function called in the shard with the daemon, user
+        identifier and activity manager of every added user
+        @type userSetup: function
+        @param context: multiprocessing start method, the platform default if omitted
+        @type context: str
+        """
+        self.__context = multiprocessing.get_context(context)
+        self.__userSetup = userSetup
+        self.__ring = HashRing()
+        self.__shards = {}
+        self.__nextIndex = 0
+        for _ in range(workers or os.cpu_count() or 1):
+            self.addWorker()
+
+    def addWorker(self):
+        """
+        Start one more shard and move the users the hash ring assigns to it
+        @return: number of moved users
+        @rtype: int
+        """
+        name = 'shard-{0}'.format(self.__nextIndex)
+        self.__nextIndex += 1
+        connection, workerConnection = self.__context.Pipe()
+        process = self.__context.Process(target=_runWorker, name=name,
+                                         args=(name, workerConnection, self.__userSetup))
+        process.daemon = True
+        process.start()
+        workerConnection.close()
+        self.__shards[name] = (process, connection)
+        self.__ring.add(name)
+        return self._rebalance()
+
+    def _rebalance(self):
+        """
+        Move users to the shards the ring assigns them to
+        @return: number of moved users
+        @rtype: int
+        """
+        moved = {}
+        for exported in self._broadcast('rebalance', self.__ring.nodes()).values():
+            for user in exported:
+                moved.setdefault(user[0], []).append(user[1:])
+        for name, users in moved.items():
+            self._call(name, 'importUsers', users)
+        count = sum(len(users) for users in moved.values())
+        if count:
+            logging.debug('Moved %d users between shards', count)
+        return count
+
+    def _call(self, name, operation, *arguments):
+        """
+        Execute an operation in a shard
+        @param name: name of the shard
+        @type name: str
+        @param operation: name of the operation
+        @type operation: str
+        @return: result of the operation
+        """
+        connection = self.__shards[name][1]
+        connection.send((operation,) + arguments)
+        return self._receive(connection)
+
+    def _broadcast(self, operation, *arguments):
+        """
+        Execute an operation in all shards at once
+        @param operation: name of the operation
+        @type operation: str
+        @return: results by shard name
+        @rtype: dict
+        """
+        for _, connection in self.__shards.values():
+            connection.send((operation,) + arguments)
+        return self._gather(list(self.__shards))
+
+    def _receive(self, connection):
+        """Wait for a shard response, exceptions of the shard are raised again"""
+        succeeded, result = connection.recv()
+        if not succeeded:
+            raise result
+        return result
+
+    def _gather(self, names):
+        """
+        Wait for responses of several shards. All responses are read before the first
+        exception is raised again, so no stale response is left in a pipe.
+        @param names: names of the shards a request was sent to
+        @type names: list
+        @return: results by shard name
+        @rtype: dict
+        """
+        responses = [(name, self.__shards[name][1].recv()) for name in names]
+        for _, (succeeded, result) in responses:
+            if not succeeded:
+                raise result
+        return dict((name, result) for name, (_, result) in responses)
+
+    def workers(self):
+        """
+        @return: names of the shards
+        @rtype: list
+        """
+        return self.__ring.nodes()
+
+    def shardOf(self, userId):
+        """
+        @param userId: identifier of the user
+        @type userId: str
+        @return: name of the shard hosting the user
+        @rtype: str
+        """
+        return self.__ring.node(userId)
+
+    def addUser(self, userId, settings=None):
+        """
+        Register a user in the owning shard
+        @param userId: identifier of the user
+        @type userId: str
+        @param settings: settings of the user, default settings are used if omitted
+        @type settings: Settings
+        """
+        self._call(self.shardOf(userId), 'addUsers', [(userId, settings)])
+
+    def addUsers(self, users):
+        """
+        Register many users with one request per shard
+        @param users: pairs of user identifier and settings
+        @type users: iterable
+        """
+        batches = {}
+        for userId, settings in users:
+            batches.setdefault(self.shardOf(userId), []).append((userId, settings))
+        for name, batch in batches.items():
+            self.__shards[name][1].send(('addUsers', batch))
+        self._gather(list(batches))
+
+    def removeUser(self, userId):
+        """
+        Stop the running activity of the user and forget about the user
+        @param userId: identifier of the user
+        @type userId: str
+        """
+        self._call(self.shardOf(userId), 'removeUser', userId)
+
+    def execute(self, userId, command):
+        """
+        Execute a command for the user
+        @param userId: identifier of the user
+        @type userId: str
+        @param command: one of COMMANDS keys or 'next' to start the next cycle activity
+        @type command: str
+        @return: status of the user after the command
+        @rtype: dict
+        """
+        return self._call(self.shardOf(userId), 'execute', userId, command)
+
+    def status(self, userId=None):
+        """
+        Get the state of a user activity or of all users
+        @param userId: identifier of the user or None for all users
+        @type userId: str
+        @return: status of the user, or statuses of all users by user identifier
+        @rtype: dict
+        """
+        if userId is not None:
+            return self._call(self.shardOf(userId), 'status', [userId])[userId]
+        statuses = {}
+        for shardStatuses in self._broadcast('status').values():
+            statuses.update(shardStatuses)
+        return statuses
+
+    def stats(self):
+        """
+        Get numbers of users, ended activities and pending timers of every shard
+        @return: statistics by shard name
+        @rtype: dict
+        """
+        return self._broadcast('stats')
+
+    def __len__(self):
+        """
+        @return: number of registered users
+        @rtype: int
+        """
+        return sum(stats['users'] for stats in self.stats().values())
+
+    def close(self):
+        """Stop all shards, running activities are dropped"""
+        for _, connection in self.__shards.values():
+            connection.send(('close',))
+        for process, connection in self.__shards.values():
+            self._receive(connection)
+            connection.close()
+            process.join()
+        self.__shards = {}
+
+
+class ShardedProtocol:
+    """
+    Line commands of the sharded daemon for ControlServer: 'add USER', 'remove USER',
+    'USER COMMAND' with a command of COMMANDS or 'next', 'status [USER]' and 'stats'
+    """
+
+    def __init__(self, daemon):
+        """
+        @param daemon: daemon controlled through the protocol
+        @type daemon: ShardedDaemon
+        """
+        self.__daemon = daemon
+
+    def handle(self, line):
+        """
+        Execute a command and describe the result
+        @param line: command line received from a client
+        @type line: str
+        @return: response with ok flag and result or error text
+        @rtype: dict
+        """
+        words = line.split()
+        try:
+            return {'ok': True, 'result': self._execute(words)}
+        except UnknownUserError as error:
+            return {'ok': False, 'error': str(error)}
+        except KeyError as error:
+            # str of KeyError is the quoted key, report the message itself
+            return {'ok': False, 'error': str(error.args[0] if error.args else error)}
+        except Exception as error:
+            return {'ok': False, 'error': str(error)}
+
+    def _execute(self, words):
+        """Execute a split command line and return its result"""
+        daemon = self.__daemon
+        if words == ['stats']:
+            return daemon.stats()
+        if len(words) == 1 and words[0] == 'status':
+            return daemon.status()
+        if len(words) == 2:
+            operation, argument = words
+            if operation == 'add':
+                return daemon.addUser(argument)
+            if operation == 'remove':
+                return daemon.removeUser(argument)
+            if operation == 'status':
+                return daemon.status(argument)
+            return daemon.execute(operation, argument)
+        raise ValueError('unknown command: {0}'.format(' '.join(words)))
+
+
+def main():
+    """Serve the sharded daemon on a control socket until interrupted"""
+    from argparse import ArgumentParser
+    from pomidorka.control import ControlServer, SelectorWatcher
+    parser = ArgumentParser(description='Timer daemon for many users spread across '
+                                        'worker processes, controlled through a Unix socket')
+    parser.add_argument('socket', help='path to the control socket')
+    parser.add_argument('--workers', type=int, help='number of shard processes, one per '
+                                                    'processor by default')
+    parser.add_argument('-v', '--verbose', help='show verbose information during run',
+                        action='store_true')
+    arguments = parser.parse_args()
+    logging.basicConfig(format='%(levelname)s:%(message)s',
+                        level=logging.DEBUG if arguments.verbose else logging.INFO)
+    daemon = ShardedDaemon(arguments.workers)
+    watcher = SelectorWatcher()
+    server = ControlServer(ShardedProtocol(daemon), watcher, arguments.socket)
+    logging.info('Serving %d shards on %s', len(daemon.workers()), server.path)
+    try:
+        while True:
+            watcher.poll()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        daemon.close()
+
+
+if __name__ == '__main__':
+    main()
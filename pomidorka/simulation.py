@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Replay harness for the timing core. Scripted sequences of user commands are run through
+ActivityManager on a simulated clock, every hook firing is recorded for comparison.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import hashlib
+from pomidorka.core import ActivityManager, Settings, SECOND, WORK, SHORT_BREAK, \
+    LONG_BREAK
+from pomidorka.timers import SimulatedClock
+
+"""Script commands and names of ActivityManager methods executing them"""
+COMMANDS = {
+    'work': 'startWorkActivity',
+    'short': 'startShortBreakActivity',
+    'long': 'startLongBreakActivity',
+    'stop': 'stopCurrentActivity',
+    'pause': 'pauseCurrentActivity',
+    'resume': 'resumeCurrentActivity',
+}
+
+
+class ReplayHarness:
+    """
+    Activity manager on a simulated clock with recorders subscribed to all its hooks.
+    Recorded events are tuples of simulated time, hook name and the passed value.
+    """
+
+    def __init__(self, settings=None, startTime=0.0, tickResolution=SECOND):
+        """
+        @param settings: settings of the manager, default ones if omitted
+        @type settings: Settings
+        @param startTime: initial time of the simulated clock
+        @type startTime: float
+        @param tickResolution: resolution of recorded remaining time changes, None to record
+        no changes at all
+        @type tickResolution: int
+        """
+        if settings is None:
+            settings = Settings()
+        self.clock = SimulatedClock(startTime)
+        self.manager = ActivityManager(settings, self.clock.createTimer)
+        self.events = []
+        manager = self.manager
+        manager.activityStarted += lambda activity: self._record(
+            'activityStarted', (activity.kind, activity.maxTimeInterval))
+        manager.workActivityEnded += lambda: self._record('workActivityEnded', None)
+        manager.breakActivityEnded += lambda: self._record('breakActivityEnded', None)
+        manager.activityRecorded += lambda record: self._record('activityRecorded', record)
+        manager.activityPaused += lambda activity: self._record(
+            'activityPaused', activity.exactRemainingTime())
+        manager.activityResumed += lambda activity: self._record(
+            'activityResumed', activity.exactRemainingTime())
+        if tickResolution is not None:
+            manager.activityTimeChanged.subscribe(
+                lambda remainingTime: self._record('activityTimeChanged', remainingTime),
+                resolution=tickResolution)
+
+    def _record(self, hookName, value):
+        """Store a hook firing"""
+        self.events.append((self.clock.time, hookName, value))
+
+    def execute(self, command):
+        """
+        Execute a script command at the current simulated time
+        @param command: one of COMMANDS keys
+        @type command: str
+        """
+        getattr(self.manager, COMMANDS[command])()
+
+    def run(self, script):
+        """
+        Run a script and let the last activity finish
+        @param script: sequence of pairs of simulated time and command, sorted by time
+        @type script: iterable
+        @return: recorded events
+        @rtype: list
+        """
+        for moment, command in script:
+            self.clock.advanceTo(moment)
+            self.execute(command)
+        self.clock.runUntilIdle()
+        return self.events
+
+    def digest(self):
+        """
+        Get a digest of recorded events for comparison with a reference run
+        @return: hexadecimal SHA-1 digest
+        @rtype: str
+        """
+        return hashlib.sha1(repr(self.events).encode()).hexdigest()
+
+
+def parseScript(text):
+    """
+    Parse a script consisting of lines with simulated time and command, e.g. "1500 short".
+    Empty lines and lines starting with # are skipped.
+    @param text: script text
+    @type text: str
+    @return: list of pairs of time and command
+    @rtype: list
+    """
+    script = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        moment, command = line.split()
+        if command not in COMMANDS:
+            raise ValueError('Unknown command {0} on line {1}'.format(command, number))
+        script.append((float(moment), command))
+    return script
+
+
+def pomodoroDays(days, settings=None, cyclesPerDay=8, longBreakInterval=4, dayStart=32400):
+    """
+    Generate a script of uninterrupted pomodoro days
+    @param days: number of days
+    @type days: int
+    @param settings: settings giving activity periods, default ones if omitted
+    @type settings: Settings
+    @param cyclesPerDay: number of work periods per day
+    @type cyclesPerDay: int
+    @param longBreakInterval: every this work period is followed by a long break
+    @type longBreakInterval: int
+    @param dayStart: time of the first work period since the beginning of a day in seconds
+    @type dayStart: int
+    @return: list of pairs of time and command
+    @rtype: list
+    """
+    if settings is None:
+        settings = Settings()
+    periods = {WORK: settings.workPeriod, SHORT_BREAK: settings.shortRestPeriod,
+               LONG_BREAK: settings.longRestPeriod}
+    script = []
+    for day in range(days):
+        moment = day * 86400 + dayStart
+        for cycle in range(1, cyclesPerDay + 1):
+            script.append((moment, 'work'))
+            moment += periods[WORK]
+            if cycle % longBreakInterval == 0:
+                script.append((moment, 'long'))
+                moment += periods[LONG_BREAK]
+            else:
+                script.append((moment, 'short'))
+                moment += periods[SHORT_BREAK]
+    return script
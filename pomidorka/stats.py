@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Productivity statistics over the activity history. Records are aggregated into per-day and
+per-hour buckets a whole column at a time with NumPy if it is installed, and in one pass
+over the records otherwise.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+from collections import namedtuple
+import datetime
+import time
+from pomidorka.history import KINDS
+from pomidorka.core import WORK
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_DAY = 86400
+_HOUR = 3600
+_WORK_CODE = KINDS.index(WORK)
+
+"""Aggregates of a period: day or the first day of a week, or an hour of the day"""
+PeriodStatistics = namedtuple('PeriodStatistics', ['period', 'completed', 'interrupted',
+                                                   'interruptionRate', 'focusTime',
+                                                   'pausedTime'])
+
+
+def _bucketSums(keys, weights, size):
+    """
+    Sum weights of items with equal keys
+    @param keys: bucket numbers of items in range [0, size)
+    @type keys: numpy.ndarray
+    @param weights: weights of items
+    @type weights: numpy.ndarray
+    @param size: number of buckets
+    @type size: int
+    @return: sums for all buckets
+    @rtype: list
+    """
+    return numpy.bincount(keys, weights, minlength=size).tolist()
+
+
+class ProductivityStatistics:
+    """
+    Daily, weekly and per-hour-of-day statistics of work activities. Periods are
+    calculated in the local time zone following its DST changes, or in a fixed offset
+    from UTC if it is given.
+    """
+
+    def __init__(self, utcOffset=None):
+        """
+        @param utcOffset: fixed offset of the local time from UTC in seconds
+        @type utcOffset: int
+        """
+        self.__utcOffset = utcOffset
+        self.__offsets = {}
+        self.__count = 0
+        self.__days = {}
+        self.__hours = [[0, 0, 0.0, 0.0] for _ in range(24)]
+
+    def loadHistory(self, store):
+        """
+        Add all records of the history to the statistics
+        @param store: history to load
+        @type store: HistoryStore
+        """
+        columns = store.columns()
+        if numpy is None:
+            for kind, start, duration, interrupted, paused in zip(
+                    columns['kind'], columns['start'], columns['actualDuration'],
+                    columns['interrupted'], columns['pausedDuration']):
+                if kind == _WORK_CODE:
+                    self._addWork(start, duration, interrupted, paused)
+            return
+        work = numpy.asarray(columns['kind']) == _WORK_CODE
+        self.addColumns(numpy.asarray(columns['start'])[work],
+                        numpy.asarray(columns['actualDuration'])[work],
+                        numpy.asarray(columns['interrupted'])[work],
+                        numpy.asarray(columns['pausedDuration'])[work])
+
+    def addColumns(self, starts, durations, interrupted, paused=None):
+        """
+        Add many work activities at once
+        @param starts: wall clock start times
+        @type starts: array
+        @param durations: actual durations in seconds
+        @type durations: array
+        @param interrupted: flags of stopped activities
+        @type interrupted: array
+        @param paused: paused durations in seconds, zeros if omitted
+        @type paused: array
+        """
+        if numpy is None:
+            if paused is None:
+                paused = [0.0] * len(starts)
+            for values in zip(starts, durations, interrupted, paused):
+                self._addWork(*values)
+            return
+        if not len(starts):
+            return
+        starts = numpy.asarray(starts, dtype=numpy.float64)
+        durations = numpy.asarray(durations, dtype=numpy.float64)
+        interrupted = numpy.asarray(interrupted, dtype=numpy.float64)
+        if paused is None:
+            paused = numpy.zeros(len(starts))
+        else:
+            paused = numpy.asarray(paused, dtype=numpy.float64)
+        completed = 1.0 - interrupted
+        local = starts + self._offsets(starts)
+        days = (local // _DAY).astype(numpy.int64)
+        hours = (local % _DAY // _HOUR).astype(numpy.int64)
+        firstDay = int(days.min())
+        dayKeys = days - firstDay
+        dayCount = int(dayKeys.max()) + 1
+        dayTotals = zip(_bucketSums(dayKeys, completed, dayCount),
+                        _bucketSums(dayKeys, interrupted, dayCount),
+                        _bucketSums(dayKeys, durations, dayCount),
+                        _bucketSums(dayKeys, paused, dayCount))
+        for key, totals in enumerate(dayTotals):
+            if any(totals):
+                self._addToBucket(self.__days.setdefault(firstDay + key, [0, 0, 0.0, 0.0]),
+                                  *totals)
+        hourTotals = zip(_bucketSums(hours, completed, 24),
+                         _bucketSums(hours, interrupted, 24),
+                         _bucketSums(hours, durations, 24),
+                         _bucketSums(hours, paused, 24))
+        for hour, totals in enumerate(hourTotals):
+            self._addToBucket(self.__hours[hour], *totals)
+        self.__count += len(starts)
+
+    def add(self, record):
+        """
+        Add one finished activity, can be subscribed to ActivityManager.activityRecorded
+        @param record: finished activity
+        @type record: ActivityRecord
+        """
+        if record.kind == WORK:
+            self._addWork(record.start, record.actualDuration, record.interrupted,
+                          record.pausedDuration)
+
+    def _addWork(self, start, duration, interrupted, paused):
+        """
+        Add one work activity to its day and hour buckets
+        """
+        local = start + self._offset(start)
+        completed = 0 if interrupted else 1
+        self._addToBucket(self.__days.setdefault(int(local // _DAY), [0, 0, 0.0, 0.0]),
+                          completed, 1 - completed, duration, paused)
+        self._addToBucket(self.__hours[int(local % _DAY // _HOUR)], completed,
+                          1 - completed, duration, paused)
+        self.__count += 1
+
+    def _offset(self, start):
+        """
+        Find offset of the local time from UTC at the moment. Offsets of the time zone are
+        looked up once per hour since DST changes happen on hour boundaries.
+        @param start: wall clock time
+        @type start: float
+        @return: offset in seconds
+        @rtype: int
+        """
+        if self.__utcOffset is not None:
+            return self.__utcOffset
+        hour = int(start // _HOUR)
+        offset = self.__offsets.get(hour)
+        if offset is None:
+            offset = self.__offsets[hour] = time.localtime(hour * _HOUR).tm_gmtoff
+        return offset
+
+    def _offsets(self, starts):
+        """
+        Find offsets of the local time from UTC at many moments
+        @param starts: wall clock times
+        @type starts: numpy.ndarray
+        @return: offsets in seconds
+        @rtype: numpy.ndarray
+        """
+        if self.__utcOffset is not None:
+            return self.__utcOffset
+        hours, inverse = numpy.unique((starts // _HOUR).astype(numpy.int64),
+                                      return_inverse=True)
+        offsets = numpy.array([self._offset(hour * _HOUR) for hour in hours.tolist()],
+                              dtype=numpy.float64)
+        return offsets[inverse]
+
+    @staticmethod
+    def _addToBucket(bucket, completed, interrupted, focusTime, pausedTime):
+        """
+        Add sums to the bucket of completed, interrupted activities, focus and paused time
+        """
+        bucket[0] += int(completed)
+        bucket[1] += int(interrupted)
+        bucket[2] += focusTime
+        bucket[3] += pausedTime
+
+    def __len__(self):
+        """
+        @return: number of accounted work activities
+        @rtype: int
+        """
+        return self.__count
+
+    def daily(self):
+        """
+        @return: statistics of days having work activities, sorted by date
+        @rtype: list
+        """
+        return [_periodStatistics(_dayDate(day), bucket)
+                for day, bucket in sorted(self.__days.items())]
+
+    def weekly(self):
+        """
+        @return: statistics of weeks having work activities, periods are Mondays
+        @rtype: list
+        """
+        weeks = {}
+        for day, bucket in self.__days.items():
+            date = _dayDate(day)
+            monday = date - datetime.timedelta(days=date.weekday())
+            self._addToBucket(weeks.setdefault(monday, [0, 0, 0.0, 0.0]), *bucket)
+        return [_periodStatistics(week, bucket) for week, bucket in sorted(weeks.items())]
+
+    def hourly(self):
+        """
+        @return: statistics of 24 hours of the day, periods are hour numbers
+        @rtype: list
+        """
+        return [_periodStatistics(hour, bucket) for hour, bucket in enumerate(self.__hours)]
+
+    def streaks(self, today=None):
+        """
+        Calculate streaks of consecutive days having completed work activities
+        @param today: date the current streak must reach, the last active day by default
+        @type today: datetime.date
+        @return: current and longest streak in days
+        @rtype: tuple
+        """
+        days = sorted(day for day, bucket in self.__days.items() if bucket[0] > 0)
+        longest = current = 0
+        previous = None
+        for day in days:
+            current = current + 1 if previous == day - 1 else 1
+            longest = max(longest, current)
+            previous = day
+        if today is not None and (previous is None or _dayDate(previous) < today -
+                                  datetime.timedelta(days=1)):
+            current = 0
+        return current, longest
+
+    def connect(self, activityManager):
+        """
+        Keep statistics up to date with activities finished by the manager
+        @param activityManager: manager to listen to
+        @type activityManager: ActivityManager
+        """
+        activityManager.activityRecorded += self.add
+
+
+def _dayDate(day):
+    """Convert number of a day since the epoch to a date"""
+    return datetime.date(1970, 1, 1) + datetime.timedelta(days=day)
+
+
+def _periodStatistics(period, bucket):
+    """Create statistics of a period from its bucket"""
+    completed, interrupted, focusTime, pausedTime = bucket
+    total = completed + interrupted
+    rate = float(interrupted) / total if total else 0.0
+    return PeriodStatistics(period, completed, interrupted, rate, focusTime, pausedTime)
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Timer backends for activities. Each backend is imported lazily by the code that needs it,
+so the core does not depend on any event loop.
+"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import math
+import threading
+from pomidorka.core import OneSecondTimer
+from pomidorka.scheduler import HeapScheduler, SchedulerTimer
+
+
+class QtOneSecondTimer(OneSecondTimer):
+    """
+    Concrete implementation of the timer based on Qt classes
+    """
+
+    def __init__(self):
+        from PySide.QtCore import QTimer
+        OneSecondTimer.__init__(self)
+        self.__timer = QTimer()
+        self.__timer.setSingleShot(True)
+        self.__timer.timeout.connect(self._timerElapsed)
+
+    def start(self, delay=1.0):
+        """
+        Start the timer
+        @param delay: time in seconds after which listeners are notified
+        @type delay: float
+        """
+        self.__timer.start(int(math.ceil(delay * 1000)))
+
+    def _timerElapsed(self):
+        """Process notification from the timer"""
+        self.elapsed.fire()
+
+    def stop(self):
+        """Stop the timer"""
+        self.__timer.stop()
+
+
+class ThreadingOneSecondTimer(OneSecondTimer):
+    """
+    Timer waiting in a background thread. Listeners are notified in that thread, the
+    thread exits as soon as the timer is stopped.
+    """
+
+    def __init__(self):
+        OneSecondTimer.__init__(self)
+        self.__condition = threading.Condition()
+        self.__deadline = None
+        self.__thread = None
+
+    def start(self, delay=1.0):
+        """
+        Start the timer
+        @param delay: time in seconds after which listeners are notified
+        @type delay: float
+        """
+        with self.__condition:
+            self.__deadline = self.now() + delay
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self._run, name='ActivityTimer')
+                self.__thread.daemon = True
+                self.__thread.start()
+            self.__condition.notify()
+
+    def stop(self):
+        """Stop the timer"""
+        with self.__condition:
+            self.__deadline = None
+            self.__condition.notify()
+
+    def _run(self):
+        """Thread body: wait for deadlines and notify listeners"""
+        while True:
+            with self.__condition:
+                while self.__deadline is not None and self.__deadline > self.now():
+                    self.__condition.wait(self.__deadline - self.now())
+                if self.__deadline is None:
+                    self.__thread = None
+                    return
+                self.__deadline = None
+            self.elapsed.fire()
+
+
+class AsyncioOneSecondTimer(OneSecondTimer):
+    """Timer scheduling its deadlines on an asyncio event loop"""
+
+    def __init__(self, loop=None):
+        """
+        @param loop: event loop to use, the running loop is used if omitted
+        @type loop: asyncio.AbstractEventLoop
+        """
+        OneSecondTimer.__init__(self)
+        if loop is None:
+            import asyncio
+            loop = asyncio.get_running_loop()
+        self.__loop = loop
+        self.__handle = None
+
+    def now(self):
+        """
+        Get current time of the event loop clock
+        @return: current time in seconds
+        @rtype: float
+        """
+        return self.__loop.time()
+
+    def start(self, delay=1.0):
+        """
+        Start the timer
+        @param delay: time in seconds after which listeners are notified
+        @type delay: float
+        """
+        self.stop()
+        self.__handle = self.__loop.call_at(self.__loop.time() + delay, self._timerElapsed)
+
+    def _timerElapsed(self):
+        """Process notification from the event loop"""
+        self.__handle = None
+        self.elapsed.fire()
+
+    def stop(self):
+        """Stop the timer"""
+        if self.__handle is not None:
+            self.__handle.cancel()
+            self.__handle = None
+
+
+class SimulatedTimer(SchedulerTimer):
+    """Timer driven by a simulated clock, which also provides the wall clock time"""
+
+    __slots__ = ('__clock',)
+
+    def __init__(self, clock):
+        """
+        @param clock: clock driving the timer
+        @type clock: SimulatedClock
+        """
+        SchedulerTimer.__init__(self, clock.scheduler)
+        self.__clock = clock
+
+    def wallTime(self):
+        """
+        Get simulated wall clock time, which is the time of the clock
+        @return: seconds since the epoch
+        @rtype: float
+        """
+        return self.__clock.time
+
+
+class SimulatedClock:
+    """
+    Virtual clock, which is moved forward explicitly. Timers created by the clock fire
+    while it advances, so hours of activities run in a fraction of a second. The time of
+    the clock is used as wall clock time too, so it can start at any moment of the epoch.
+    """
+
+    def __init__(self, startTime=0.0):
+        """
+        @param startTime: initial time of the clock in seconds
+        @type startTime: float
+        """
+        self.time = startTime
+        self.scheduler = HeapScheduler(self.now)
+
+    def now(self):
+        """
+        @return: current time of the clock in seconds
+        @rtype: float
+        """
+        return self.time
+
+    def createTimer(self):
+        """
+        Create a timer driven by the clock, can be used as an activity timer factory
+        @return: new timer
+        @rtype: SimulatedTimer
+        """
+        return SimulatedTimer(self)
+
+    def advance(self, seconds):
+        """
+        Move the clock forward firing all timers on the way
+        @param seconds: time to advance by
+        @type seconds: float
+        @return: number of fired timers
+        @rtype: int
+        """
+        return self.advanceTo(self.time + seconds)
+
+    def advanceTo(self, moment):
+        """
+        Move the clock to the given time firing all timers on the way
+        @param moment: time to set
+        @type moment: float
+        @return: number of fired timers
+        @rtype: int
+        """
+        fired = 0
+        while True:
+            deadline = self.scheduler.nextDeadline()
+            if deadline is None or deadline > moment:
+                break
+            self.time = max(self.time, deadline)
+            fired += self.scheduler.runDue(self.time)
+        self.time = max(self.time, moment)
+        return fired
+
+    def runUntilIdle(self):
+        """
+        Move the clock forward until no timers are left
+        @return: number of fired timers
+        @rtype: int
+        """
+        fired = 0
+        while True:
+            deadline = self.scheduler.nextDeadline()
+            if deadline is None:
+                return fired
+            self.time = max(self.time, deadline)
+            fired += self.scheduler.runDue(self.time)
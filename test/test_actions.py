@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the end of activity actions"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import logging
+import time
+import unittest
+from pomidorka.actions import ActionRunner, CANCELLED, FAILED, SUCCEEDED, TIMED_OUT
+from pomidorka.core import WORK
+
+
+class ActionRunnerTest(unittest.TestCase):
+    """Test outcomes of actions run by the runner"""
+
+    def setUp(self):
+        self.runner = ActionRunner(workers=1, timeout=5.0)
+
+    def tearDown(self):
+        self.runner.close()
+
+    def testOutcomes(self):
+        handles = self.runner.run([['true'], ['false']], WORK)
+        results = [handle.result(5.0) for handle in handles]
+        self.assertEqual([(result.status, result.exitCode) for result in results],
+                         [(SUCCEEDED, 0), (FAILED, 1)])
+        self.assertEqual(results[0].kind, WORK)
+        metrics = self.runner.metrics.summary()
+        self.assertEqual(metrics['false'][FAILED], 1)
+
+    def testMissingExecutableFails(self):
+        with self.assertLogs(level=logging.WARNING):
+            result = self.runner.run([['/nonexistent/pomidorka-action']])[0].result(5.0)
+        self.assertEqual((result.status, result.exitCode), (FAILED, None))
+
+    def testSlowActionIsStopped(self):
+        started = time.monotonic()
+        with self.assertLogs(level=logging.WARNING):
+            result = self.runner.run([['sleep', '30']], timeout=0.2)[0].result(10.0)
+        self.assertEqual(result.status, TIMED_OUT)
+        self.assertLess(time.monotonic() - started, 5.0)
+
+    def testCancelWaitingAndRunningActions(self):
+        finished = []
+        self.runner.finished += finished.append
+        running, waiting = self.runner.run([['sleep', '30'], ['true']])
+        deadline = time.monotonic() + 5.0
+        while not running.future.running() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.runner.cancel()
+        self.assertEqual(running.result(5.0).status, CANCELLED)
+        self.assertEqual(waiting.result(5.0).status, CANCELLED)
+        self.assertEqual([result.status for result in finished], [CANCELLED])
+
+
+if __name__ == '__main__':
+    unittest.main()
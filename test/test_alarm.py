@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the alarm player and its sinks"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import logging
+import time
+import unittest
+from pomidorka.alarm import AlarmPlayer, MemoryAudioSink, PipeAudioSink, QUEUE
+
+
+class PipeAudioSinkTest(unittest.TestCase):
+    """Test the sink when the player can not be started"""
+
+    def testMissingPlayerDropsChunks(self):
+        sink = PipeAudioSink(['/nonexistent/pomidorka-player'])
+        with self.assertLogs(level=logging.ERROR) as logs:
+            sink.write(b'\0' * 16)
+            sink.write(b'\0' * 16)
+        self.assertEqual(len(logs.records), 1)
+        sink.close()
+
+    def testPlayerSurvivesMissingSink(self):
+        sink = PipeAudioSink(['/nonexistent/pomidorka-player'])
+        player = AlarmPlayer(lambda: b'\0' * 64, sink, policy=QUEUE, chunkDuration=0.0001)
+        with self.assertLogs(level=logging.ERROR):
+            player.play()
+            player.play()
+            deadline = time.monotonic() + 5.0
+            while player.latency.count < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        player.close()
+        self.assertEqual(player.latency.count, 2)
+
+
+class AlarmPlayerTest(unittest.TestCase):
+    """Test playback of alarms into memory"""
+
+    def testQueuedAlarmsArePlayedInFull(self):
+        sink = MemoryAudioSink()
+        sound = b'\1' * 400
+        player = AlarmPlayer(lambda: sound, sink, policy=QUEUE, chunkDuration=0.001)
+        player.play()
+        player.play()
+        deadline = time.monotonic() + 5.0
+        while len(b''.join(data for _, data in sink.chunks)) < 2 * len(sound) and \
+                time.monotonic() < deadline:
+            time.sleep(0.01)
+        player.close()
+        self.assertEqual(b''.join(data for _, data in sink.chunks), sound * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the activity checkpoint"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from pomidorka.checkpoint import CheckpointStore, PAUSED, RUNNING
+from pomidorka.core import ActivityManager, Settings, WORK, SHORT_BREAK
+from pomidorka.timers import SimulatedClock
+
+_START = 1500000000.0
+
+
+class CheckpointStoreTest(unittest.TestCase):
+    """Test that a restarted manager continues the checkpointed activity"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'state', 'checkpoint')
+        self.settings = Settings()
+        self.clock = SimulatedClock(_START)
+        self.manager = ActivityManager(self.settings, self.clock.createTimer)
+        self.store = CheckpointStore(self.path)
+        self.store.connect(self.manager)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _restart(self, downtime):
+        """Restore the checkpoint in a new manager after the downtime"""
+        clock = SimulatedClock(self.clock.time + downtime)
+        manager = ActivityManager(self.settings, clock.createTimer)
+        records = []
+        manager.activityRecorded += records.append
+        return clock, manager, CheckpointStore(self.path).restore(manager), records
+
+    def testRunningActivityContinues(self):
+        self.manager.startWorkActivity()
+        self.clock.advance(100)
+        checkpoint = CheckpointStore(self.path).load()
+        self.assertEqual((checkpoint.state, checkpoint.kind), (RUNNING, WORK))
+        _, manager, activity, _ = self._restart(50)
+        self.assertIs(manager.currentActivity(), activity)
+        self.assertEqual(activity.kind, WORK)
+        self.assertAlmostEqual(activity.exactRemainingTime(), self.settings.workPeriod - 150)
+        self.assertEqual(activity.startTime, _START)
+
+    def testPausedActivityKeepsRemainingTime(self):
+        self.manager.startShortBreakActivity()
+        self.clock.advance(30)
+        self.manager.pauseCurrentActivity()
+        self.clock.advance(20)
+        self.assertEqual(CheckpointStore(self.path).load().state, PAUSED)
+        clock, manager, activity, records = self._restart(1000)
+        self.assertTrue(activity.isPaused())
+        self.assertAlmostEqual(activity.exactRemainingTime(),
+                               self.settings.shortRestPeriod - 30)
+        manager.resumeCurrentActivity()
+        clock.advance(self.settings.shortRestPeriod)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].kind, SHORT_BREAK)
+        self.assertEqual(records[0].pauseCount, 1)
+        self.assertAlmostEqual(records[0].pausedDuration, 1020)
+
+    def testExpiredActivityIsNotRestored(self):
+        self.manager.startWorkActivity()
+        _, manager, activity, _ = self._restart(self.settings.workPeriod + 1)
+        self.assertIsNone(activity)
+        self.assertIsNone(manager.currentActivity())
+
+    def testEndedActivityClearsCheckpoint(self):
+        self.manager.startWorkActivity()
+        self.manager.stopCurrentActivity()
+        self.assertIsNone(self._restart(0)[2])
+        self.assertEqual(self.store.writes, 2)
+
+    def testDamagedCheckpointIsIgnored(self):
+        self.manager.startWorkActivity()
+        with open(self.path, 'r+b') as checkpointFile:
+            checkpointFile.seek(12)
+            checkpointFile.write(b'\xff')
+        with self.assertLogs(level=logging.WARNING):
+            self.assertIsNone(CheckpointStore(self.path).load())
+            self.assertIsNone(self._restart(0)[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the settings file"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from pomidorka.config import SettingsError, SettingsFile, formatSettings, parseSettings
+from pomidorka.core import Settings
+
+
+class ParseSettingsTest(unittest.TestCase):
+    """Test validation of the settings file contents"""
+
+    def _assertInvalid(self, text, message):
+        with self.assertRaises(SettingsError) as context:
+            parseSettings(text, 'settings.ini')
+        self.assertIn(message, str(context.exception))
+
+    def testValidValues(self):
+        values = parseSettings('[pomidorka]\nworkPeriod = 1200\nautoStart = on\n'
+                               'workEndActions =\n    notify-send "Work ended"\n    true\n')
+        self.assertEqual(values, {'workPeriod': 1200, 'autoStart': True,
+                                  'workEndActions': [['notify-send', 'Work ended'],
+                                                     ['true']]})
+
+    def testFormattedDefaultsAreValid(self):
+        settings = Settings()
+        values = parseSettings(formatSettings(settings))
+        for name, value in values.items():
+            self.assertEqual(value, getattr(settings, name), name)
+
+    def testUnknownSection(self):
+        self._assertInvalid('[timer]\nworkPeriod = 60\n', 'unknown section [timer]')
+
+    def testUnknownSetting(self):
+        self._assertInvalid('[pomidorka]\nworkTime = 60\n', 'unknown setting workTime')
+
+    def testPeriodOutOfRange(self):
+        self._assertInvalid('[pomidorka]\nworkPeriod = 0\n', 'invalid workPeriod')
+        self._assertInvalid('[pomidorka]\nlongRestPeriod = 3601\n', 'between 1 and 3600')
+
+    def testInvalidValues(self):
+        self._assertInvalid('[pomidorka]\nworkPeriod = soon\n', 'invalid workPeriod')
+        self._assertInvalid('[pomidorka]\nautoStart = maybe\n', 'must be yes or no')
+        self._assertInvalid('[pomidorka]\nlongBreakInterval = 0\n', 'must be positive')
+        self._assertInvalid('[pomidorka]\nalarmPlayerCommand =\n', 'must not be empty')
+        self._assertInvalid('[pomidorka]\nalarmOverlapPolicy = mix\n',
+                            'invalid alarmOverlapPolicy')
+
+    def testMalformedFile(self):
+        self.assertRaises(SettingsError, parseSettings, 'workPeriod = 60\n')
+
+
+class SettingsFileTest(unittest.TestCase):
+    """Test loading, caching and reloading of the settings file"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'config', 'settings.ini')
+        self.cachePath = os.path.join(self.directory, 'cache', 'settings.cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, text):
+        with open(self.path, 'w') as settingsFile:
+            settingsFile.write(text)
+        # make the change visible to mtime polling even within one timestamp tick
+        status = os.stat(self.path)
+        os.utime(self.path, ns=(status.st_atime_ns, status.st_mtime_ns + 10 ** 9))
+
+    def testDefaultFileIsCreated(self):
+        settings = SettingsFile(self.path, self.cachePath).load()
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(vars(settings), vars(Settings()))
+
+    def testCacheIsUsedForUnchangedFile(self):
+        os.makedirs(os.path.dirname(self.path))
+        self._write('[pomidorka]\nworkPeriod = 1200\n')
+        SettingsFile(self.path, self.cachePath).load()
+        self.assertTrue(os.path.exists(self.cachePath))
+        settingsFile = SettingsFile(self.path, self.cachePath)
+        settingsFile._readFile = None
+        self.assertEqual(settingsFile.load().workPeriod, 1200)
+
+    def testInvalidChangeKeepsSettings(self):
+        os.makedirs(os.path.dirname(self.path))
+        self._write('[pomidorka]\nworkPeriod = 1200\n')
+        settingsFile = SettingsFile(self.path, self.cachePath)
+        settings = settingsFile.load()
+        changes = []
+        settingsFile.changed += changes.append
+        self.assertFalse(settingsFile.poll())
+        self._write('[pomidorka]\nworkPeriod = never\n')
+        with self.assertLogs(level=logging.WARNING):
+            self.assertFalse(settingsFile.poll())
+        self.assertEqual(settings.workPeriod, 1200)
+        self._write('[pomidorka]\nshortRestPeriod = 120\n')
+        self.assertTrue(settingsFile.poll())
+        self.assertEqual(changes, [settings])
+        self.assertEqual((settings.workPeriod, settings.shortRestPeriod),
+                         (Settings().workPeriod, 120))
+
+
+if __name__ == '__main__':
+    unittest.main()
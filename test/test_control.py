@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the control protocol and the instance lock"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import os
+import shutil
+import tempfile
+import unittest
+from pomidorka.control import ControlError, ControlProtocol, InstanceLock, _privateDirectory
+from pomidorka.core import ActivityManager, Settings, WORK
+from pomidorka.timers import SimulatedClock
+
+
+class ControlProtocolTest(unittest.TestCase):
+    """Test responses of the protocol to commands"""
+
+    def setUp(self):
+        self.clock = SimulatedClock()
+        self.manager = ActivityManager(Settings(), self.clock.createTimer)
+        self.records = []
+        self.manager.activityRecorded += self.records.append
+        self.protocol = ControlProtocol(self.manager)
+
+    def testStartAndStatus(self):
+        response = self.protocol.handle('work\n')
+        self.assertTrue(response['ok'])
+        self.assertTrue(response['status']['running'])
+        self.assertEqual(response['status']['kind'], WORK)
+        self.assertFalse(response['status']['paused'])
+
+    def testStartDoesNotReplaceRunningActivity(self):
+        self.protocol.handle('work')
+        activity = self.manager.currentActivity()
+        response = self.protocol.handle('short')
+        self.assertEqual(response, {'ok': False, 'error': 'activity running'})
+        self.assertIs(self.manager.currentActivity(), activity)
+        self.assertEqual(self.records, [])
+
+    def testStartAfterStop(self):
+        self.protocol.handle('work')
+        self.assertTrue(self.protocol.handle('stop')['ok'])
+        self.assertEqual(len(self.records), 1)
+        self.assertTrue(self.protocol.handle('long')['ok'])
+
+    def testUnknownCommand(self):
+        response = self.protocol.handle('dance')
+        self.assertFalse(response['ok'])
+        self.assertIn('dance', response['error'])
+
+    def testFailingCommandIsReported(self):
+        def fail():
+            raise ValueError('broken command')
+        self.protocol.addCommand('fail', fail)
+        self.assertEqual(self.protocol.handle('fail'),
+                         {'ok': False, 'error': 'broken command'})
+
+    def testStatusFields(self):
+        self.protocol.addStatusField('answer', lambda: 42)
+        self.assertEqual(self.protocol.handle('status')['status'],
+                         {'running': False, 'answer': 42})
+
+
+
+class InstanceLockTest(unittest.TestCase):
+    """Test the lock against several instances and its runtime directory"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testSecondLockFails(self):
+        path = os.path.join(self.directory, 'pomidorka.lock')
+        first, second = InstanceLock(path), InstanceLock(path)
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        first.release()
+        self.assertTrue(second.acquire())
+        second.release()
+
+    def testUnopenableLockIsReported(self):
+        lock = InstanceLock(os.path.join(self.directory, 'missing', 'pomidorka.lock'))
+        self.assertRaises(ControlError, lock.acquire)
+
+    def testPrivateDirectory(self):
+        path = os.path.join(self.directory, 'runtime')
+        self.assertEqual(_privateDirectory(path), path)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o700)
+        self.assertEqual(_privateDirectory(path), path)
+        os.chmod(path, 0o755)
+        self.assertRaises(ControlError, _privateDirectory, path)
+        link = os.path.join(self.directory, 'link')
+        os.symlink(path, link)
+        os.chmod(path, 0o700)
+        self.assertRaises(ControlError, _privateDirectory, link)
+
+
+if __name__ == '__main__':
+    unittest.main()
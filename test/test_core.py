@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the timing core: event hooks and activities"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import gc
+import unittest
+from pomidorka.core import Activity, EventHook, MINUTE, SECOND, TimeChangedHook
+from pomidorka.timers import SimulatedClock
+
+
+class Listener:
+    """Object subscribing its method, which records received values"""
+
+    def __init__(self):
+        self.values = []
+
+    def record(self, *values):
+        self.values.append(values[0] if values else None)
+
+
+class EventHookTest(unittest.TestCase):
+    """Test subscription, ordering and weak references of event hooks"""
+
+    def setUp(self):
+        self.hook = EventHook('test')
+        self.calls = []
+
+    def _handler(self, name):
+        return lambda *args: self.calls.append((name,) + args)
+
+    def testFireCallsHandlersWithArguments(self):
+        self.hook += self._handler('a')
+        self.hook.fire(1, 2)
+        self.assertEqual(self.calls, [('a', 1, 2)])
+
+    def testPriorityAndSubscriptionOrder(self):
+        self.hook.subscribe(self._handler('low'), priority=-1)
+        self.hook.subscribe(self._handler('first'))
+        self.hook.subscribe(self._handler('high'), priority=10)
+        self.hook.subscribe(self._handler('second'))
+        self.hook.fire()
+        self.assertEqual(self.calls, [('high',), ('first',), ('second',), ('low',)])
+
+    def testResubscribeChangesPriority(self):
+        first, second = self._handler('first'), self._handler('second')
+        self.hook += first
+        self.hook += second
+        self.hook.subscribe(second, priority=1)
+        self.hook.fire()
+        self.assertEqual(self.calls, [('second',), ('first',)])
+        self.assertEqual(len(self.hook), 2)
+
+    def testUnsubscribe(self):
+        handler = self._handler('a')
+        self.hook += handler
+        self.hook -= handler
+        self.hook.fire()
+        self.assertEqual(self.calls, [])
+        self.assertRaises(ValueError, self.hook.unsubscribe, handler)
+
+    def testBoundMethodsAreHeldWeakly(self):
+        listener = Listener()
+        self.hook += listener.record
+        self.hook.fire(1)
+        self.assertEqual(listener.values, [1])
+        del listener
+        gc.collect()
+        self.assertEqual(len(self.hook), 0)
+        self.hook.fire(2)
+
+    def testEqualBoundMethodsAreOneHandler(self):
+        listener = Listener()
+        self.hook += listener.record
+        self.hook += listener.record
+        self.hook.fire(1)
+        self.assertEqual(listener.values, [1])
+        self.hook -= listener.record
+        self.assertEqual(len(self.hook), 0)
+
+    def testFunctionsAreHeldStrongly(self):
+        self.hook += self._handler('a')
+        gc.collect()
+        self.hook.fire()
+        self.assertEqual(self.calls, [('a',)])
+
+    def testSubscribeDuringFireTakesEffectNextTime(self):
+        late = self._handler('late')
+
+        def subscribeLate():
+            self.calls.append(('early',))
+            if len(self.calls) == 1:
+                self.hook.subscribe(late, priority=-1)
+        self.hook += subscribeLate
+        self.hook.fire()
+        self.assertEqual(self.calls, [('early',)])
+        self.hook.fire()
+        self.assertEqual(self.calls, [('early',), ('early',), ('late',)])
+
+    def testUnsubscribeDuringFireSkipsHandler(self):
+        victim = self._handler('victim')
+
+        def unsubscribeVictim():
+            self.calls.append(('killer',))
+            self.hook.unsubscribe(victim)
+        self.hook.subscribe(unsubscribeVictim, priority=1)
+        self.hook += victim
+        self.hook.fire()
+        self.assertEqual(self.calls, [('killer',)])
+
+    def testClearObjectHandlers(self):
+        listener, other = Listener(), Listener()
+        self.hook += listener.record
+        self.hook += other.record
+        self.hook.clearObjectHandlers(listener)
+        self.hook.fire(1)
+        self.assertEqual((listener.values, other.values), ([], [1]))
+        self.hook.clearHandlers()
+        self.assertEqual(len(self.hook), 0)
+
+
+class TimeChangedHookTest(unittest.TestCase):
+    """Test delivery of remaining time at the resolutions subscribers need"""
+
+    def setUp(self):
+        self.hook = TimeChangedHook()
+        self.changes = []
+        self.hook.resolutionChanged += lambda: self.changes.append(
+            self.hook.finestResolution())
+
+    def testDeliveryByResolution(self):
+        seconds, minutes = Listener(), Listener()
+        self.hook.subscribe(seconds.record)
+        self.hook.subscribe(minutes.record, resolution=MINUTE)
+        for value in (125, 121, 120, 119, 61, 59, 1, 0):
+            self.hook.fire(value)
+        self.assertEqual(seconds.values, [125, 121, 120, 119, 61, 59, 1, 0])
+        self.assertEqual(minutes.values, [125, 119, 59, 0])
+
+    def testFinestResolution(self):
+        self.assertIsNone(self.hook.finestResolution())
+        minutes, seconds = Listener(), Listener()
+        self.hook.subscribe(minutes.record, resolution=MINUTE)
+        self.hook.subscribe(seconds.record, resolution=SECOND)
+        self.assertEqual(self.hook.finestResolution(), SECOND)
+        self.hook.unsubscribe(seconds.record)
+        self.assertEqual(self.hook.finestResolution(), MINUTE)
+        self.hook.subscribe(minutes.record, resolution=SECOND)
+        self.assertEqual(len(self.hook), 1)
+        self.assertEqual(self.hook.finestResolution(), SECOND)
+        self.hook.unsubscribe(minutes.record)
+        self.assertIsNone(self.hook.finestResolution())
+        self.assertEqual(self.changes, [MINUTE, SECOND, MINUTE, SECOND, None])
+        self.assertRaises(ValueError, self.hook.unsubscribe, minutes.record)
+
+    def testChainedHookResolution(self):
+        chained = TimeChangedHook()
+        self.hook.chain(chained)
+        listener = Listener()
+        chained.subscribe(listener.record, resolution=MINUTE)
+        self.assertEqual(self.hook.finestResolution(), MINUTE)
+        self.hook.fire(60)
+        self.assertEqual(listener.values, [60])
+
+    def testDeadSubscriberIsForgotten(self):
+        listener = Listener()
+        self.hook.subscribe(listener.record, resolution=MINUTE)
+        del listener
+        gc.collect()
+        self.hook.fire(100)
+        self.assertEqual(len(self.hook), 0)
+        self.assertIsNone(self.hook.finestResolution())
+        self.assertEqual(self.changes, [MINUTE, None])
+
+    def testResubscribeAfterDeadSubscriberDropped(self):
+        for value in range(50):
+            listener = Listener()
+            self.hook.subscribe(listener.record, resolution=MINUTE)
+            del listener
+            gc.collect()
+            self.hook.fire(value)
+        listener = Listener()
+        self.hook.subscribe(listener.record, resolution=MINUTE)
+        self.assertEqual(len(self.hook), 1)
+        self.assertEqual(self.hook.finestResolution(), MINUTE)
+
+    def testClearObjectHandlers(self):
+        listener, other = Listener(), Listener()
+        self.hook.subscribe(listener.record)
+        self.hook.subscribe(other.record, resolution=MINUTE)
+        self.hook.clearObjectHandlers(listener)
+        self.assertEqual(self.hook.finestResolution(), MINUTE)
+        self.hook.subscribe(listener.record, resolution=MINUTE)
+        self.assertEqual(len(self.hook), 2)
+
+
+class ActivityResolutionTest(unittest.TestCase):
+    """Test that activities wake up only as often as their listeners need"""
+
+    def setUp(self):
+        self.clock = SimulatedClock()
+        self.activity = Activity(600, self.clock.createTimer())
+
+    def testNobodyListening(self):
+        self.activity.start()
+        self.assertEqual(self.clock.advance(599), 0)
+        self.assertEqual(self.clock.advance(1), 1)
+        self.assertEqual(self.activity.remainingTime, 0)
+
+    def testWakeupsFollowResolution(self):
+        listener = Listener()
+        self.activity.timeChanged.subscribe(listener.record, resolution=MINUTE)
+        self.activity.start()
+        self.assertEqual(self.clock.advance(600), 11)
+        self.assertEqual(listener.values, [600] + list(range(599, 0, -60)) + [0])
+
+    def testDeadListenerStopsWakeups(self):
+        listener = Listener()
+        self.activity.timeChanged.subscribe(listener.record)
+        self.activity.start()
+        self.assertEqual(self.clock.advance(10), 10)
+        del listener
+        gc.collect()
+        self.clock.advance(1)
+        self.assertIsNone(self.activity.timeChanged.finestResolution())
+        self.assertEqual(self.clock.advance(500), 0)
+        self.assertEqual(self.clock.advance(89), 1)
+        self.assertEqual(self.activity.remainingTime, 0)
+
+
+class ActivityDeadlineTest(unittest.TestCase):
+    """Test remaining time calculated from the activity deadline"""
+
+    def setUp(self):
+        self.clock = SimulatedClock(1000.0)
+        self.activity = Activity(600, self.clock.createTimer())
+        self.finished = []
+        self.activity.finished += lambda: self.finished.append(self.clock.time)
+
+    def testEndsAtDeadline(self):
+        self.activity.start()
+        self.assertEqual(self.activity.startTime, 1000.0)
+        self.clock.advance(599.5)
+        self.assertEqual(self.finished, [])
+        self.assertEqual(self.activity.currentRemainingTime(), 1)
+        self.assertAlmostEqual(self.activity.exactRemainingTime(), 0.5)
+        self.clock.advance(0.5)
+        self.assertEqual(self.finished, [1600.0])
+        self.assertEqual(self.activity.actualDuration, 600.0)
+        self.assertFalse(self.activity.interrupted)
+
+    def testLateWakeupDoesNotPostponeEnd(self):
+        listener = Listener()
+        self.activity.timeChanged += listener.record
+        self.activity.start()
+        self.clock.time += 100.25
+        self.assertEqual(self.activity.currentRemainingTime(), 500)
+        self.clock.advance(0)
+        self.assertEqual(listener.values[-1], 500)
+        self.clock.advance(499.75)
+        self.assertEqual(self.finished, [1600.0])
+
+    def testStopInterrupts(self):
+        self.activity.start()
+        self.clock.advance(42)
+        self.activity.stop()
+        self.assertTrue(self.activity.interrupted)
+        self.assertEqual(self.activity.remainingTime, 0)
+        self.assertEqual(self.activity.actualDuration, 42.0)
+        self.assertEqual(self.clock.advance(1000), 0)
+
+
+class ActivityPauseTest(unittest.TestCase):
+    """Test the time arithmetic of paused activities"""
+
+    def setUp(self):
+        self.clock = SimulatedClock(1000.0)
+        self.activity = Activity(600, self.clock.createTimer())
+        self.finished = []
+        self.activity.finished += lambda: self.finished.append(self.clock.time)
+        self.activity.start()
+        self.clock.advance(100.5)
+
+    def testPauseKeepsExactRemainingTime(self):
+        self.assertTrue(self.activity.pause())
+        self.assertFalse(self.activity.pause())
+        self.assertTrue(self.activity.isPaused())
+        self.assertEqual(self.activity.pausedSince(), 1100.5)
+        self.assertEqual(self.clock.advance(1000), 0)
+        self.assertAlmostEqual(self.activity.exactRemainingTime(), 499.5)
+        self.assertEqual(self.activity.currentRemainingTime(), 500)
+        self.assertTrue(self.activity.resume())
+        self.assertFalse(self.activity.resume())
+        self.assertIsNone(self.activity.pausedSince())
+        self.clock.advance(499.5)
+        self.assertEqual(self.finished, [2600.0])
+        self.assertEqual(self.activity.actualDuration, 600.0)
+        self.assertEqual(self.activity.pausedDuration, 1000.0)
+        self.assertEqual(self.activity.pauseCount, 1)
+        self.assertEqual(self.activity.pauses, ((1100.5, 2100.5),))
+
+    def testSeveralPauses(self):
+        for _ in range(3):
+            self.activity.pause()
+            self.clock.advance(10)
+            self.activity.resume()
+            self.clock.advance(5)
+        self.assertEqual(self.activity.pauseCount, 3)
+        self.assertEqual(self.activity.pausedDuration, 30.0)
+        self.assertAlmostEqual(self.activity.exactRemainingTime(), 484.5)
+
+    def testStopWhilePaused(self):
+        self.activity.pause()
+        self.clock.advance(20)
+        self.activity.stop()
+        self.assertTrue(self.activity.interrupted)
+        self.assertFalse(self.activity.isPaused())
+        self.assertEqual(self.activity.pausedDuration, 20.0)
+        self.assertEqual(self.activity.actualDuration, 100.5)
+
+    def testEndedActivityIsNotPaused(self):
+        self.clock.advance(600)
+        self.assertFalse(self.activity.pause())
+        self.assertEqual(self.finished, [1600.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the pomodoro cycle"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import unittest
+from pomidorka.core import ActivityManager, Settings, WORK, SHORT_BREAK, LONG_BREAK
+from pomidorka.cycle import CycleScheduler, CycleTable, cycleTable, FINISHED, INTERRUPTED
+from pomidorka.timers import SimulatedClock
+
+
+class CycleTableTest(unittest.TestCase):
+    """Test transitions and alignment of the cycle table"""
+
+    def setUp(self):
+        self.table = CycleTable(3)
+
+    def testKinds(self):
+        self.assertEqual(self.table.kinds, (WORK, SHORT_BREAK, WORK, SHORT_BREAK, WORK,
+                                            LONG_BREAK))
+        self.assertEqual(CycleTable(1).kinds, (WORK, LONG_BREAK))
+        self.assertRaises(ValueError, CycleTable, 0)
+
+    def testFinishedActivitiesFollowTheCycle(self):
+        state = 0
+        visited = []
+        for _ in range(7):
+            state = self.table.next(state, FINISHED)
+            visited.append(state)
+        self.assertEqual(visited, [1, 2, 3, 4, 5, 0, 1])
+
+    def testInterruptedWorkIsRepeated(self):
+        self.assertEqual(self.table.next(2, INTERRUPTED), 2)
+        self.assertEqual(self.table.next(3, INTERRUPTED), 4)
+        self.assertEqual(self.table.next(5, INTERRUPTED), 0)
+
+    def testAlignment(self):
+        self.assertEqual(self.table.align(0, WORK), 0)
+        self.assertEqual(self.table.align(1, WORK), 2)
+        self.assertEqual(self.table.align(0, SHORT_BREAK), 1)
+        self.assertEqual(self.table.align(3, SHORT_BREAK), 3)
+        self.assertEqual(self.table.align(2, LONG_BREAK), 5)
+        self.assertEqual(self.table.align(5, WORK), 0)
+
+    def testClamp(self):
+        self.assertEqual(self.table.clamp(3), 3)
+        self.assertEqual(self.table.clamp(8), 4)
+        self.assertEqual(self.table.clamp(9), 5)
+
+    def testTablesAreShared(self):
+        self.assertIs(cycleTable(4), cycleTable(4))
+
+
+class CycleSchedulerTest(unittest.TestCase):
+    """Test the cycle running on an activity manager"""
+
+    def setUp(self):
+        self.settings = Settings()
+        self.settings.longBreakInterval = 2
+        self.clock = SimulatedClock()
+        self.manager = ActivityManager(self.settings, self.clock.createTimer)
+        self.kinds = []
+        self.manager.activityStarted += lambda activity: self.kinds.append(activity.kind)
+
+    def testAutoStartRunsWholeCycle(self):
+        self.settings.autoStart = True
+        cycle = CycleScheduler(self.manager)
+        cycle.start()
+        self.clock.advance(self.settings.workPeriod * 2 + self.settings.shortRestPeriod +
+                           self.settings.longRestPeriod + 1)
+        self.assertEqual(self.kinds[:5], [WORK, SHORT_BREAK, WORK, LONG_BREAK, WORK])
+
+    def testStoppedWorkIsRepeated(self):
+        cycle = CycleScheduler(self.manager)
+        cycle.start()
+        self.manager.stopCurrentActivity()
+        self.assertEqual(cycle.nextKind(), WORK)
+        self.assertEqual(cycle.completedWorkPeriods(), 0)
+
+    def testAlignsToActivitiesStartedOutside(self):
+        cycle = CycleScheduler(self.manager)
+        self.manager.startShortBreakActivity()
+        self.assertEqual(cycle.position(), 1)
+        self.clock.advance(self.settings.shortRestPeriod + 1)
+        self.assertEqual(cycle.nextKind(), WORK)
+        self.assertEqual(cycle.position(), 2)
+
+    def testAlignsToRunningActivityOnCreation(self):
+        self.manager.startLongBreakActivity()
+        self.assertEqual(CycleScheduler(self.manager).position(), 3)
+
+    def testShorterIntervalClampsPosition(self):
+        self.settings.longBreakInterval = 4
+        cycle = CycleScheduler(self.manager)
+        cycle.setPosition(6)
+        self.settings.longBreakInterval = 2
+        self.assertEqual(cycle.nextKind(), WORK)
+        self.assertEqual(cycle.position(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the activity history log"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import os
+import shutil
+import tempfile
+import unittest
+from pomidorka.core import ActivityRecord, WORK, SHORT_BREAK
+from pomidorka.history import HistoryStore, INDEX_STEP, _HEADER, _RECORD
+
+
+class HistoryStoreTest(unittest.TestCase):
+    """Test storing, reading and recovery of the history log"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'history')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _fill(self, count):
+        records = [ActivityRecord(1000.0 * number, 1000.0 * number + 600.0,
+                                  WORK if number % 2 == 0 else SHORT_BREAK, 600, 540.0,
+                                  number % 3 == 0, 60.0, number % 4)
+                   for number in range(count)]
+        store = HistoryStore(self.path)
+        for record in records:
+            store.append(record)
+        store.close()
+        return records
+
+    @staticmethod
+    def _logSize(count):
+        return _HEADER.size + count * _RECORD.size
+
+    def testRecordsRoundTrip(self):
+        records = self._fill(10)
+        store = HistoryStore(self.path)
+        self.assertEqual(len(store), 10)
+        self.assertEqual(list(store.records()), records)
+        self.assertEqual(list(store.records(7)), records[7:])
+        self.assertEqual(list(store.columns()['pauseCount']),
+                         [record.pauseCount for record in records])
+        store.close()
+
+    def testTornRecordIsDropped(self):
+        records = self._fill(5)
+        with open(self.path, 'ab') as log:
+            log.write(b'torn')
+        store = HistoryStore(self.path)
+        self.assertEqual(list(store.records()), records)
+        store.close()
+        self.assertEqual(os.path.getsize(self.path), self._logSize(5))
+
+    def testDamagedRecordsAtEndAreDropped(self):
+        records = self._fill(5)
+        with open(self.path, 'r+b') as log:
+            for position in (3, 4):
+                log.seek(self._logSize(position) + 2)
+                log.write(b'\xff\xff')
+        store = HistoryStore(self.path)
+        self.assertEqual(list(store.records()), records[:3])
+        store.append(records[3])
+        store.close()
+        store = HistoryStore(self.path)
+        self.assertEqual(list(store.records()), records[:4])
+        store.close()
+
+    def testIndexIsRebuilt(self):
+        records = self._fill(INDEX_STEP * 2 + 10)
+        os.remove(self.path + '.idx')
+        store = HistoryStore(self.path)
+        self.assertEqual(list(store.query(records[300].start, records[303].start)),
+                         records[300:303])
+        store.close()
+        with open(self.path, 'r+b') as log:
+            log.truncate(self._logSize(INDEX_STEP))
+        store = HistoryStore(self.path)
+        self.assertEqual(os.path.getsize(self.path + '.idx'), 8)
+        self.assertEqual(list(store.query(0.0, 1e12)), records[:INDEX_STEP])
+        store.close()
+
+    def testTruncatedHeaderIsEmptyLog(self):
+        HistoryStore(self.path).close()
+        with open(self.path, 'r+b') as log:
+            log.truncate(3)
+        store = HistoryStore(self.path)
+        self.assertEqual(len(store), 0)
+        store.append(ActivityRecord(1.0, 2.0, WORK, 1, 1.0, False))
+        store.close()
+        store = HistoryStore(self.path)
+        self.assertEqual(len(store), 1)
+        store.close()
+
+    def testReadOnlyStoreRepairsNothing(self):
+        records = self._fill(INDEX_STEP + 10)
+        with open(self.path, 'ab') as log:
+            log.write(b'torn')
+        with open(self.path + '.idx', 'ab') as indexFile:
+            indexFile.write(b'\x00' * 12)
+        logSize = os.path.getsize(self.path)
+        indexSize = os.path.getsize(self.path + '.idx')
+        store = HistoryStore(self.path, readOnly=True)
+        self.assertEqual(list(store.records()), records)
+        self.assertEqual(list(store.query(records[INDEX_STEP].start, 1e12)),
+                         records[INDEX_STEP:])
+        self.assertRaises(ValueError, store.append, records[0])
+        store.close()
+        self.assertEqual(os.path.getsize(self.path), logSize)
+        self.assertEqual(os.path.getsize(self.path + '.idx'), indexSize)
+        os.remove(self.path + '.idx')
+        store = HistoryStore(self.path, readOnly=True)
+        self.assertEqual(len(store), INDEX_STEP + 10)
+        store.close()
+        self.assertFalse(os.path.exists(self.path + '.idx'))
+
+    def testForeignFileIsRejected(self):
+        with open(self.path, 'wb') as log:
+            log.write(b'#!')
+        self.assertRaises(ValueError, HistoryStore, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the heap scheduler"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import unittest
+from pomidorka.scheduler import HeapScheduler
+
+
+class HeapSchedulerTest(unittest.TestCase):
+    """Test ordering and cancellation of scheduled calls"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.scheduler = HeapScheduler(clock=lambda: self.now)
+        self.called = []
+
+    def _schedule(self, when, name):
+        return self.scheduler.schedule(when, lambda: self.called.append(name))
+
+    def testCallsInDeadlineOrder(self):
+        self._schedule(3.0, 'c')
+        self._schedule(1.0, 'a')
+        self._schedule(2.0, 'b')
+        self.assertEqual(self.scheduler.runDue(2.5), 2)
+        self.assertEqual(self.called, ['a', 'b'])
+        self.assertEqual(self.scheduler.nextDeadline(), 3.0)
+        self.assertEqual(len(self.scheduler), 1)
+
+    def testCancelledCallIsSkipped(self):
+        entry = self._schedule(1.0, 'a')
+        self._schedule(2.0, 'b')
+        self.scheduler.cancel(entry)
+        self.scheduler.cancel(entry)
+        self.assertEqual(len(self.scheduler), 1)
+        self.assertEqual(self.scheduler.nextDeadline(), 2.0)
+        self.scheduler.runDue(5.0)
+        self.assertEqual(self.called, ['b'])
+
+    def testCallbackCancellingMostOfHeap(self):
+        entries = [self._schedule(float(when), when) for when in range(2, 12)]
+        kept = entries[-2:]
+
+        def cancelOthers():
+            self.called.append('canceller')
+            for entry in entries[:-2]:
+                self.scheduler.cancel(entry)
+        self.scheduler.schedule(1.0, cancelOthers)
+        self.assertEqual(self.scheduler.runDue(1.0), 1)
+        self.assertEqual(len(self.scheduler), 2)
+        self.assertEqual(self.scheduler.nextDeadline(), kept[0][0])
+        self.assertEqual(self.scheduler.runDue(20.0), 2)
+        self.assertEqual(self.called, ['canceller', 10, 11])
+        self.assertEqual(len(self.scheduler), 0)
+        self.assertIsNone(self.scheduler.nextDeadline())
+
+    def testCancelDuringRunDue(self):
+        entries = [self._schedule(float(when), when) for when in range(2, 12)]
+
+        def cancelOthers():
+            self.called.append('canceller')
+            for entry in entries[1:-1]:
+                self.scheduler.cancel(entry)
+        self.scheduler.schedule(1.0, cancelOthers)
+        self.assertEqual(self.scheduler.runDue(20.0), 3)
+        self.assertEqual(self.called, ['canceller', 2, 11])
+        self.assertEqual(len(self.scheduler), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the sharded timer daemon"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import multiprocessing
+import unittest
+from pomidorka.daemon import UnknownUserError
+from pomidorka.sharding import HashRing, ShardedDaemon, ShardedProtocol, ShardWorker
+
+
+class HashRingTest(unittest.TestCase):
+    """Test assignment of keys to nodes"""
+
+    def setUp(self):
+        self.keys = ['user-{0}'.format(number) for number in range(2000)]
+
+    def testAssignmentIsDeterministic(self):
+        ring = HashRing(['a', 'b', 'c'])
+        other = HashRing(['c', 'a', 'b'])
+        self.assertEqual([ring.node(key) for key in self.keys],
+                         [other.node(key) for key in self.keys])
+        self.assertEqual(set(ring.node(key) for key in self.keys), {'a', 'b', 'c'})
+
+    def testAddingNodeMovesOnlyKeysToIt(self):
+        ring = HashRing(['a', 'b', 'c'])
+        before = dict((key, ring.node(key)) for key in self.keys)
+        ring.add('d')
+        moved = [key for key in self.keys if ring.node(key) != before[key]]
+        self.assertTrue(all(ring.node(key) == 'd' for key in moved))
+        self.assertGreater(len(moved), len(self.keys) // 8)
+        self.assertLess(len(moved), len(self.keys) * 3 // 8)
+
+    def testRemovingNodeMovesOnlyItsKeys(self):
+        ring = HashRing(['a', 'b', 'c'])
+        before = dict((key, ring.node(key)) for key in self.keys)
+        ring.remove('b')
+        self.assertEqual(ring.nodes(), ['a', 'c'])
+        for key in self.keys:
+            if before[key] != 'b':
+                self.assertEqual(ring.node(key), before[key])
+
+    def testEmptyRing(self):
+        self.assertRaises(KeyError, HashRing().node, 'user')
+
+
+class ShardWorkerTest(unittest.TestCase):
+    """Test request handling of a shard without starting processes"""
+
+    def setUp(self):
+        self.connection, workerConnection = multiprocessing.Pipe()
+        self.worker = ShardWorker('shard-0', workerConnection)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def testCommandsOfUser(self):
+        self.assertEqual(self.worker.handle(('addUsers', [('alice', None)])), (True, None))
+        succeeded, status = self.worker.handle(('execute', 'alice', 'work'))
+        self.assertTrue(succeeded)
+        self.assertTrue(status['running'])
+        succeeded, error = self.worker.handle(('execute', 'alice', 'short'))
+        self.assertFalse(succeeded)
+        self.assertEqual(str(error), 'activity running')
+
+    def testFailuresAreReturned(self):
+        self.assertIsInstance(self.worker.handle(('execute', 'nobody', 'work'))[1],
+                              UnknownUserError)
+        self.assertIsInstance(self.worker.handle(('bogus',))[1], ValueError)
+
+        def fail(daemon, userId, manager):
+            raise RuntimeError('setup failed')
+        worker = ShardWorker('shard-1', None, userSetup=fail)
+        succeeded, error = worker.handle(('addUsers', [('bob', None)]))
+        self.assertFalse(succeeded)
+        self.assertIsInstance(error, RuntimeError)
+
+    def testLoopSurvivesFailures(self):
+        self.connection.send(('addUsers', [('alice', None)]))
+        self.connection.send(('execute', 'nobody', 'work'))
+        self.connection.send(('stats',))
+        self.connection.send(('close',))
+        self.worker.run()
+        responses = [self.connection.recv() for _ in range(4)]
+        self.assertEqual([succeeded for succeeded, _ in responses], [True, False, True, True])
+        self.assertEqual(responses[2][1]['users'], 1)
+
+
+class ShardedDaemonTest(unittest.TestCase):
+    """Test the front-end with two shard processes"""
+
+    def setUp(self):
+        self.daemon = ShardedDaemon(2)
+        self.users = ['u{0}'.format(number) for number in range(8)]
+        self.daemon.addUsers((userId, None) for userId in self.users)
+        self.protocol = ShardedProtocol(self.daemon)
+
+    def tearDown(self):
+        self.daemon.close()
+
+    def _userOf(self, shard):
+        return next(userId for userId in self.users if self.daemon.shardOf(userId) == shard)
+
+    def testFailedBroadcastLeavesNoStaleResponses(self):
+        duplicates = [(self._userOf(shard), None) for shard in self.daemon.workers()]
+        self.assertRaises(KeyError, self.daemon.addUsers, duplicates)
+        for userId in self.users:
+            self.assertFalse(self.daemon.status(userId)['running'])
+        userId = self.users[1]
+        self.assertTrue(self.daemon.execute(userId, 'work')['running'])
+        self.assertTrue(self.daemon.status(userId)['running'])
+        self.assertEqual(len(self.daemon), len(self.users))
+
+    def testProtocolErrors(self):
+        self.assertEqual(self.protocol.handle('add alice'), {'ok': True, 'result': None})
+        self.assertEqual(self.protocol.handle('add alice'),
+                         {'ok': False, 'error': 'User alice is already registered'})
+        self.assertEqual(self.protocol.handle('carol work'),
+                         {'ok': False, 'error': 'unknown user: carol'})
+        self.assertEqual(self.protocol.handle('alice dance'),
+                         {'ok': False, 'error': 'Unknown command: dance'})
+        self.assertTrue(self.protocol.handle('alice work')['result']['running'])
+
+
+if __name__ == '__main__':
+    unittest.main()
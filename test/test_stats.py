@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-13, Andrey Vasilev
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice, this
+# list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Tests of the productivity statistics"""
+
+__author__ = 'Andrey Vasilev <vamonster@gmail.com>'
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from pomidorka.core import ActivityRecord, WORK, SHORT_BREAK
+from pomidorka.history import HistoryStore
+from pomidorka.stats import ProductivityStatistics
+
+"""Midnight of Monday 2024-01-01 UTC"""
+_MONDAY = 1704067200.0
+
+
+def _work(day, hour, interrupted=False, paused=0.0):
+    start = _MONDAY + day * 86400 + hour * 3600
+    return ActivityRecord(start, start + 1500.0 + paused, WORK, 1500, 1500.0, interrupted,
+                          paused, 1 if paused else 0)
+
+
+class ProductivityStatisticsTest(unittest.TestCase):
+    """Test aggregation of work activities by periods"""
+
+    def setUp(self):
+        self.records = [_work(0, 9), _work(0, 10, interrupted=True), _work(1, 9, paused=60.0),
+                        _work(7, 23)]
+
+    def _statistics(self, utcOffset=0):
+        statistics = ProductivityStatistics(utcOffset)
+        for record in self.records:
+            statistics.add(record)
+        statistics.add(ActivityRecord(_MONDAY, _MONDAY + 300, SHORT_BREAK, 300, 300.0, False))
+        return statistics
+
+    def testDaily(self):
+        statistics = self._statistics()
+        self.assertEqual(len(statistics), 4)
+        daily = statistics.daily()
+        self.assertEqual([row.period for row in daily],
+                         [datetime.date(2024, 1, 1), datetime.date(2024, 1, 2),
+                          datetime.date(2024, 1, 8)])
+        self.assertEqual((daily[0].completed, daily[0].interrupted), (1, 1))
+        self.assertEqual(daily[0].interruptionRate, 0.5)
+        self.assertEqual(daily[1].pausedTime, 60.0)
+
+    def testWeeklyAndHourly(self):
+        statistics = self._statistics()
+        weekly = statistics.weekly()
+        self.assertEqual([(row.period, row.completed) for row in weekly],
+                         [(datetime.date(2024, 1, 1), 2), (datetime.date(2024, 1, 8), 1)])
+        hourly = statistics.hourly()
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(hourly[9].completed, 2)
+        self.assertEqual(hourly[10].interrupted, 1)
+
+    def testUtcOffsetMovesActivitiesToNextDay(self):
+        daily = self._statistics(utcOffset=2 * 3600).daily()
+        self.assertEqual(daily[-1].period, datetime.date(2024, 1, 9))
+        self.assertEqual(self._statistics(utcOffset=2 * 3600).hourly()[1].completed, 1)
+
+    def testStreaks(self):
+        statistics = self._statistics()
+        self.assertEqual(statistics.streaks(), (1, 2))
+        self.assertEqual(statistics.streaks(datetime.date(2024, 1, 20)), (0, 2))
+
+    def testLoadHistoryMatchesAdd(self):
+        directory = tempfile.mkdtemp()
+        try:
+            store = HistoryStore(os.path.join(directory, 'history'))
+            store.append(ActivityRecord(_MONDAY - 600, _MONDAY - 300, SHORT_BREAK, 300,
+                                        300.0, False))
+            for record in self.records:
+                store.append(record)
+            loaded = ProductivityStatistics(0)
+            loaded.loadHistory(store)
+            store.close()
+        finally:
+            shutil.rmtree(directory)
+        added = self._statistics()
+        self.assertEqual(len(loaded), len(added))
+        self.assertEqual(loaded.daily(), added.daily())
+        self.assertEqual(loaded.hourly(), added.hourly())
+
+
+if __name__ == '__main__':
+    unittest.main()